@@ -0,0 +1,252 @@
+# accesslog.py
+"""Structured JSON access log, written off the request path.
+
+A request only builds a ``LogRecord`` and hands it to a
+``DroppingQueueHandler``.  That handler puts the record on a bounded queue
+without waiting; when the queue is full, it counts the record in
+``dropped`` and discards it.  A ``BatchingQueueListener`` thread turns
+records into JSON lines.  It also resolves the video id from the
+validated URL there, not in the request.  After the first record arrives
+it waits ``linger`` seconds and then takes everything queued, writing
+the lines ``batch_size`` at a time.
+
+``RotatingWriter`` appends to one file shared by every worker process.
+It rotates the file once it reaches ``max_bytes`` or is older than
+``interval`` seconds, keeping ``backups`` old files.  Rotation takes an
+``flock`` so that one worker renames the file, and the others notice the
+new inode and reopen it.  A path of ``-`` writes to stdout and never
+rotates.
+
+The listener starts lazily in the process that logs, so with gunicorn's
+``preload_app`` each worker has its own thread and queue.
+"""
+import atexit
+import collections
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+from urlparser import parse_youtube_url
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# WSGI environ keys the app fills in while handling a request.
+URL_KEY = 'accesslog.url'
+RATE_LIMIT_KEY = 'accesslog.rate_limit'
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A ``QueueHandler`` that never blocks: records that do not fit are counted and dropped.
+
+    ``handle`` skips the handler lock that ``logging.Handler`` takes around
+    ``emit``, so ``put_nowait`` is the only synchronisation on the request
+    path.  Drops are counted per thread for the same reason.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self._dropped = {}
+
+    @property
+    def dropped(self):
+        return sum(list(self._dropped.values()))
+
+    def handle(self, record):
+        if not self.filter(record):
+            return False
+        self.enqueue(self.prepare(record))
+        return True
+
+    def prepare(self, record):
+        # Formatting happens in the listener; the record is handed over as is.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Each thread only writes its own entry, so no increment is lost.
+            ident = threading.get_ident()
+            self._dropped[ident] = self._dropped.get(ident, 0) + 1
+
+
+class RotatingWriter:
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, interval=86400.0, backups=7):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backups = backups
+        self.rotations = 0
+        self._file = None
+        self._started_at = 0.0
+
+    def write(self, text, now=None):
+        now = time.time() if now is None else now
+        if self.path == '-':
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            return
+        if self._file is None or self._replaced():
+            self._open(now)
+        elif self._due(now):
+            self._rotate(now)
+        self._file.write(text.encode())
+
+    def _open(self, now):
+        if self._file is not None:
+            self._file.close()
+        created = not os.path.exists(self.path)
+        self._file = open(self.path, 'ab', buffering=0)
+        # The lock file's mtime marks when the current file was started, for every worker.
+        with open(self.path + '.lock', 'a'):
+            pass
+        if created:
+            os.utime(self.path + '.lock', (now, now))
+        self._started_at = os.stat(self.path + '.lock').st_mtime
+
+    def _replaced(self):
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return True
+
+    def _due(self, now):
+        if self.interval and now - self._started_at >= self.interval:
+            return True
+        return bool(self.max_bytes) and os.fstat(self._file.fileno()).st_size >= self.max_bytes
+
+    def _rotate(self, now):
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have rotated while this one waited for the lock.
+            if not self._replaced():
+                target = f'{self.path}.{time.strftime("%Y%m%d-%H%M%S", time.localtime(now))}'
+                suffix = 0
+                while os.path.exists(target + (f'.{suffix}' if suffix else '')):
+                    suffix += 1
+                os.rename(self.path, target + (f'.{suffix}' if suffix else ''))
+                os.utime(self.path + '.lock', (now, now))
+                self.rotations += 1
+                self._prune()
+        self._open(now)
+
+    def _prune(self):
+        rotated = sorted(glob.glob(glob.escape(self.path) + '.' + '[0-9]' * 8 + '-*'), key=os.path.getmtime)
+        for path in rotated[:max(0, len(rotated) - self.backups)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """Formats queued access records as JSON lines and writes them in batches."""
+
+    def __init__(self, queue, writer, batch_size=256, linger=0.1):
+        super().__init__(queue)
+        self.writer = writer
+        self.batch_size = batch_size
+        self.linger = linger
+        self.written = 0
+        self.errors = 0
+        self._batch = []
+        self._pending = collections.deque()
+
+    def dequeue(self, block):
+        if not self._pending:
+            self._pending.append(self.queue.get(block))
+            # Let a batch build up, then take everything queued: one wake-up per
+            # ``linger`` seconds instead of one per request.
+            time.sleep(self.linger)
+            try:
+                while True:
+                    self._pending.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+        return self._pending.popleft()
+
+    def handle(self, record):
+        fields = record.msg
+        url = fields.pop('url', None)
+        parsed = parse_youtube_url(url) if url else None
+        fields['video_id'] = parsed.video_id if parsed else None
+        fields['ts'] = round(record.created, 3)
+        fields['pid'] = record.process
+        self._batch.append(json.dumps(fields, separators=(',', ':')))
+        if len(self._batch) >= self.batch_size or not self._pending:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        lines, self._batch = self._batch, []
+        try:
+            self.writer.write('\n'.join(lines) + '\n')
+            self.written += len(lines)
+        except (OSError, ValueError):
+            # A full disk must not take the listener down; the lines are lost.
+            self.errors += len(lines)
+
+    def enqueue_sentinel(self):
+        # The queue may be full; wait for room rather than fail to stop.
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        super().stop()
+        self.flush()
+        self.writer.close()
+
+
+class AccessLog:
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, interval=86400.0, backups=7, queue_size=10000,
+                 batch_size=256):
+        self.writer = RotatingWriter(path, max_bytes, interval, backups)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.handler = None
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A queue and thread inherited through fork are dead; start fresh ones.
+            records = queue.Queue(self.queue_size)
+            self.handler = DroppingQueueHandler(records)
+            self.listener = BatchingQueueListener(records, self.writer, self.batch_size)
+            self.listener.start()
+            atexit.register(self.listener.stop)
+            self._pid = os.getpid()
+
+    def log(self, fields):
+        """Queue one access record (a dict of JSON-serialisable fields); never blocks."""
+        if self._pid != os.getpid():
+            self._start()
+        self.handler.handle(logging.LogRecord('utube.access', logging.INFO, __file__, 0, fields, None, None))
+
+    @property
+    def dropped(self):
+        return self.handler.dropped if self.handler is not None else 0
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            atexit.unregister(self.listener.stop)
+            self.listener.stop()
+            self._pid = None
@@ -0,0 +1,120 @@
+# admission.py
+"""Admission control: bounded concurrency per route class, with load shedding.
+
+Routes are grouped into cost classes, such as cheap page and command
+routes versus routes that run an extraction, and each class has its own
+``Limiter``.  A request takes a free slot in its class, or waits in a short
+queue for up to ``queue_timeout`` seconds.  If the queue is full or the
+wait runs out, ``Rejected`` is raised.  The caller answers 503 with
+Retry-After instead of tying up a worker thread.  Because a class can
+only hold its own slots, a burst of slow requests cannot starve the
+other classes.
+
+Adaptive limiters adjust to latency.  While the recent latency (a fast
+moving average, weighted by ``recent_weight``) stays within ``tolerance``
+times the long-term baseline (a slow one, ``baseline_weight``), the limit
+grows by one slot at a time, but only while it is actually in use.  Once
+the recent latency rises above that, the limit is scaled down by the
+ratio.  Each step moves the limit ``smoothing`` of the way to its target,
+and it stays within ``min_limit..max_limit``.  Limits are per process,
+like the worker threads they protect.
+"""
+import math
+import threading
+import time
+
+
+class Rejected(Exception):
+    """No slot became free in time; retry after ``retry_after`` seconds."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} requests are over capacity')
+        self.name = name
+        self.retry_after = retry_after
+
+
+class Limiter:
+    def __init__(self, name, limit, min_limit=1, max_limit=None, queue_size=0, queue_timeout=0.0,
+                 adaptive=True, tolerance=2.0, smoothing=0.2, recent_weight=0.2, baseline_weight=0.01):
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.recent_weight = recent_weight
+        self.baseline_weight = baseline_weight
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.recent_latency = None
+        self.baseline_latency = None
+        self._cond = threading.Condition(threading.Lock())
+
+    def _has_slot(self):
+        return self.in_flight < max(1, int(self.limit))
+
+    def acquire(self):
+        """Take a slot, queueing for up to ``queue_timeout``; raises ``Rejected``."""
+        with self._cond:
+            if not self._has_slot():
+                if self.queued >= self.queue_size:
+                    self.rejected += 1
+                    raise Rejected(self.name, self.retry_after())
+                self.queued += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while not self._has_slot():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected += 1
+                            raise Rejected(self.name, self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self, latency=None):
+        """Give the slot back; ``latency`` (seconds) of a completed request feeds the limit."""
+        with self._cond:
+            busy = self.in_flight
+            self.in_flight -= 1
+            if latency is not None and self.adaptive:
+                self._adapt(latency, busy)
+            free = max(1, int(self.limit)) - self.in_flight
+            if free > 0 and self.queued:
+                self._cond.notify(free)
+
+    def _adapt(self, latency, busy):
+        if self.recent_latency is None:
+            self.recent_latency = self.baseline_latency = latency
+            return
+        self.recent_latency += self.recent_weight * (latency - self.recent_latency)
+        self.baseline_latency += self.baseline_weight * (latency - self.baseline_latency)
+        gradient = min(1.0, self.tolerance * self.baseline_latency / max(self.recent_latency, 1e-9))
+        if gradient < 1.0:
+            target = self.limit * max(0.5, gradient)
+        elif busy >= int(self.limit):
+            target = self.limit + 1
+        else:
+            return
+        limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = min(float(self.max_limit), max(float(self.min_limit), limit))
+
+    def retry_after(self):
+        """Whole seconds a rejected client should wait: about one recent request."""
+        return max(1, math.ceil(self.recent_latency or 1))
+
+    def snapshot(self):
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
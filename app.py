@@ -1,542 +1,796 @@
 # app.py
 import os
 import atexit
-from flask import Flask, render_template_string, request, jsonify
+import contextlib
+import hmac
+import json
+import mimetypes
+from flask import Blueprint, Flask, Response, abort, current_app, has_app_context, request, jsonify, stream_with_context
+from werkzeug.datastructures import ContentRange
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.wsgi import wrap_file
+import tempfile
 import threading
 import time
-import re
 from functools import wraps
-
-app = Flask(__name__)
+from urllib.parse import quote
+
+import accesslog
+import admission
+import assets
+import batchscript
+import converters
+import cookiepool
+import jobs
+import mediacache
+import metadata
+import metrics
+import profiler
+import singleflight
+from commands import COOKIES_HINT, DEFAULT_PROFILE, client_command, desktop_command, video_command, rules as command_rules
+from ratelimit import RateLimiter, backend_from_env
+from urlparser import parse_youtube_url
+
+bp = Blueprint('main', __name__)
 
 # Configuration
-request_times = {}
+rate_limit_backend = backend_from_env()
+RATE_LIMIT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_PER_MINUTE', 15))
+MAX_BATCH_URLS = 10000
+MAX_URL_LENGTH = 2048
+# Request body cap: JSON batches are parsed whole, so this bounds their memory.
+MAX_BODY_BYTES = 2 * 1024 * 1024
+COMMAND_CACHE_MAX_AGE = 86400
+PAGES, STATIC_ASSETS = assets.build({
+    'command-rules.json': json.dumps(command_rules(), sort_keys=True).encode(),
+})
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Server-side downloads are off unless DOWNLOAD_JOBS_ENABLED=1.
+DOWNLOAD_JOBS_ENABLED = os.environ.get('DOWNLOAD_JOBS_ENABLED', '0') == '1'
+# The metadata endpoint calls out to YouTube, so it is opt-in too.
+METADATA_ENABLED = os.environ.get('METADATA_ENABLED', '0') == '1'
+# Access log destination: a file path, '-' for stdout, or empty for none.
+ACCESS_LOG = os.environ.get('ACCESS_LOG', '')
+# Per-class concurrency limits with load shedding; see ADMISSION_CLASSES.
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+# Seconds between converter health probes; 0 lists converters unranked.
+CONVERTER_PROBE_INTERVAL = float(os.environ.get('CONVERTER_PROBE_INTERVAL', 300))
+# Profiling is off unless a sample rate or an admin token is configured.
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+
+metrics_registry = metrics.Registry()
+metrics_registry.describe('http_requests_total', 'counter', 'Requests handled, by route, method and status.')
+metrics_registry.describe('http_request_duration_seconds', 'histogram', 'Time until the response body is fully sent, by route.')
+metrics_registry.describe('http_requests_in_flight', 'gauge', 'Requests currently being handled.')
+metrics_registry.describe('url_validation_failures_total', 'counter', 'Submitted URLs rejected as not being YouTube links.')
+metrics_registry.describe('rate_limited_total', 'counter', 'Requests rejected with 429 by the rate limiter, by route.')
+metrics_registry.callback(
+    'rate_limiter_clients', 'gauge', 'Clients currently tracked by the rate limiter.',
+    lambda: {(): len(rate_limit_backend)},
+)
+metrics_registry.callback(
+    'rate_limiter_evictions_total', 'counter', 'Idle clients evicted from the rate limiter by this worker.',
+    lambda: {(): rate_limit_backend.evictions},
+)
+metrics_registry.describe('admission_rejected_total', 'counter', 'Requests shed with 503 by admission control, by route class.')
+for _field, _kind, _help in (
+    ('in_flight', 'gauge', 'Requests holding an admission slot, by route class.'),
+    ('queued', 'gauge', 'Requests waiting for an admission slot, by route class.'),
+    ('limit', 'gauge', 'Current concurrency limit, by route class.'),
+):
+    metrics_registry.callback(f'admission_{_field}', _kind, _help,
+                              lambda field=_field: admission_gauge(field))
+metrics_registry.callback(
+    'cookie_jars', 'gauge', 'Cookie jars in the pool, ready or quarantined after throttling.',
+    lambda: {(('state', state),): count for state, count in cookie_counts().items()},
+)
+metrics_registry.callback(
+    'access_log_dropped_total', 'counter', 'Access log records dropped because the queue was full.',
+    lambda: access_log_dropped(),
+)
+metrics.register_process_metrics(metrics_registry)
+
+# Admission classes by endpoint; anything not listed is 'cheap'.  Only
+# routes that run an extraction are 'expensive'; 'streaming' responses hold
+# their slot until the client has read them.
+ROUTE_CLASSES = {
+    'main.video_metadata': 'expensive',
+    'main.playlist_stream': 'expensive',
+    'main.create_job': 'expensive',
+    'main.job_events': 'streaming',
+}
+ADMISSION_KEY = 'admission.slot'
+ACCESS_LOG_START_KEY = 'accesslog.start'
+
+def admission_gauge(field):
+    limiters = current_app.extensions.get('admission', {}) if has_app_context() else {}
+    return {(('class', name),): getattr(limiter, field) for name, limiter in limiters.items()}
+
+def cookie_counts():
+    pool = current_app.extensions.get('cookies') if has_app_context() else None
+    return pool.counts() if pool is not None else {}
+
+def access_log_dropped():
+    access_log = current_app.extensions.get('access_log') if has_app_context() else None
+    return {(): access_log.dropped} if access_log is not None else {}
+
+def log_url(url):
+    # The access log resolves the video id from this in its own thread.
+    request.environ[accesslog.URL_KEY] = url
+
+def rate_limit(max_per_minute=RATE_LIMIT_PER_MINUTE):
+    limiter = RateLimiter(max_per_minute, window=60.0, backend=rate_limit_backend)
 
-def rate_limit(max_per_minute=15):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             user_ip = request.remote_addr or 'unknown'
-            current_time = time.time()
-            
-            window_start = current_time - 60
-            if user_ip in request_times:
-                request_times[user_ip] = [t for t in request_times[user_ip] if t > window_start]
-            else:
-                request_times[user_ip] = []
-            
-            if len(request_times[user_ip]) >= max_per_minute:
+            if not limiter.hit(user_ip):
+                request.environ[accesslog.RATE_LIMIT_KEY] = 'limited'
+                metrics_registry.inc('rate_limited_total', (('route', request.url_rule.rule),))
                 return jsonify({
                     "error": f"Too many requests. Maximum {max_per_minute} requests per minute."
                 }), 429
-            
-            request_times[user_ip].append(current_time)
+            request.environ[accesslog.RATE_LIMIT_KEY] = 'allowed'
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
 def validate_youtube_url(url):
-    patterns = [
-        r'^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)[\w-]+',
-        r'^(https?://)?(www\.)?youtube\.com/embed/[\w-]+',
-        r'^(https?://)?(www\.)?youtube\.com/(playlist|watch)\?.*list=[\w-]+',
-    ]
-    
-    if not url.startswith(('http://', 'https://')):
-        return False
-        
-    malicious_patterns = [r'\.\./', r'file://', r'javascript:', r'data:', r'vbscript:']
-    for pattern in malicious_patterns:
-        if re.search(pattern, url, re.IGNORECASE):
-            return False
-    
-    return any(re.match(pattern, url, re.IGNORECASE) for pattern in patterns)
+    if parse_youtube_url(url) is not None:
+        return True
+    metrics_registry.inc('url_validation_failures_total')
+    return False
 
 def extract_video_id(url):
-    patterns = [
-        r'(?:youtube\.com/watch\?v=|youtu\.be/)([\w-]{11})',
-        r'(?:youtube\.com/embed/)([\w-]{11})',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
-
-# FIXED: Complete implementation of create_client_command
-def create_client_command(url, fmt, mode, platform):
-    """Generate download command for different platforms"""
-    if platform == "windows":
-        base_command = "python -m yt_dlp"
-    elif platform == "mobile":
-        base_command = "pkg install python -y && pip install yt-dlp && python -m yt_dlp"
-    else:  # mac, linux
-        base_command = "python3 -m yt_dlp"
-    
-    # Format options
-    if fmt == 'video':
-        format_option = 'best[height<=1080]/best[height<=720]/best'
-        command_parts = [base_command, f'-f "{format_option}"', '--merge-output-format', 'mp4']
-    else:  # audio
-        command_parts = [base_command, '-f', 'bestaudio/best', '--extract-audio', '--audio-format', 'mp3']
-        
-    # Mode options
-    if mode == 'single':
-        command_parts.append('--no-playlist')
-    else:
-        command_parts.append('--yes-playlist')
-    
-    # Platform-specific options
-    if platform == "windows":
-        command_parts.append('--no-check-certificate')
-    elif platform == "mobile":
-        command_parts.append('--no-check-certificate')
-        command_parts.append('--compat-options no-certifi')
-    
-    # Add the URL
-    command_parts.append(f'"{url}"')
-    
-    return ' '.join(command_parts)
-
-def generate_desktop_command(url, fmt, mode):
-    base_command = "python -m yt_dlp"
-    
-    if fmt == 'video':
-        format_option = 'best[height<=1080]/best'
-        command_parts = [base_command, '-f', f'"{format_option}"', '--merge-output-format', 'mp4']
-    else:
-        command_parts = [base_command, '-f', 'bestaudio/best', '--extract-audio', '--audio-format', 'mp3']
-    
-    if mode == 'single':
-        command_parts.append('--no-playlist')
-    else:
-        command_parts.append('--yes-playlist')
-    
-    command_parts.append('# Add: --cookies cookies.txt for better success')
-    command_parts.append(f'"{url}"')
-    return ' '.join(command_parts)
+    parsed = parse_youtube_url(url)
+    return parsed.video_id if parsed else None
 
-def generate_online_tools(video_id):
+def create_client_command(url, fmt, mode, platform, profile=DEFAULT_PROFILE):
+    """Generate download command for different platforms"""
+    return client_command(url, fmt, mode, platform, profile)
+
+def generate_desktop_command(url, fmt, mode, profile=DEFAULT_PROFILE):
+    return desktop_command(url, fmt, mode, profile)
+
+def generate_online_tools(video_id, ranking=None):
+    tools = []
+    for converter, status, latency in ranking or converters.unranked():
+        tools.append({
+            "name": converter.name,
+            "url": converter.link(video_id),
+            "description": converter.description,
+            "status": status,
+            "latency_ms": round(latency * 1000) if latency is not None else None,
+        })
     return {
         "method": "online_converters",
         "instructions": "Click any link below to download directly from online converters",
-        "tools": [
-            {
-                "name": "SSYouTube",
-                "url": f"https://ssyoutube.com/watch?v/{video_id}",
-                "description": "Fast and reliable YouTube video downloader"
-            },
-            {
-                "name": "SaveFrom.net",
-                "url": f"https://savefrom.net/watch?v={video_id}",
-                "description": "Browser extension method"
-            }
-        ]
+        "tools": tools,
     }
 
-HTML = """
-<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width,initial-scale=1">
-  <title>YouTube Download Assistant</title>
-  <style>
-    :root{--bg:#071021;--card:#0e1722;--muted:#9aa6b2;--accent:#06b6d4;--text:#e6eef3;--btn:#10b981;--error:#ef4444}
-    html,body{height:100%;margin:0;font-family:Inter,-apple-system,sans-serif;background:linear-gradient(180deg,#071021,#0a1220);color:var(--text);}
-    .wrap{max-width:920px;margin:0 auto;padding:16px}
-    .card{background:linear-gradient(180deg, rgba(255,255,255,0.02), rgba(255,255,255,0.01));padding:18px;border-radius:12px;box-shadow:0 6px 18px rgba(2,6,23,0.6);margin-bottom:20px;}
-    h1{margin:0 0 8px;font-size:20px}
-    p.muted{color:var(--muted);margin-top:4px;font-size:14px;}
-    label{display:block;margin-top:12px;font-size:14px;color:var(--muted)}
-    input[type=url]{width:100%;padding:12px;border-radius:8px;border:1px solid rgba(255,255,255,0.06);background:transparent;color:var(--text);box-sizing:border-box;font-size:16px;}
-    select{width:100%;padding:12px;border-radius:8px;border:1px solid rgba(255,255,255,0.06);background:transparent;color:var(--text);font-size:16px;}
-    .row{display:flex;gap:10px;margin-top:12px;flex-wrap:wrap}
-    button{font-size:16px;padding:14px 20px;border-radius:10px;border:none;font-weight:600;cursor:pointer;min-height:44px;}
-    button.primary{background:var(--btn);color:#04201b;}
-    button:disabled{opacity:0.6;cursor:not-allowed}
-    .error{color:var(--error);background:rgba(239,68,68,0.1);padding:12px;border-radius:8px;margin-top:10px;border:1px solid rgba(239,68,68,0.3)}
-    .info-box{background:rgba(6,182,212,0.1);padding:12px;border-radius:8px;margin-top:10px;border:1px solid rgba(6,182,212,0.3)}
-    .success{color:var(--btn);background:rgba(16,185,129,0.1);padding:12px;border-radius:8px;margin-top:10px;border:1px solid rgba(16,185,129,0.3)}
-    pre{background:#1a1a1a;padding:15px;border-radius:8px;overflow-x:auto;color:var(--text);font-size:14px;}
-    code{background:rgba(0,0,0,0.3);padding:2px 6px;border-radius:4px;font-size:14px;}
-    .copy-btn{background:var(--accent);color:white;border:none;padding:12px 16px;border-radius:6px;cursor:pointer;font-size:14px;margin-top:10px;width:100%;}
-    .tab-container{display:flex;gap:8px;margin-bottom:16px;border-bottom:1px solid rgba(255,255,255,0.06);padding-bottom:12px;flex-wrap:wrap;}
-    .tab{padding:12px 16px;border-radius:8px;background:transparent;border:none;color:var(--muted);cursor:pointer;font-size:14px;min-height:44px;flex:1;}
-    .tab.active{background:var(--accent);color:white;}
-    .tab-content{display:none;}
-    .tab-content.active{display:block;}
-    .platform-options{display:grid;grid-template-columns:repeat(auto-fit,minmax(120px,1fr));gap:8px;margin:12px 0;}
-    .platform-btn{background:rgba(255,255,255,0.05);border:1px solid rgba(255,255,255,0.1);padding:12px;border-radius:8px;cursor:pointer;text-align:center;}
-    .platform-btn.active{background:var(--accent);border-color:var(--accent);}
-    .tool-card{background:rgba(255,255,255,0.05);padding:15px;border-radius:8px;margin:10px 0;}
-    .tool-name{font-weight:bold;color:var(--accent);margin-bottom:5px;}
-    .tool-desc{color:var(--muted);font-size:0.9em;margin-bottom:10px;}
-    @media (max-width:768px){.wrap{padding:12px}.card{padding:16px}.tab-container{flex-direction:column}.platform-options{grid-template-columns:1fr}}
-  </style>
-</head>
-<body>
-  <div class="wrap">
-    <div class="card">
-      <h1>🎬 YouTube Download Assistant</h1>
-      <p class="muted">Download YouTube videos directly to your device</p>
-
-      <div class="tab-container">
-        <button class="tab active" onclick="switchTab('client-tab')">📱 Client Download</button>
-        <button class="tab" onclick="switchTab('desktop-tab')">💻 Desktop Commands</button>
-        <button class="tab" onclick="switchTab('online-tab')">🌐 Online Tools</button>
-      </div>
-
-      <div id="client-tab" class="tab-content active">
-        <form onsubmit="generateClientCommand(event)">
-          <label>YouTube URL</label>
-          <input id="clientUrl" type="url" placeholder="https://www.youtube.com/watch?v=..." required>
-          
-          <div class="row">
-            <div style="flex:1">
-              <label>Format</label>
-              <select id="clientFormat">
-                <option value="video">Video (MP4)</option>
-                <option value="audio">Audio (MP3)</option>
-              </select>
-            </div>
-            <div style="flex:1">
-              <label>Mode</label>
-              <select id="clientMode">
-                <option value="single">Single Video</option>
-                <option value="playlist">Playlist</option>
-              </select>
-            </div>
-          </div>
-
-          <label style="margin-top:16px;">Select Your Platform:</label>
-          <div class="platform-options">
-            <div class="platform-btn active" onclick="selectPlatform('windows', this)">Windows</div>
-            <div class="platform-btn" onclick="selectPlatform('mac', this)">Mac</div>
-            <div class="platform-btn" onclick="selectPlatform('linux', this)">Linux</div>
-            <div class="platform-btn" onclick="selectPlatform('mobile', this)">Mobile</div>
-          </div>
-          
-          <button class="primary" type="submit" style="margin-top:16px;width:100%;">
-            Generate Download Command
-          </button>
-        </form>
-        
-        <div id="clientCommandResult" style="display:none;margin-top:16px;">
-          <div class="info-box">
-            <strong>Download Command:</strong>
-            <pre id="clientCommandOutput"></pre>
-            <button class="copy-btn" onclick="copyClientCommand()">📋 Copy Command</button>
-          </div>
-        </div>
-      </div>
-
-      <div id="desktop-tab" class="tab-content">
-        <form onsubmit="generateLocalCommand(event)">
-          <label>YouTube URL</label>
-          <input id="localUrl" type="url" placeholder="https://www.youtube.com/watch?v=..." required>
-          
-          <div class="row">
-            <div style="flex:1">
-              <label>Format</label>
-              <select id="localFormat">
-                <option value="video">Video (MP4)</option>
-                <option value="audio">Audio (MP3)</option>
-              </select>
-            </div>
-            <div style="flex:1">
-              <label>Mode</label>
-              <select id="localMode">
-                <option value="single">Single Video</option>
-                <option value="playlist">Playlist</option>
-              </select>
-            </div>
-          </div>
-          
-          <button class="primary" type="submit" style="margin-top:16px;width:100%;">
-            Generate Desktop Command
-          </button>
-        </form>
-        
-        <div id="localCommandResult" style="display:none;margin-top:16px;">
-          <div class="info-box">
-            <strong>Desktop Download Command:</strong>
-            <pre id="commandOutput"></pre>
-            <button class="copy-btn" onclick="copyCommand()">📋 Copy Command</button>
-          </div>
-        </div>
-      </div>
-
-      <div id="online-tab" class="tab-content">
-        <form onsubmit="generateOnlineTools(event)">
-          <label>YouTube URL</label>
-          <input id="onlineUrl" type="url" placeholder="https://www.youtube.com/watch?v=..." required>
-          <button class="primary" type="submit" style="margin-top:16px;width:100%;">
-            Get Online Converter Links
-          </button>
-        </form>
-        
-        <div id="onlineResult" style="display:none;margin-top:16px;"></div>
-      </div>
-    </div>
-  </div>
-
-<script>
-let selectedPlatform = 'windows';
-
-function switchTab(tabName) {
-  document.querySelectorAll('.tab-content').forEach(tab => tab.classList.remove('active'));
-  document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
-  document.getElementById(tabName).classList.add('active');
-  event.target.classList.add('active');
-}
-
-function selectPlatform(platform, element) {
-  selectedPlatform = platform;
-  document.querySelectorAll('.platform-btn').forEach(btn => btn.classList.remove('active'));
-  element.classList.add('active');
-}
 
-function generateClientCommand(ev) {
-  ev.preventDefault();
-  const url = document.getElementById('clientUrl').value.trim();
-  const format = document.getElementById('clientFormat').value;
-  const mode = document.getElementById('clientMode').value;
-
-  if(!url) {
-    showError('Please enter a YouTube URL');
-    return;
-  }
-
-  const submitBtn = ev.target.querySelector('button[type="submit"]');
-  submitBtn.disabled = true;
-  submitBtn.textContent = 'Generating...';
-
-  fetch('/generate-client-command', {
-    method: 'POST',
-    headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify({url, format, mode, platform: selectedPlatform})
-  }).then(r => r.json()).then(data => {
-    submitBtn.disabled = false;
-    submitBtn.textContent = 'Generate Download Command';
-    
-    if (data.error) {
-      showError(data.error);
-      return;
-    }
-    
-    document.getElementById('clientCommandOutput').textContent = data.command;
-    document.getElementById('clientCommandResult').style.display = 'block';
-    document.getElementById('clientCommandResult').scrollIntoView({ behavior: 'smooth' });
-    hideError();
-  }).catch(err => {
-    submitBtn.disabled = false;
-    submitBtn.textContent = 'Generate Download Command';
-    showError('Error generating command');
-  });
-}
-
-function generateLocalCommand(ev) {
-  ev.preventDefault();
-  const url = document.getElementById('localUrl').value.trim();
-  const format = document.getElementById('localFormat').value;
-  const mode = document.getElementById('localMode').value;
-
-  if(!url) {
-    showError('Please enter a YouTube URL');
-    return;
-  }
-
-  const submitBtn = ev.target.querySelector('button[type="submit"]');
-  submitBtn.disabled = true;
-  submitBtn.textContent = 'Generating...';
-
-  fetch('/generate-command', {
-    method: 'POST',
-    headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify({url, format, mode})
-  }).then(r => r.json()).then(data => {
-    submitBtn.disabled = false;
-    submitBtn.textContent = 'Generate Desktop Command';
-    
-    if (data.error) {
-      showError(data.error);
-      return;
-    }
-    
-    document.getElementById('commandOutput').textContent = data.command;
-    document.getElementById('localCommandResult').style.display = 'block';
-    document.getElementById('localCommandResult').scrollIntoView({ behavior: 'smooth' });
-    hideError();
-  }).catch(err => {
-    submitBtn.disabled = false;
-    submitBtn.textContent = 'Generate Desktop Command';
-    showError('Error generating command');
-  });
-}
-
-function generateOnlineTools(ev) {
-  ev.preventDefault();
-  const url = document.getElementById('onlineUrl').value.trim();
-
-  if(!url) {
-    showError('Please enter a YouTube URL');
-    return;
-  }
-
-  const submitBtn = ev.target.querySelector('button[type="submit"]');
-  submitBtn.disabled = true;
-  submitBtn.textContent = 'Getting Tools...';
-
-  fetch('/online-tools', {
-    method: 'POST',
-    headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify({url})
-  }).then(r => r.json()).then(data => {
-    submitBtn.disabled = false;
-    submitBtn.textContent = 'Get Online Converter Links';
-    
-    if (data.error) {
-      showError(data.error);
-      return;
-    }
-    
-    const result = document.getElementById('onlineResult');
-    result.innerHTML = `
-      <div class="success">
-        <h3>Online Download Tools</h3>
-        <p>${data.instructions}</p>
-        ${data.tools.map(tool => `
-          <div class="tool-card">
-            <div class="tool-name">${tool.name}</div>
-            <div class="tool-desc">${tool.description}</div>
-            <a href="${tool.url}" target="_blank" style="background:var(--accent);color:white;padding:10px 15px;border-radius:6px;text-decoration:none;display:inline-block;">
-              Open ${tool.name}
-            </a>
-          </div>
-        `).join('')}
-      </div>
-    `;
-    result.style.display = 'block';
-    hideError();
-  }).catch(err => {
-    submitBtn.disabled = false;
-    submitBtn.textContent = 'Get Online Converter Links';
-    showError('Error getting tools');
-  });
-}
-
-function copyClientCommand() {
-  copyToClipboard(document.getElementById('clientCommandOutput').textContent);
-}
+def command_response(command, **extra):
+    # Commands are a pure function of the request, so a strong ETag lets
+    # clients and caches in front of GET requests reuse them.
+    response = jsonify(dict(extra, command=command))
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = COMMAND_CACHE_MAX_AGE
+    return response.make_conditional(request)
+
+def send_asset(asset, cache_control):
+    encoding = asset.negotiate(request.accept_encodings)
+    etag = asset.etags[encoding]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset.encodings[encoding], content_type=asset.content_type)
+        if encoding != 'identity':
+            response.content_encoding = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+@bp.route('/')
+def index():
+    return send_asset(PAGES['/'], 'no-cache')
 
-function copyCommand() {
-  copyToClipboard(document.getElementById('commandOutput').textContent);
-}
+@bp.route('/sw.js')
+def service_worker():
+    return send_asset(PAGES['/sw.js'], 'no-cache')
 
-function copyToClipboard(text) {
-  navigator.clipboard.writeText(text).then(() => {
-    alert('Command copied to clipboard!');
-  });
-}
+@bp.route('/command-rules.json')
+def command_rules_json():
+    return send_asset(PAGES['/command-rules.json'], 'no-cache')
 
-function showError(message) {
-  let errorDiv = document.getElementById('errorArea');
-  if (!errorDiv) {
-    errorDiv = document.createElement('div');
-    errorDiv.id = 'errorArea';
-    errorDiv.className = 'error';
-    document.querySelector('.card').appendChild(errorDiv);
-  }
-  errorDiv.textContent = message;
-  errorDiv.style.display = 'block';
-}
-
-function hideError() {
-  const errorDiv = document.getElementById('errorArea');
-  if (errorDiv) errorDiv.style.display = 'none';
-}
-
-document.querySelectorAll('input[type="url"]').forEach(input => {
-  input.addEventListener('keypress', function(e) {
-    if (e.key === 'Enter') {
-      const activeTab = document.querySelector('.tab-content.active').id;
-      if (activeTab === 'client-tab') generateClientCommand(new Event('submit'));
-      else if (activeTab === 'desktop-tab') generateLocalCommand(new Event('submit'));
-      else if (activeTab === 'online-tab') generateOnlineTools(new Event('submit'));
-    }
-  });
-});
-</script>
-</body>
-</html>
-"""
-
-@app.route('/')
-def index():
-    return render_template_string(HTML)
+@bp.route('/assets/<name>')
+def static_asset(name):
+    asset = STATIC_ASSETS.get(name)
+    if asset is None:
+        abort(404)
+    return send_asset(asset, 'public, max-age=31536000, immutable')
 
+@bp.route('/generate-client-command', methods=['GET', 'POST'])
 @rate_limit()
-@app.route('/generate-client-command', methods=['POST'])
 def generate_client_command():
-    data = request.get_json()
+    data = request.args if request.method == 'GET' else request.get_json()
     url = data.get('url', '').strip()
     fmt = data.get('format', 'video')
     mode = data.get('mode', 'single')
     platform = data.get('platform', 'windows')
+    profile = data.get('profile', DEFAULT_PROFILE)
     
-    if not url or not validate_youtube_url(url):
+    if not validate_youtube_url(url):
         return jsonify({"error": "Invalid YouTube URL"})
+    log_url(url)
     
     # Call the actual command generation function
-    command = create_client_command(url, fmt, mode, platform)
-    return jsonify({"command": command})
+    command = create_client_command(url, fmt, mode, platform, profile)
+    return command_response(command)
 
+@bp.route('/generate-command', methods=['GET', 'POST'])
 @rate_limit()
-@app.route('/generate-command', methods=['POST'])
 def generate_command():
-    data = request.get_json()
+    data = request.args if request.method == 'GET' else request.get_json()
     url = data.get('url', '').strip()
     fmt = data.get('format', 'video')
     mode = data.get('mode', 'single')
+    profile = data.get('profile', DEFAULT_PROFILE)
     
-    if not url or not validate_youtube_url(url):
+    if not validate_youtube_url(url):
         return jsonify({"error": "Invalid YouTube URL"})
+    log_url(url)
     
-    command = generate_desktop_command(url, fmt, mode)
-    return jsonify({"command": command})
+    command = generate_desktop_command(url, fmt, mode, profile)
+    return command_response(command, hint=COOKIES_HINT)
 
+@bp.route('/online-tools', methods=['POST'])
 @rate_limit()
-@app.route('/online-tools', methods=['POST'])
 def online_tools():
     data = request.get_json()
     url = data.get('url', '').strip()
     
-    if not url or not validate_youtube_url(url):
+    if not validate_youtube_url(url):
         return jsonify({"error": "Invalid YouTube URL"})
+    log_url(url)
     
     video_id = extract_video_id(url)
     if not video_id:
         return jsonify({"error": "Could not extract video ID"})
     
-    # Return both tools with their direct URLs
-    tools = {
-        "method": "online_converters", 
-        "instructions": "Click any link below to download directly from online converters",
-        "tools": [
-            {
-                "name": "SSYouTube",
-                "url": f"https://ssyoutube.com/{video_id}",
-                "description": "Fast and reliable YouTube video downloader"
-            },
-            {
-                "name": "SaveFrom.net", 
-                "url": f"https://savefrom.net/watch?v={video_id}",
-                "description": "Browser extension method"
-            }
-        ]
+    # Ranked from the prober's last results; probing never happens on the request path.
+    prober = current_app.extensions.get('converters')
+    ranking = None
+    if prober is not None:
+        prober.start()
+        ranking = prober.ranked()
+    return jsonify(generate_online_tools(video_id, ranking))
+
+def iter_body_lines(stream, max_length=MAX_URL_LENGTH):
+    """Yield decoded lines from ``stream`` one at a time; over-long lines yield None.
+
+    A chunked body that runs past ``MAX_CONTENT_LENGTH`` ends with one more None.
+    """
+    try:
+        while True:
+            line = stream.readline(max_length + 1)
+            if not line:
+                return
+            if len(line) > max_length and not line.endswith(b'\n'):
+                while line and not line.endswith(b'\n'):
+                    line = stream.readline(max_length + 1)
+                yield None
+                continue
+            yield line.decode('utf-8', 'replace')
+    except RequestEntityTooLarge:
+        # Bodies with a Content-Length were refused up front; this one is already streaming.
+        yield None
+
+def read_batch_request():
+    """``(spec, urls)`` of a batch request, with ``urls`` None if the body is malformed.
+
+    JSON bodies are either an object carrying the spec and a "urls" list,
+    or just the list; any other body is read as newline-separated URLs with
+    the spec in the query string.  Bodies over ``MAX_CONTENT_LENGTH`` get a 413.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, list):
+            return request.args, data
+        if not isinstance(data, dict):
+            return request.args, None
+        urls = data.get('urls')
+        return data, urls if isinstance(urls, list) else None
+    return request.args, iter_body_lines(request.stream)
+
+@bp.route('/generate-batch', methods=['POST'])
+@rate_limit()
+def generate_batch():
+    data, urls = read_batch_request()
+    if urls is None:
+        return jsonify({"error": "Expected a list of URLs"}), 400
+
+    fmt = data.get('format', 'video')
+    mode = data.get('mode', 'single')
+    platform = data.get('platform', 'windows')
+    profile = data.get('profile', DEFAULT_PROFILE)
+    target = data.get('target', 'client')
+
+    def generate():
+        index = 0
+        for url in urls:
+            if isinstance(url, str):
+                url = url.strip()
+                if not url:
+                    continue
+            if index >= MAX_BATCH_URLS:
+                yield json.dumps({"error": f"Batch truncated at {MAX_BATCH_URLS} URLs"}) + '\n'
+                return
+
+            item = {"index": index, "url": url}
+            if url is None:
+                item["error"] = "URL too long"
+            elif not isinstance(url, str) or not validate_youtube_url(url):
+                item["error"] = "Invalid YouTube URL"
+            elif target == 'desktop':
+                item["command"] = generate_desktop_command(url, fmt, mode, profile)
+            else:
+                item["command"] = create_client_command(url, fmt, mode, platform, profile)
+            index += 1
+            yield json.dumps(item) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@bp.route('/generate-script', methods=['POST'])
+@rate_limit()
+def generate_script():
+    # Same input as /generate-batch; the script streams out as the URLs are read.
+    data, urls = read_batch_request()
+    if urls is None:
+        return jsonify({"error": "Expected a list of URLs"}), 400
+
+    platform = data.get('platform', 'windows')
+    body = batchscript.script(
+        urls,
+        data.get('format', 'video'),
+        data.get('mode', 'single'),
+        platform,
+        data.get('profile', DEFAULT_PROFILE),
+        data.get('jobs', batchscript.DEFAULT_JOBS),
+        limit=MAX_BATCH_URLS,
+    )
+    return Response(stream_with_context(body), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename="{batchscript.filename(platform)}"',
+    })
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        abort(401)
+    body = metrics_registry.render(extra_labels=(('worker', str(os.getpid())),))
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@bp.route('/debug/profile')
+def profile_endpoint():
+    # Profiles expose code paths and timings, so without a matching token
+    # the endpoint does not exist, even when sampling is on.
+    request_profiler = current_app.extensions.get('profiler')
+    token = current_app.config['PROFILE_TOKEN']
+    if request_profiler is None or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        abort(404)
+
+    # scope=all merges what every worker wrote to PROFILE_DIR.
+    if request.args.get('scope') == 'all':
+        if not request_profiler.directory:
+            return jsonify({"error": "scope=all needs PROFILE_DIR"}), 400
+        routes = profiler.collect_dir(request_profiler.directory)
+    else:
+        routes = request_profiler.snapshot()
+
+    route = request.args.get('route')
+    fmt = request.args.get('format', 'json')
+    focus = tuple(part for part in request.args.get('focus', '').split(',') if part)
+    if route is None or fmt == 'json':
+        selected = routes if route is None else {route: routes[route]} if route in routes else {}
+        return jsonify({
+            "worker": os.getpid(),
+            "mode": request_profiler.mode,
+            "routes": {name: profiler.summarise(entry, focus=focus) for name, entry in selected.items()},
+        })
+
+    entry = routes.get(route)
+    filename = f'{profiler.route_slug(route)}.{fmt}'
+    if fmt == 'pstats' and entry is not None and entry.stats is not None:
+        body, mimetype = profiler.pstats_bytes(entry.stats), 'application/octet-stream'
+    elif fmt == 'collapsed' and entry is not None and entry.stacks:
+        body, mimetype = profiler.collapsed_text(entry.stacks), 'text/plain'
+    else:
+        abort(404)
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@bp.route('/metadata')
+@rate_limit()
+def video_metadata():
+    service = current_app.extensions.get('metadata')
+    if service is None:
+        abort(404)
+    parsed = parse_youtube_url(request.args.get('url', '').strip())
+    if parsed is None:
+        metrics_registry.inc('url_validation_failures_total')
+        return jsonify({"error": "Invalid YouTube URL"}), 400
+    log_url(parsed.canonical_url)
+    try:
+        info, status = service.lookup(parsed.key, parsed.canonical_url)
+    except metadata.MetadataUnavailable as exc:
+        return jsonify({"error": str(exc)}), 404, {'X-Cache': 'negative'}
+    except Exception:
+        current_app.logger.exception('metadata extraction failed for %s', parsed.key)
+        return jsonify({"error": "Could not fetch video information, try again later"}), 502
+    response = jsonify(info)
+    response.headers['X-Cache'] = status
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@bp.route('/playlist-stream')
+@rate_limit()
+def playlist_stream():
+    # Entries are fetched page by page while the response streams, so the
+    # first ones arrive at once and memory does not grow with the playlist.
+    service = current_app.extensions.get('metadata')
+    if service is None:
+        abort(404)
+    parsed = parse_youtube_url(request.args.get('url', '').strip())
+    if parsed is None or parsed.playlist_id is None:
+        return jsonify({"error": "Expected a YouTube playlist URL"}), 400
+    log_url(parsed.canonical_url)
+
+    fmt = request.args.get('format', 'video')
+    platform = request.args.get('platform', 'windows')
+    profile = request.args.get('profile', DEFAULT_PROFILE)
+    target = request.args.get('target', 'client')
+    sse = request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+    offset = request.args.get('offset', '0')
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if sse and last_event_id.isdigit():
+        offset = str(int(last_event_id) + 1)
+    offset = int(offset) if offset.isdigit() else 0
+
+    # The playlist stays open (its YoutubeDL and cookie jar) until the
+    # response is closed, since later pages are fetched while streaming.
+    playlist = contextlib.ExitStack()
+    try:
+        summary, entries = playlist.enter_context(service.extractor.open_playlist(
+            f'https://www.youtube.com/playlist?list={parsed.playlist_id}'))
+    except metadata.ExtractionError as exc:
+        return jsonify({"error": str(exc)}), 404
+    except Exception:
+        current_app.logger.exception('playlist extraction failed for %s', parsed.key)
+        return jsonify({"error": "Could not fetch the playlist, try again later"}), 502
+
+    def emit(kind, data, event_id=None):
+        if sse:
+            prefix = f'id: {event_id}\n' if event_id is not None else ''
+            return f'{prefix}event: {kind}\ndata: {json.dumps(data)}\n\n'
+        return json.dumps(dict(data, type=kind)) + '\n'
+
+    def generate():
+        yield emit('playlist', dict(summary, offset=offset))
+        next_offset = offset
+        try:
+            for index, entry in metadata.iter_entries(entries, offset):
+                video_id = entry.get('id')
+                item = {"index": index, "id": video_id, "title": entry.get('title'), "duration": entry.get('duration')}
+                item["command"] = video_command(video_id, fmt, None if target == 'desktop' else platform, profile)
+                next_offset = index + 1
+                yield emit('entry', item, index)
+        except Exception as exc:
+            current_app.logger.warning('playlist %s stopped at %d: %s', parsed.key, next_offset, exc)
+            yield emit('error', {"error": "Playlist enumeration failed", "next_offset": next_offset})
+            return
+        yield emit('done', {"count": next_offset - offset, "next_offset": next_offset})
+
+    mimetype = 'text/event-stream' if sse else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    response.call_on_close(playlist.close)
+    return response
+
+def get_job_or_404(job_id):
+    queue = current_app.extensions.get('jobs')
+    job = queue.get(job_id) if queue is not None else None
+    if job is None:
+        abort(404)
+    return queue, job
+
+@bp.route('/jobs', methods=['POST'])
+@rate_limit()
+def create_job():
+    queue = current_app.extensions.get('jobs')
+    if queue is None:
+        abort(404)
+    data = request.get_json(silent=True) or {}
+    url = data.get('url', '').strip()
+    fmt = data.get('format', 'video')
+
+    if not validate_youtube_url(url):
+        return jsonify({"error": "Invalid YouTube URL"}), 400
+    log_url(url)
+    try:
+        job = queue.submit(url, fmt, client=request.remote_addr or 'unknown', video_id=extract_video_id(url))
+    except jobs.ClientLimit as exc:
+        return jsonify({"error": str(exc)}), 429
+    except jobs.QueueFull as exc:
+        return jsonify({"error": str(exc)}), 503, {'Retry-After': '30'}
+    body = dict(job.to_dict(), events=f'/jobs/{job.id}/events')
+    return jsonify(body), 202, {'Location': f'/jobs/{job.id}'}
+
+@bp.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    queue, job = get_job_or_404(job_id)
+    if request.method == 'DELETE':
+        queue.cancel(job_id)
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    _, job = get_job_or_404(job_id)
+    last_id = request.headers.get('Last-Event-ID', '0')
+    last_id = int(last_id) if last_id.isdigit() else 0
+    return Response(jobs.sse_events(job, last_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@bp.route('/jobs/<job_id>/file')
+def job_file(job_id):
+    _, job = get_job_or_404(job_id)
+    if job.state != jobs.FINISHED or not job.filename:
+        abort(404)
+    return send_media_file(job.filename, job.download_name)
+
+def send_media_file(path, download_name):
+    # The body is a wsgi.file_wrapper positioned at the range start, so
+    # gunicorn sends it with sendfile() instead of copying it through Python.
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        abort(404)
+    st = os.fstat(f.fileno())
+    size = st.st_size
+    etag = f'{st.st_ino:x}-{size:x}'
+    if request.if_none_match.contains(etag):
+        f.close()
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    byte_range = request.range
+    if_range = request.if_range
+    if byte_range is not None and (len(byte_range.ranges) != 1 or
+                                   ((if_range.etag or if_range.date) and if_range.etag != etag)):
+        byte_range = None
+    start, stop = 0, size
+    if byte_range is not None:
+        span = byte_range.range_for_length(size)
+        if span is None:
+            f.close()
+            return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+        start, stop = span
+    f.seek(start)
+
+    response = Response(
+        wrap_file(request.environ, mediacache.FileRange(f, stop - start)),
+        status=206 if byte_range is not None else 200,
+        mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream',
+        direct_passthrough=True,
+    )
+    response.content_length = stop - start
+    if byte_range is not None:
+        response.content_range = ContentRange('bytes', start, stop, size)
+    response.accept_ranges = 'bytes'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    try:
+        download_name.encode('ascii')
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    except UnicodeEncodeError:
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+    return response
+
+_route_labels = {}
+
+def tag_request_route():
+    # RequestMetrics and the profiler read the matched route from the environ
+    # once the response is done; the label tuple is interned per route.
+    req = request._get_current_object()
+    route = req.url_rule.rule if req.url_rule is not None else 'unmatched'
+    labels = _route_labels.get(route)
+    if labels is None:
+        labels = _route_labels.setdefault(route, (('route', route),))
+    req.environ[metrics.RequestMetrics.ROUTE_KEY] = labels
+
+def start_access_log():
+    request.environ[ACCESS_LOG_START_KEY] = time.perf_counter()
+
+def write_access_log(response):
+    # Builds the record only; formatting and writing happen on the log's thread.
+    req = request._get_current_object()
+    environ = req.environ
+    started = environ.get(ACCESS_LOG_START_KEY)
+    current_app.extensions['access_log'].log({
+        'method': req.method,
+        'route': req.url_rule.rule if req.url_rule is not None else 'unmatched',
+        'status': response.status_code,
+        'latency_ms': round((time.perf_counter() - started) * 1e3, 3) if started is not None else None,
+        'url': environ.get(accesslog.URL_KEY),
+        'rate_limit': environ.get(accesslog.RATE_LIMIT_KEY),
+    })
+    return response
+
+def admit_request():
+    # Runs before the view: take a slot in the route's class or shed the request.
+    req = request._get_current_object()
+    limiter = current_app.extensions['admission'][ROUTE_CLASSES.get(req.endpoint, 'cheap')]
+    try:
+        limiter.acquire()
+    except admission.Rejected as exc:
+        metrics_registry.inc('admission_rejected_total', (('class', exc.name),))
+        return jsonify({"error": "The server is busy, please retry shortly"}), 503, {
+            'Retry-After': str(exc.retry_after),
+        }
+    req.environ[ADMISSION_KEY] = (limiter, time.perf_counter())
+
+def release_on_close(response):
+    # Latency is measured to the response; a streamed body keeps its slot until sent.
+    slot = request.environ.pop(ADMISSION_KEY, None)
+    if slot is not None:
+        limiter, started = slot
+        latency = time.perf_counter() - started
+        if response.is_streamed and not response.direct_passthrough:
+            response.call_on_close(lambda: limiter.release(latency))
+        else:
+            # Buffered bodies cost nothing more, and file bodies bypass Response.close().
+            limiter.release(latency)
+    return response
+
+def release_on_error(exc):
+    slot = request.environ.pop(ADMISSION_KEY, None)
+    if slot is not None:
+        slot[0].release()
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_BODY_BYTES
+    app.config['METRICS_ENABLED'] = METRICS_ENABLED
+    app.config['DOWNLOAD_JOBS_ENABLED'] = DOWNLOAD_JOBS_ENABLED
+    app.config['DOWNLOAD_DIR'] = os.environ.get('DOWNLOAD_DIR', os.path.join(tempfile.gettempdir(), 'utube-downloads'))
+    app.config['DOWNLOAD_WORKERS'] = int(os.environ.get('DOWNLOAD_WORKERS', 2))
+    app.config['DOWNLOAD_QUEUE'] = int(os.environ.get('DOWNLOAD_QUEUE', 8))
+    app.config['DOWNLOAD_PER_CLIENT'] = int(os.environ.get('DOWNLOAD_PER_CLIENT', 2))
+    app.config['MEDIA_CACHE_MB'] = int(os.environ.get('MEDIA_CACHE_MB', 2048))
+    app.config['METADATA_ENABLED'] = METADATA_ENABLED
+    app.config['METADATA_DB'] = os.environ.get('METADATA_DB', os.path.join(tempfile.gettempdir(), 'utube-metadata.db'))
+    app.config['METADATA_TTL'] = float(os.environ.get('METADATA_TTL', 3600))
+    app.config['METADATA_NEGATIVE_TTL'] = float(os.environ.get('METADATA_NEGATIVE_TTL', 300))
+    app.config['METADATA_STALE_TTL'] = float(os.environ.get('METADATA_STALE_TTL', 86400))
+    app.config['METADATA_MAX_ENTRIES'] = int(os.environ.get('METADATA_MAX_ENTRIES', 10000))
+    app.config['METADATA_EXTRACTOR'] = None
+    app.config['COOKIES_DIR'] = os.environ.get('COOKIES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cookies'))
+    app.config['COOKIES_COOLDOWN'] = float(os.environ.get('COOKIES_COOLDOWN', 900))
+    app.config['COOKIES_STRATEGY'] = os.environ.get('COOKIES_STRATEGY', cookiepool.ROUND_ROBIN)
+    app.config['ACCESS_LOG'] = ACCESS_LOG
+    app.config['ACCESS_LOG_MAX_MB'] = int(os.environ.get('ACCESS_LOG_MAX_MB', 50))
+    app.config['ACCESS_LOG_ROTATE_SECONDS'] = float(os.environ.get('ACCESS_LOG_ROTATE_SECONDS', 86400))
+    app.config['ACCESS_LOG_BACKUPS'] = int(os.environ.get('ACCESS_LOG_BACKUPS', 7))
+    app.config['ACCESS_LOG_QUEUE'] = int(os.environ.get('ACCESS_LOG_QUEUE', 10000))
+    app.config['ADMISSION_ENABLED'] = ADMISSION_ENABLED
+    expensive_limit = int(os.environ.get('ADMISSION_EXPENSIVE_LIMIT', 2))
+    app.config['ADMISSION_CLASSES'] = {
+        'cheap': {'limit': 64, 'queue_size': 64, 'queue_timeout': 1.0, 'adaptive': False},
+        'expensive': {
+            'limit': expensive_limit,
+            'max_limit': int(os.environ.get('ADMISSION_EXPENSIVE_MAX', 4 * expensive_limit)),
+            'queue_size': int(os.environ.get('ADMISSION_EXPENSIVE_QUEUE', 1)),
+            'queue_timeout': float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 0.25)),
+        },
+        'streaming': {'limit': int(os.environ.get('ADMISSION_STREAMING_LIMIT', 2)), 'adaptive': False},
     }
-    return jsonify(tools)
+    app.config['CONVERTER_PROBE_INTERVAL'] = CONVERTER_PROBE_INTERVAL
+    app.config['CONVERTERS'] = converters.CONVERTERS
+    app.config['PROFILE_SAMPLE_EVERY'] = PROFILE_SAMPLE_EVERY
+    app.config['PROFILE_TOKEN'] = PROFILE_TOKEN
+    app.config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'cprofile')
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+    # Reverse proxies in front of the app that append to X-Forwarded-For; 1 on Render.
+    app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', 0))
+    if config:
+        app.config.update(config)
+    app.register_blueprint(bp)
+
+    cookies = None
+    if (app.config['DOWNLOAD_JOBS_ENABLED'] or app.config['METADATA_ENABLED']) and os.path.isdir(app.config['COOKIES_DIR']):
+        # One pool for every extraction in this app, so rotation and quarantine are shared.
+        cookies = app.extensions['cookies'] = cookiepool.CookiePool(
+            app.config['COOKIES_DIR'], cooldown=app.config['COOKIES_COOLDOWN'], strategy=app.config['COOKIES_STRATEGY'])
+    if app.config['DOWNLOAD_JOBS_ENABLED']:
+        os.makedirs(app.config['DOWNLOAD_DIR'], exist_ok=True)
+        cache = None
+        if app.config['MEDIA_CACHE_MB'] > 0:
+            cache = app.extensions['media_cache'] = mediacache.MediaCache(
+                os.path.join(app.config['DOWNLOAD_DIR'], 'cache'), app.config['MEDIA_CACHE_MB'] * 1024 * 1024)
+        app.extensions['jobs'] = jobs.JobQueue(
+            app.config['DOWNLOAD_DIR'],
+            workers=app.config['DOWNLOAD_WORKERS'],
+            max_queued=app.config['DOWNLOAD_QUEUE'],
+            per_client=app.config['DOWNLOAD_PER_CLIENT'],
+            cache=cache,
+            flight=singleflight.FileGroup(os.path.join(app.config['DOWNLOAD_DIR'], 'flight')),
+            cookies=cookies,
+        )
+    if app.config['METADATA_ENABLED']:
+        app.extensions['metadata'] = metadata.MetadataService(
+            metadata.SQLiteStore(app.config['METADATA_DB'], max_entries=app.config['METADATA_MAX_ENTRIES']),
+            app.config['METADATA_EXTRACTOR'] or metadata.YtDlpExtractor(cookies=cookies),
+            ttl=app.config['METADATA_TTL'],
+            negative_ttl=app.config['METADATA_NEGATIVE_TTL'],
+            stale_ttl=app.config['METADATA_STALE_TTL'],
+            flight=singleflight.FileGroup(app.config['METADATA_DB'] + '.flight'),
+        )
+    if app.config['CONVERTER_PROBE_INTERVAL'] > 0:
+        # Started by the first /online-tools request, in the worker that serves it.
+        app.extensions['converters'] = converters.HealthProber(
+            app.config['CONVERTERS'], interval=app.config['CONVERTER_PROBE_INTERVAL'])
+
+    profiling = app.config['PROFILE_SAMPLE_EVERY'] > 0 or bool(app.config['PROFILE_TOKEN'])
+    if app.config['METRICS_ENABLED'] or profiling:
+        app.before_request(tag_request_route)
+    if app.config['ACCESS_LOG']:
+        # Registered before admission control, so time spent queueing for a slot is logged too.
+        app.extensions['access_log'] = accesslog.AccessLog(
+            app.config['ACCESS_LOG'],
+            max_bytes=app.config['ACCESS_LOG_MAX_MB'] * 1024 * 1024,
+            interval=app.config['ACCESS_LOG_ROTATE_SECONDS'],
+            backups=app.config['ACCESS_LOG_BACKUPS'],
+            queue_size=app.config['ACCESS_LOG_QUEUE'],
+        )
+        app.before_request(start_access_log)
+        app.after_request(write_access_log)
+    if app.config['ADMISSION_ENABLED']:
+        app.extensions['admission'] = {
+            name: admission.Limiter(name, **settings) for name, settings in app.config['ADMISSION_CLASSES'].items()
+        }
+        app.before_request(admit_request)
+        app.after_request(release_on_close)
+        app.teardown_request(release_on_error)
+    if profiling:
+        if app.config['PROFILE_DIR']:
+            os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        app.wsgi_app = app.extensions['profiler'] = profiler.Profiler(
+            app.wsgi_app, metrics.RequestMetrics.ROUTE_KEY,
+            sample_every=app.config['PROFILE_SAMPLE_EVERY'],
+            mode=app.config['PROFILE_MODE'],
+            token=app.config['PROFILE_TOKEN'],
+            directory=app.config['PROFILE_DIR'],
+        )
+    if app.config['METRICS_ENABLED']:
+        app.wsgi_app = metrics.RequestMetrics(app.wsgi_app, metrics_registry)
+    if app.config['PROXY_HOPS'] > 0:
+        # Rate limits and per-client job quotas key on remote_addr, which must be
+        # the client's address, not the proxy's.  Only the trusted hops are read.
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_HOPS'])
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     print("🚀 YouTube Download Assistant Started")
@@ -0,0 +1,93 @@
+# assets.py
+"""Static front-end assets, built once at startup.
+
+Stylesheets and scripts are renamed after a hash of their content and
+``index.html`` is rewritten to point at the hashed names, so those files
+can be cached forever while the page itself is revalidated with its
+ETag.  Every file is stored pre-compressed with gzip and, when the
+``brotli`` package is installed, brotli.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.json': 'application/json',
+}
+
+# Below this size compression costs more than it saves on the wire.
+MIN_COMPRESS_SIZE = 256
+
+
+class Asset:
+    __slots__ = ('name', 'content_type', 'encodings', 'etags')
+
+    def __init__(self, name, body):
+        self.name = name
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        self.encodings = {'identity': body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.encodings['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(body, quality=11)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        # Strong validators must differ between representations.
+        self.etags = {encoding: f'{digest}-{encoding}' for encoding in self.encodings}
+
+    def negotiate(self, accept_encodings):
+        """Pick the smallest representation the client accepts."""
+        best = 'identity'
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and accept_encodings[encoding]:
+                best = encoding
+                break
+        return best
+
+
+def _hashed_name(name, body):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}'
+
+
+def build(generated=None, static_dir=STATIC_DIR, hashed=('app.css', 'commands.js', 'app.js')):
+    """Return ``(pages, assets)``.
+
+    ``pages`` maps ``/``, ``/sw.js`` and one ``/<name>`` per entry of
+    ``generated`` (name to bytes) to assets that must be revalidated.
+    ``assets`` maps hashed file names to assets that never change.
+    """
+    assets = {}
+    with open(os.path.join(static_dir, 'index.html'), 'rb') as f:
+        page = f.read()
+    for name in hashed:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            body = f.read()
+        hashed_name = _hashed_name(name, body)
+        assets[hashed_name] = Asset(hashed_name, body)
+        page = page.replace(f'/assets/{name}'.encode(), f'/assets/{hashed_name}'.encode())
+
+    pages = {'/': Asset('index.html', page)}
+    for name, body in (generated or {}).items():
+        pages[f'/{name}'] = Asset(name, body)
+
+    shell = sorted(pages) + [f'/assets/{name}' for name in sorted(assets)]
+    version = hashlib.sha256(b''.join(pages[p].encodings['identity'] for p in sorted(pages)))
+    for name in sorted(assets):
+        version.update(name.encode())
+    with open(os.path.join(static_dir, 'sw.js'), 'rb') as f:
+        worker = f.read()
+    worker = worker.replace(b'__CACHE_NAME__', f'app-shell-{version.hexdigest()[:10]}'.encode())
+    worker = worker.replace(b'__APP_SHELL__', json.dumps(shell).encode())
+    pages['/sw.js'] = Asset('sw.js', worker)
+    return pages, assets
@@ -0,0 +1,160 @@
+# batchscript.py
+"""Ready-to-run scripts that download a list of URLs in parallel.
+
+The script runs the same yt-dlp command as the client command for the
+platform (``commands.CLIENT_PREFIXES``), once per URL with at most
+``jobs`` running at a time: through ``xargs -P`` in bash on mac, linux and
+Termux, and through PowerShell background jobs on Windows.  Every run
+shares ``commands.ARCHIVE_FILE``, so running the script again skips what
+already finished.
+
+Scripts are generated as a stream of lines with the URL list last but one,
+so a long list is never held in memory.  Only recognised YouTube URLs are
+written, in canonical form, which needs no quoting in either shell; other
+entries are counted and reported in a closing comment, never echoed.
+"""
+from commands import ARCHIVE_FILE, CLIENT_PREFIXES, DEFAULT_PROFILE, SHELLS, normalize
+from urlparser import parse_youtube_url
+
+DEFAULT_JOBS = 4
+MAX_JOBS = 16
+FILENAMES = {'posix': 'download.sh', 'windows': 'download.ps1'}
+
+_POSIX_HEADER = '''#!/usr/bin/env bash
+# Downloads every URL listed below, {jobs} at a time (override with JOBS=8).
+# Finished downloads are recorded in {archive}; run the script
+# again to retry failures without fetching anything twice.
+JOBS="${{JOBS:-{jobs}}}"
+'''
+
+_POSIX_LIST = '''xargs -n 1 -P "$JOBS" {command} <<'URLS'
+'''
+
+_POSIX_FOOTER = '''URLS
+status=$?
+if [ "$status" -ne 0 ]; then
+  echo "Some downloads failed; run this script again to retry them." >&2
+fi
+exit "$status"
+'''
+
+_POWERSHELL_HEADER = '''# Downloads every URL listed below, {jobs} at a time (override with -Jobs 8).
+# Run with: powershell -ExecutionPolicy Bypass -File download.ps1
+# Finished downloads are recorded in {archive}; run the script
+# again to retry failures without fetching anything twice.
+param([int]$Jobs = {jobs})
+$Directory = (Get-Location).Path
+$Download = {{
+    param($Url, $Directory)
+    Set-Location -LiteralPath $Directory
+    {command} $Url 2>&1
+    if ($LASTEXITCODE -ne 0) {{ throw "yt-dlp failed for $Url" }}
+}}
+$Script:Failed = 0
+function Receive-Finished {{
+    foreach ($Job in @(Get-Job | Where-Object {{ $_.State -ne 'Running' }})) {{
+        if ($Job.State -eq 'Failed') {{ $Script:Failed++ }}
+        Receive-Job -Job $Job -ErrorAction Continue
+        Remove-Job -Job $Job
+    }}
+}}
+$Urls = @(
+'''
+
+_POWERSHELL_FOOTER = ''')
+foreach ($Url in $Urls) {
+    while (@(Get-Job -State Running).Count -ge $Jobs) {
+        Wait-Job -Job @(Get-Job -State Running) -Any | Out-Null
+        Receive-Finished
+    }
+    Start-Job -ScriptBlock $Download -ArgumentList $Url, $Directory | Out-Null
+}
+Get-Job | Wait-Job | Out-Null
+Receive-Finished
+if ($Script:Failed -gt 0) {
+    Write-Warning "$($Script:Failed) downloads failed; run this script again to retry them."
+    exit 1
+}
+'''
+
+
+def filename(platform):
+    return FILENAMES[SHELLS.get(platform, 'posix')]
+
+
+def clamp_jobs(jobs):
+    """Parallelism from a request value: an int in ``1..MAX_JOBS``, else the default."""
+    try:
+        jobs = int(jobs)
+    except (TypeError, ValueError):
+        return DEFAULT_JOBS
+    return min(max(jobs, 1), MAX_JOBS)
+
+
+def _split_prefix(platform, fmt, mode, profile):
+    """``(install steps, yt-dlp command)`` from the client command prefix."""
+    install, _, command = CLIENT_PREFIXES[platform, fmt, mode, profile].rpartition(' && ')
+    if '--download-archive' not in command:
+        command += f' --download-archive {ARCHIVE_FILE}'
+    return install, command
+
+
+def _targets(urls, limit, skipped):
+    """Canonical URLs from ``urls``, deduplicated; ``skipped`` counts the rest by reason."""
+    seen = set()
+    for url in urls:
+        if isinstance(url, str):
+            url = url.strip()
+            if not url:
+                continue
+        if len(seen) >= limit:
+            skipped['over the limit'] += 1
+            continue
+        parsed = parse_youtube_url(url) if isinstance(url, str) else None
+        if parsed is None:
+            skipped['not a YouTube URL'] += 1
+        elif parsed.key in seen:
+            skipped['duplicate'] += 1
+        else:
+            seen.add(parsed.key)
+            yield parsed.canonical_url
+
+
+def _skipped_note(skipped):
+    counts = ', '.join(f'{count} {reason}' for reason, count in skipped.items() if count)
+    return f'# Skipped entries: {counts}\n' if counts else ''
+
+
+def script(urls, fmt, mode, platform, profile=DEFAULT_PROFILE, jobs=DEFAULT_JOBS, limit=10000):
+    """Yield the download script for ``urls`` line by line.
+
+    ``urls`` may be any iterable of strings (``None`` for unreadable
+    entries) and is consumed lazily; at most ``limit`` URLs are included.
+    """
+    fmt, mode, platform, profile = normalize(fmt, mode, platform, profile)
+    install, command = _split_prefix(platform, fmt, mode, profile)
+    skipped = {'not a YouTube URL': 0, 'duplicate': 0, 'over the limit': 0}
+    values = {'jobs': clamp_jobs(jobs), 'archive': ARCHIVE_FILE, 'command': command}
+    targets = _targets(urls, limit, skipped)
+    # GNU xargs runs its command once even with no input, so an empty list
+    # gets a script that does nothing.
+    first = next(targets, None)
+
+    if first is None:
+        yield '# No YouTube URLs to download.\n'
+    elif SHELLS[platform] == 'windows':
+        yield _POWERSHELL_HEADER.format(**values)
+        yield f"    '{first}'\n"
+        for url in targets:
+            yield f"    '{url}'\n"
+        yield _POWERSHELL_FOOTER
+    else:
+        yield _POSIX_HEADER.format(**values)
+        if install:
+            yield f'{install} || exit 1\n'
+        yield _POSIX_LIST.format(**values)
+        yield first + '\n'
+        for url in targets:
+            yield url + '\n'
+        yield _POSIX_FOOTER
+    yield _skipped_note(skipped)
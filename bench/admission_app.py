@@ -0,0 +1,31 @@
+# bench/admission_app.py
+"""The app with /metadata backed by a slow stand-in extractor, for load tests.
+
+    gunicorn --pythonpath bench admission_app:app
+
+Every lookup holds its worker thread for ``SLOW_EXTRACT_SECONDS`` (default
+0.5) like a real yt-dlp extraction, without touching the network.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+EXTRACT_SECONDS = float(os.environ.get('SLOW_EXTRACT_SECONDS', 0.5))
+
+
+class SlowExtractor:
+    def extract(self, url):
+        time.sleep(EXTRACT_SECONDS)
+        return {'title': url, 'formats': []}
+
+
+app = app_module.create_app({
+    'METADATA_ENABLED': True,
+    'METADATA_DB': os.path.join(tempfile.mkdtemp(prefix='utube-bench-'), 'metadata.db'),
+    'METADATA_EXTRACTOR': SlowExtractor(),
+})
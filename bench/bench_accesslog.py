@@ -0,0 +1,151 @@
+# bench/bench_accesslog.py
+"""Per-request cost of the access log on /generate-client-command.
+
+    python bench/bench_accesslog.py [--number 50000] [--load] [--duration 10]
+
+Times the request hooks on their own, against a file and against a sink
+that stalls 2 ms per write, then a /generate-client-command round trip
+through the test client with no access log, the queued log, and a plain
+synchronous ``logging.FileHandler`` writing each line on the request
+thread.  ``--load`` also drives gunicorn with 16 keep-alive clients with
+the log off and on, and reports throughput, latency and lines written.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', str(10 ** 9))
+
+import accesslog
+import app as app_module
+import load
+from urlparser import parse_youtube_url
+
+BODY = {'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'platform': 'linux'}
+ROUTE_MIX = [(1, 'POST', '/generate-client-command')]
+
+
+class SyncAccessLog:
+    """The naive alternative: format and write every record on the request thread."""
+
+    def __init__(self, path, stall=0.0):
+        self.handler = logging.FileHandler(path)
+        self.stall = stall
+        self.dropped = 0
+
+    def log(self, fields):
+        url = fields.pop('url', None)
+        parsed = parse_youtube_url(url) if url else None
+        fields['video_id'] = parsed.video_id if parsed else None
+        time.sleep(self.stall)
+        self.handler.emit(logging.LogRecord('utube.access', logging.INFO, __file__, 0,
+                                            json.dumps(fields, separators=(',', ':')), None, None))
+
+
+class StalledWriter(accesslog.RotatingWriter):
+    """A writer on a sink that blocks for ``stall`` seconds per write, like a stuck pipe or disk."""
+
+    def __init__(self, path, stall):
+        super().__init__(path)
+        self.stall = stall
+
+    def write(self, text, now=None):
+        time.sleep(self.stall)
+        super().write(text, now)
+
+
+def hook_only(access_log, number):
+    """Wall time and request-thread CPU time of the access log hooks, inside one request context."""
+    flask_app = app_module.create_app({'METRICS_ENABLED': False})
+    flask_app.extensions['access_log'] = access_log
+    ctx = flask_app.test_request_context('/generate-client-command', method='POST')
+    ctx.push()
+    ctx.request.url_rule = flask_app.url_map._rules_by_endpoint['main.generate_client_command'][0]
+    response = flask_app.response_class('{}')
+
+    def one_request():
+        app_module.start_access_log()
+        app_module.log_url(BODY['url'])
+        app_module.write_access_log(response)
+
+    wall = cpu = float('inf')
+    for _ in range(5):
+        started, started_cpu = time.perf_counter(), time.thread_time()
+        for _ in range(number):
+            one_request()
+        wall = min(wall, time.perf_counter() - started)
+        cpu = min(cpu, time.thread_time() - started_cpu)
+    ctx.pop()
+    return wall / number, cpu / number
+
+
+def round_trips(tmp, number, repeat=5):
+    """Best time per request for each variant, interleaving the runs to cancel drift."""
+    clients = {'off': app_module.create_app({'METRICS_ENABLED': False}).test_client()}
+    queued = app_module.create_app({'METRICS_ENABLED': False, 'ACCESS_LOG': os.path.join(tmp, 'queued.log')})
+    clients['queued'] = queued.test_client()
+    sync = app_module.create_app({'METRICS_ENABLED': False, 'ACCESS_LOG': os.path.join(tmp, 'sync.log')})
+    sync.extensions['access_log'] = SyncAccessLog(os.path.join(tmp, 'sync.log'))
+    clients['synchronous'] = sync.test_client()
+    best = dict.fromkeys(clients, float('inf'))
+    for _ in range(repeat):
+        for name, client in clients.items():
+            seconds = timeit.timeit(lambda: client.post('/generate-client-command', json=BODY, buffered=True),
+                                    number=number)
+            best[name] = min(best[name], seconds / number)
+    queued.extensions['access_log'].stop()
+    return best, queued.extensions['access_log'].dropped
+
+
+def count_lines(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=50000)
+    parser.add_argument('--load', action='store_true', help='also load-test gunicorn with the log off and on')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=8767)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{"hooks":<30} {"wall us":>8} {"request-thread CPU us":>22}')
+        for stall in (0.0, 0.002):
+            queued = accesslog.AccessLog(os.path.join(tmp, 'hook.log'), queue_size=args.number * 5 + 1)
+            queued.writer = StalledWriter(queued.writer.path, stall)
+            sink = 'stalling sink' if stall else 'file'
+            number = args.number if not stall else args.number // 50
+            for name, access_log in ((f'queued, {sink}', queued),
+                                     (f'synchronous, {sink}', SyncAccessLog(os.path.join(tmp, 'sync.log'), stall))):
+                wall, cpu = hook_only(access_log, number)
+                print(f'{name:<30} {wall * 1e6:>8.2f} {cpu * 1e6:>22.2f}')
+            queued.stop()
+        best, dropped = round_trips(tmp, max(1, args.number // 25))
+        for name, seconds in best.items():
+            extra = '' if name == 'off' else f'  (+{(seconds - best["off"]) * 1e6:.1f} us)'
+            print(f'round trip, access log {name + ":":<13} {seconds * 1e6:8.1f} us/request{extra}')
+        print(f'queued records dropped: {dropped}')
+        if not args.load:
+            return
+
+        print(f'\n{"gunicorn":<16} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"lines":>8}')
+        for name, path in (('access log off', None), ('access log on', os.path.join(tmp, 'access.log'))):
+            env = {'ACCESS_LOG': path} if path else {}
+            with load.SpawnedServer(args.port, env) as server:
+                result = load.run(server.target, args.concurrency, args.duration, route_mix=ROUTE_MIX)
+            lines = count_lines(path) if path else '-'
+            print(f'{name:<16} {result["rps"]:>8.0f} {result["p50_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {lines:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# bench/bench_index.py
+"""Bytes on the wire and server CPU per page view, before and after precompressed assets.
+
+    python bench/bench_index.py [--views 2000]
+
+"before" renders the page the way index() used to: CSS and JS inlined and
+the whole document pushed through render_template_string on every hit.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template_string
+
+import app as app_module
+import assets
+
+
+def legacy_page():
+    with open(os.path.join(assets.STATIC_DIR, 'index.html')) as f:
+        page = f.read()
+    with open(os.path.join(assets.STATIC_DIR, 'app.css')) as f:
+        css = f.read()
+    with open(os.path.join(assets.STATIC_DIR, 'app.js')) as f:
+        js = f.read()
+    page = page.replace('<link rel="stylesheet" href="/assets/app.css">', f'<style>\n{css}</style>')
+    page = page.replace('<script src="/assets/commands.js"></script>\n', '')
+    return page.replace('<script src="/assets/app.js"></script>', f'<script>\n{js}</script>')
+
+
+def measure(client, path, views, headers=None):
+    client.get(path, headers=headers)
+    start = time.process_time()
+    for _ in range(views):
+        response = client.get(path, headers=headers)
+    cpu = (time.process_time() - start) / views
+    return len(response.data), cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--views', type=int, default=2000)
+    args = parser.parse_args()
+
+    flask_app = app_module.app
+    html = legacy_page()
+    flask_app.add_url_rule('/legacy-index', 'legacy_index', lambda: render_template_string(html))
+    client = flask_app.test_client()
+
+    first = client.get('/')
+    asset_paths = [f'/assets/{name}' for name in app_module.STATIC_ASSETS]
+    etag = first.headers['ETag']
+
+    rows = [('before: inline page, no compression', '/legacy-index', None)]
+    for encoding in ('identity', 'gzip', 'br'):
+        rows.append((f'after: page, {encoding}', '/', {'Accept-Encoding': encoding}))
+    rows.append(('after: page, 304 revalidation', '/', {'If-None-Match': etag}))
+
+    print(f'{"case":<40} {"bytes":>8} {"cpu us/view":>12}')
+    for name, path, headers in rows:
+        size, cpu = measure(client, path, args.views, headers)
+        print(f'{name:<40} {size:>8} {cpu * 1e6:>12.1f}')
+
+    # A first visit also fetches the hashed assets once; later visits hit the cache.
+    for encoding in ('identity', 'gzip', 'br'):
+        total = sum(len(client.get(p, headers={'Accept-Encoding': encoding}).data) for p in asset_paths)
+        print(f'{"after: hashed assets (first visit), " + encoding:<40} {total:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# bench/bench_metrics.py
+"""Per-request cost of the /metrics instrumentation.
+
+    python bench/bench_metrics.py [--number 50000]
+
+Times the route hook and middleware on their own, then a full
+/generate-client-command round trip through the test client with
+instrumentation on and off.  The round trips alternate between the two
+apps in short runs and report the median of the paired differences, since
+on a small shared machine the best or mean of a few long runs is
+dominated by noise.
+"""
+import argparse
+import os
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', str(10 ** 9))
+
+import app as app_module
+import metrics
+
+BODY = {'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'platform': 'linux'}
+
+
+def instrumentation_only(number):
+    """The route hook plus the middleware wrapped around a no-op WSGI app."""
+    flask_app = app_module.create_app({'METRICS_ENABLED': False})
+    ctx = flask_app.test_request_context('/generate-client-command', method='POST')
+    ctx.push()
+    ctx.request.url_rule = flask_app.url_map._rules_by_endpoint['main.generate_client_command'][0]
+    environ = ctx.request.environ
+
+    def inner_app(environ, start_response):
+        app_module.tag_request_route()
+        start_response('200 OK', [])
+        return [b'']
+
+    middleware = metrics.RequestMetrics(inner_app, app_module.metrics_registry)
+    start_response = lambda status, headers, exc_info=None: None
+
+    def one_request():
+        middleware(environ, start_response).close()
+
+    seconds = min(timeit.repeat(one_request, number=number, repeat=5))
+    ctx.pop()
+    return seconds / number
+
+
+def round_trips(pairs, number=30):
+    """Per-request times with metrics off and on, from ``pairs`` alternating runs of ``number`` requests."""
+    clients = {enabled: app_module.create_app({'METRICS_ENABLED': enabled}).test_client()
+               for enabled in (False, True)}
+    runs = {False: [], True: []}
+    for _ in range(pairs):
+        for enabled, client in clients.items():
+            seconds = timeit.timeit(lambda: client.post('/generate-client-command', json=BODY, buffered=True), number=number)
+            runs[enabled].append(seconds / number)
+    return runs[False], runs[True]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f'instrumentation only:    {instrumentation_only(args.number) * 1e6:8.2f} us/request')
+    off, on = round_trips(max(1, args.number // 100))
+    print(f'round trip, metrics off: {min(off) * 1e6:8.1f} us/request (best)')
+    print(f'round trip, metrics on:  {min(on) * 1e6:8.1f} us/request (best)')
+    deltas = sorted(b - a for a, b in zip(off, on))
+    print(f'metrics on - off:        {statistics.median(deltas) * 1e6:+8.1f} us/request (median of {len(deltas)} pairs, '
+          f'range {deltas[0] * 1e6:+.0f} to {deltas[-1] * 1e6:+.0f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# bench/bench_ratelimit.py
+"""Per-request cost and memory of the rate limiter at 100k distinct IPs.
+
+    python bench/bench_ratelimit.py [--clients 100000] [--backend memory|sqlite]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratelimit import MemoryBackend, RateLimiter, SQLiteBackend
+
+
+def legacy_hit(request_times, user_ip, current_time, max_per_minute=15):
+    # The list-per-IP limiter this module replaced, kept for comparison.
+    window_start = current_time - 60
+    if user_ip in request_times:
+        request_times[user_ip] = [t for t in request_times[user_ip] if t > window_start]
+    else:
+        request_times[user_ip] = []
+    if len(request_times[user_ip]) >= max_per_minute:
+        return False
+    request_times[user_ip].append(current_time)
+    return True
+
+
+def ips(n):
+    return [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(n)]
+
+
+def run(name, hit, keys, rounds):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    now = 1_700_000_000.0
+    start = time.perf_counter()
+    for r in range(rounds):
+        for key in keys:
+            hit(key, now)
+            now += 0.00001
+    elapsed = time.perf_counter() - start
+    current = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    total = rounds * len(keys)
+    print(f'{name:<10} {elapsed / total * 1e6:8.2f} us/request  '
+          f'{current / 1024 / 1024:8.1f} MiB  ({current / len(keys):.0f} B/client)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=100_000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory')
+    args = parser.parse_args()
+
+    keys = ips(args.clients)
+
+    request_times = {}
+    run('legacy', lambda key, now: legacy_hit(request_times, key, now), keys, args.rounds)
+
+    if args.backend == 'sqlite':
+        with tempfile.TemporaryDirectory() as tmp:
+            limiter = RateLimiter(15, backend=SQLiteBackend(os.path.join(tmp, 'rl.db')))
+            run('sqlite', limiter.hit, keys, args.rounds)
+    else:
+        limiter = RateLimiter(15, backend=MemoryBackend())
+        run('memory', limiter.hit, keys, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
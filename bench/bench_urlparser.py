@@ -0,0 +1,128 @@
+# bench/bench_urlparser.py
+"""Compare urlparser against the regex-chain validator it replaced.
+
+    python bench/bench_urlparser.py [--repeat 20000]
+
+The corpus check runs first and exits non-zero if the new parser
+disagrees with the old functions on any URL both are meant to handle.
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from urlparser import parse_many, parse_youtube_url, validate_many
+
+
+def legacy_validate_youtube_url(url):
+    patterns = [
+        r'^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)[\w-]+',
+        r'^(https?://)?(www\.)?youtube\.com/embed/[\w-]+',
+        r'^(https?://)?(www\.)?youtube\.com/(playlist|watch)\?.*list=[\w-]+',
+    ]
+    if not url.startswith(('http://', 'https://')):
+        return False
+    malicious_patterns = [r'\.\./', r'file://', r'javascript:', r'data:', r'vbscript:']
+    for pattern in malicious_patterns:
+        if re.search(pattern, url, re.IGNORECASE):
+            return False
+    return any(re.match(pattern, url, re.IGNORECASE) for pattern in patterns)
+
+
+def legacy_extract_video_id(url):
+    patterns = [
+        r'(?:youtube\.com/watch\?v=|youtu\.be/)([\w-]{11})',
+        r'(?:youtube\.com/embed/)([\w-]{11})',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+LIST_ID = 'PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI'
+
+# URLs whose result must match the legacy functions exactly.
+SHARED = [
+    f'https://www.youtube.com/watch?v={VIDEO_ID}',
+    f'http://youtube.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}&t=42s',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}&list={LIST_ID}',
+    f'https://youtu.be/{VIDEO_ID}',
+    f'https://youtu.be/{VIDEO_ID}?si=abcdef',
+    f'https://www.youtube.com/embed/{VIDEO_ID}',
+    f'https://www.youtube.com/playlist?list={LIST_ID}',
+    f'https://www.youtube.com/watch?list={LIST_ID}',
+    f'youtube.com/watch?v={VIDEO_ID}',
+    f'ftp://youtube.com/watch?v={VIDEO_ID}',
+    f'https://vimeo.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/../watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}&next=javascript:alert(1)',
+    f'https://www.youtube.com/channel/UC{VIDEO_ID}',
+    'https://www.youtube.com/',
+    '',
+]
+
+# URL forms only the new parser accepts.
+EXTENDED = [
+    f'https://www.youtube.com/shorts/{VIDEO_ID}',
+    f'https://m.youtube.com/watch?v={VIDEO_ID}',
+    f'https://music.youtube.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube-nocookie.com/embed/{VIDEO_ID}',
+    f'https://www.youtube.com/live/{VIDEO_ID}',
+    f'https://www.youtube.com/watch?feature=share&v={VIDEO_ID}',
+]
+
+
+def check():
+    failures = 0
+    for url in SHARED:
+        parsed = parse_youtube_url(url)
+        got = (parsed is not None, parsed.video_id if parsed else None)
+        legacy_valid = legacy_validate_youtube_url(url)
+        want = (legacy_valid, legacy_extract_video_id(url) if legacy_valid else None)
+        if got != want:
+            failures += 1
+            print(f'MISMATCH {url!r}: parser={got} legacy={want}')
+    for url in EXTENDED:
+        parsed = parse_youtube_url(url)
+        if parsed is None or parsed.video_id != VIDEO_ID:
+            failures += 1
+            print(f'NOT PARSED {url!r}: {parsed}')
+    print(f'corpus: {len(SHARED) + len(EXTENDED)} urls, {failures} failures')
+    return failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20000)
+    parser.add_argument('--bulk', type=int, default=5000)
+    args = parser.parse_args()
+
+    if not check():
+        sys.exit(1)
+
+    url = f'https://www.youtube.com/watch?v={VIDEO_ID}&list={LIST_ID}&t=42s'
+    cases = [
+        ('legacy validate+extract',
+         lambda: legacy_validate_youtube_url(url) and legacy_extract_video_id(url)),
+        ('parse_youtube_url', lambda: parse_youtube_url(url)),
+    ]
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=args.repeat, repeat=3))
+        print(f'{name:<26} {seconds / args.repeat * 1e6:7.2f} us/url')
+
+    urls = (SHARED + EXTENDED) * (args.bulk // len(SHARED + EXTENDED) + 1)
+    urls = urls[:args.bulk]
+    for name, fn in (('validate_many', validate_many), ('parse_many', parse_many)):
+        seconds = min(timeit.repeat(lambda: fn(urls), number=10, repeat=3)) / 10
+        print(f'{name:<26} {seconds * 1e3:7.2f} ms per {len(urls)} urls')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# bench/load.py
+"""Closed-loop HTTP load generator for the app's routes.
+
+Each client thread keeps one keep-alive connection and sends requests
+drawn from a weighted route and URL mix.  Point it at a running server
+with ``--target``, or let it start ``gunicorn app:app`` itself with
+``--spawn`` so server RSS can be reported as well.
+"""
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (weight, URL) pairs roughly matching what users paste.
+URL_MIX = [
+    (50, 'https://www.youtube.com/watch?v={id}'),
+    (20, 'https://youtu.be/{id}?si=Jk3n2B'),
+    (10, 'https://www.youtube.com/shorts/{id}'),
+    (8, 'https://www.youtube.com/playlist?list=PL{id}{id}'),
+    (7, 'https://m.youtube.com/watch?v={id}&t=42s'),
+    (5, 'https://example.com/watch?v={id}'),
+]
+
+ROUTE_MIX = [
+    (30, 'GET', '/'),
+    (40, 'POST', '/generate-client-command'),
+    (15, 'POST', '/generate-command'),
+    (15, 'POST', '/online-tools'),
+]
+
+PLATFORMS = ('windows', 'mac', 'linux', 'mobile')
+ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+
+def _weighted(mix):
+    weights = [entry[0] for entry in mix]
+    return lambda rng: rng.choices(mix, weights)[0]
+
+
+def _request_for(rng, pick_route, pick_url):
+    _, method, path = pick_route(rng)
+    if method == 'GET':
+        return method, path, None, {'Accept-Encoding': 'gzip, br'}
+    video_id = ''.join(rng.choice(ID_ALPHABET) for _ in range(11))
+    body = {
+        'url': pick_url(rng)[1].format(id=video_id),
+        'format': rng.choice(('video', 'audio')),
+        'mode': rng.choice(('single', 'playlist')),
+        'platform': rng.choice(PLATFORMS),
+    }
+    return method, path, json.dumps(body), {'Content-Type': 'application/json'}
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def process_rss_kb(pid):
+    """RSS of ``pid`` and all of its children, in KiB (Linux only)."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return total
+
+
+def run(target, concurrency=16, duration=10.0, warmup=1.0, seed=1, server_pid=None, route_mix=ROUTE_MIX):
+    """Drive ``target`` and return a results dict (throughput, latency percentiles, RSS)."""
+    parts = urlsplit(target)
+    pick_route = _weighted(route_mix)
+    pick_url = _weighted(URL_MIX)
+    samples = {path: [] for _, _, path in route_mix}
+    errors = {'status': 0, 'connection': 0}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        local = {path: [] for path in samples}
+        local_errors = {'status': 0, 'connection': 0}
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            method, path, body, headers = _request_for(rng, pick_route, pick_url)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                local_errors['connection'] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                continue
+            elapsed = time.perf_counter() - now
+            if now < start_at:
+                continue
+            if status >= 400:
+                local_errors['status'] += 1
+            local[path].append(elapsed)
+        conn.close()
+        with lock:
+            for path, values in local.items():
+                samples[path].extend(values)
+            for key, value in local_errors.items():
+                errors[key] += value
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def summarise(values):
+        values = sorted(values)
+        return {
+            'requests': len(values),
+            'rps': len(values) / duration,
+            'p50_ms': _percentile(values, 0.50) * 1e3,
+            'p95_ms': _percentile(values, 0.95) * 1e3,
+            'p99_ms': _percentile(values, 0.99) * 1e3,
+        }
+
+    result = summarise([v for values in samples.values() for v in values])
+    result['routes'] = {path: summarise(values) for path, values in samples.items()}
+    result['errors'] = errors
+    result['concurrency'] = concurrency
+    if server_pid is not None:
+        result['server_rss_kb'] = process_rss_kb(server_pid)
+    return result
+
+
+class SpawnedServer:
+    """``gunicorn app:app`` on a local port with the rate limit lifted, as a context manager.
+
+    ``args`` replaces the app spec, e.g. ``('--pythonpath', 'bench', 'admission_app:app')``.
+    """
+
+    def __init__(self, port=8765, env=None, args=('app:app',)):
+        self.port = port
+        self.args = tuple(args)
+        self.env = dict(os.environ, PORT=str(port), RATE_LIMIT_PER_MINUTE='1000000000', **(env or {}))
+        self.process = None
+
+    @property
+    def target(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *self.args, '--log-level', 'warning'],
+            cwd=ROOT, env=self.env,
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                conn.request('GET', '/')
+                conn.getresponse().read()
+                conn.close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError('gunicorn did not start within 30s')
+
+    def __exit__(self, *exc):
+        self.process.send_signal(signal.SIGTERM)
+        self.process.wait(timeout=30)
@@ -0,0 +1,102 @@
+# bench/load_admission.py
+"""Cheap-route latency while /metadata is overloaded, with and without admission control.
+
+    python bench/load_admission.py [--cheap 4] [--flood 16] [--duration 10]
+
+Starts ``bench/admission_app.py`` under gunicorn with one gthread worker and
+measures POST /generate-client-command from ``--cheap`` clients three times:
+on its own, next to ``--flood`` clients hammering /metadata (0.5 s stand-in
+extractions) with ADMISSION_ENABLED=0, and the same with admission control on.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load import ID_ALPHABET, SpawnedServer, _percentile
+
+APP = ('--pythonpath', 'bench', 'admission_app:app')
+
+
+def drive(port, cheap, flood, duration, warmup=1.0):
+    """Run both client groups; return ({group: sorted latencies}, {group: Counter of statuses})."""
+    latencies = {'cheap': [], 'expensive': []}
+    statuses = {'cheap': Counter(), 'expensive': Counter()}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def client(group, index):
+        rng = random.Random(index)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local, counts = [], Counter()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            video_id = ''.join(rng.choice(ID_ALPHABET) for _ in range(11))
+            url = f'https://www.youtube.com/watch?v={video_id}'
+            try:
+                if group == 'cheap':
+                    conn.request('POST', '/generate-client-command', body=json.dumps({'url': url}),
+                                 headers={'Content-Type': 'application/json'})
+                else:
+                    conn.request('GET', f'/metadata?url={url}')
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 'error'
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            if now >= start_at:
+                local.append(time.perf_counter() - now)
+                counts[status] += 1
+        conn.close()
+        with lock:
+            latencies[group].extend(local)
+            statuses[group].update(counts)
+
+    threads = [threading.Thread(target=client, args=('cheap', i)) for i in range(cheap)]
+    threads += [threading.Thread(target=client, args=('expensive', 1000 + i)) for i in range(flood)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {group: sorted(values) for group, values in latencies.items()}, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cheap', type=int, default=4)
+    parser.add_argument('--flood', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--threads', type=int, default=4, help='GUNICORN_THREADS for the single worker')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    scenarios = (('cheap only', '1', 0), ('flood, admission off', '0', args.flood),
+                 ('flood, admission on', '1', args.flood))
+    print(f'{"scenario":<22} {"cheap req":>9} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8}  expensive statuses')
+    for name, enabled, flood in scenarios:
+        env = {'WEB_CONCURRENCY': '1', 'GUNICORN_THREADS': str(args.threads), 'ADMISSION_ENABLED': enabled}
+        with SpawnedServer(args.port, env, APP):
+            latencies, statuses = drive(args.port, args.cheap, flood, args.duration)
+        cheap = latencies['cheap']
+        expensive = ', '.join(f'{status}: {count}' for status, count in sorted(statuses['expensive'].items(), key=str))
+        print(f'{name:<22} {len(cheap):>9} {_percentile(cheap, 0.50) * 1e3:>8.1f} '
+              f'{_percentile(cheap, 0.99) * 1e3:>8.1f} {(cheap[-1] if cheap else 0) * 1e3:>8.1f}  {expensive or "-"}')
+        errors = sum(count for status, count in statuses['cheap'].items() if status != 200)
+        if errors:
+            print(f'{"":<22} cheap non-200 responses: {dict(statuses["cheap"])}')
+
+
+if __name__ == '__main__':
+    main()
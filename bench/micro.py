@@ -0,0 +1,53 @@
+# bench/micro.py
+"""Microbenchmarks for the per-request helpers in app.py."""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from ratelimit import MemoryBackend, RateLimiter
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI&t=42s'
+
+
+def _cases():
+    limiter = RateLimiter(10 ** 9, backend=MemoryBackend())
+    ips = [f'10.0.{i >> 8}.{i & 255}' for i in range(4096)]
+    counter = iter(range(10 ** 12))
+    # A new video id per call, so every call misses the command cache.
+    fresh = (f'https://www.youtube.com/watch?v={n:011d}' for n in range(10 ** 12))
+
+    def limiter_hit():
+        limiter.hit(ips[next(counter) & 4095])
+
+    # One pushed request context stands in for a live request; building a
+    # fresh one per call would cost far more than the decorator itself.
+    flask_app = app_module.create_app()
+    flask_app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.1.2.3'}).push()
+    wrapped = app_module.rate_limit(10 ** 9)(lambda: None)
+
+    return {
+        'validate_youtube_url': lambda: app_module.validate_youtube_url(URL),
+        'extract_video_id': lambda: app_module.extract_video_id(URL),
+        'create_client_command': lambda: app_module.create_client_command(URL, 'video', 'single', 'windows'),
+        'create_client_command_uncached': lambda: app_module.create_client_command(
+            next(fresh), 'video', 'single', 'windows'),
+        'rate_limiter_hit': limiter_hit,
+        'rate_limit_decorator': wrapped,
+    }
+
+
+def run(number=20000, repeat=5):
+    """Return ``{name: nanoseconds per call}``, best of ``repeat`` runs."""
+    results = {}
+    for name, fn in _cases().items():
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[name] = best / number * 1e9
+    return results
+
+
+if __name__ == '__main__':
+    for name, ns in run().items():
+        print(f'{name:<32} {ns:10.0f} ns/op')
@@ -0,0 +1,118 @@
+# bench/suite.py
+"""Benchmark suite with a regression gate.
+
+    python bench/suite.py --save bench/baseline.json
+    python bench/suite.py --compare bench/baseline.json
+
+Runs the microbenchmarks in bench/micro.py and a load test from
+bench/load.py (against ``--target``, or a gunicorn it starts itself), prints
+the results and optionally stores them as JSON.  With ``--compare`` it
+exits 1 when a microbenchmark or p99 latency got slower, or throughput
+dropped, by more than the given thresholds.  Baselines are only
+meaningful on the machine that recorded them.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load
+import micro
+
+
+def collect(args):
+    results = {
+        'recorded': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'machine': {'python': platform.python_version(), 'cpus': os.cpu_count()},
+    }
+    if not args.skip_micro:
+        results['micro_ns'] = micro.run(number=args.micro_number)
+    if not args.skip_load:
+        if args.target:
+            results['load'] = load.run(args.target, args.concurrency, args.duration)
+        else:
+            with load.SpawnedServer(port=args.port) as server:
+                results['load'] = load.run(
+                    server.target, args.concurrency, args.duration, server_pid=server.process.pid)
+    return results
+
+
+def report(results):
+    for name, ns in results.get('micro_ns', {}).items():
+        print(f'{name:<32} {ns:10.0f} ns/op')
+    summary = results.get('load')
+    if summary:
+        print(f'\n{"route":<28} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        rows = [('all', summary)] + list(summary['routes'].items())
+        for name, row in rows:
+            print(f'{name:<28} {row["rps"]:>8.0f} {row["p50_ms"]:>8.2f} {row["p95_ms"]:>8.2f} {row["p99_ms"]:>8.2f}')
+        print(f'errors: {summary["errors"]}')
+        if 'server_rss_kb' in summary:
+            print(f'server RSS: {summary["server_rss_kb"] / 1024:.1f} MiB')
+
+
+def compare(baseline, current, threshold, latency_threshold):
+    """Return a list of human-readable regressions."""
+    regressions = []
+    for name, base in baseline.get('micro_ns', {}).items():
+        now = current.get('micro_ns', {}).get(name)
+        if now is not None and now > base * (1 + threshold):
+            regressions.append(f'{name}: {base:.0f} -> {now:.0f} ns/op')
+
+    base_load, now_load = baseline.get('load'), current.get('load')
+    if base_load and now_load:
+        rows = [('all', base_load, now_load)]
+        rows += [(path, row, now_load['routes'].get(path)) for path, row in base_load['routes'].items()]
+        for name, base, now in rows:
+            if not now:
+                continue
+            if now['rps'] < base['rps'] * (1 - threshold):
+                regressions.append(f'{name}: throughput {base["rps"]:.0f} -> {now["rps"]:.0f} req/s')
+            if now['p99_ms'] > base['p99_ms'] * (1 + latency_threshold):
+                regressions.append(f'{name}: p99 {base["p99_ms"]:.2f} -> {now["p99_ms"]:.2f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--target', help='base URL of a running server; default starts gunicorn')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--micro-number', type=int, default=20000)
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--save', metavar='FILE')
+    parser.add_argument('--compare', metavar='FILE')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='allowed slowdown for ns/op and throughput (default 0.20)')
+    parser.add_argument('--latency-threshold', type=float, default=0.50,
+                        help='allowed p99 increase (default 0.50)')
+    args = parser.parse_args()
+
+    results = collect(args)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.latency_threshold)
+        if regressions:
+            print('\nREGRESSIONS:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('\nno regressions against', args.compare)
+
+
+if __name__ == '__main__':
+    main()
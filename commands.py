@@ -0,0 +1,246 @@
+# commands.py
+"""yt-dlp command templates.
+
+Everything in a command except the URL depends only on (platform, format,
+mode, profile), so every prefix is built once at import time.  A request
+then costs one table lookup plus quoting the URL for the target shell.
+
+Profiles tune a command for the user's connection; see ``PROFILES``.
+"""
+import shlex
+from functools import lru_cache
+from urllib.parse import quote
+
+import urlparser
+from urlparser import ParsedURL, parse_youtube_url
+
+PLATFORMS = ('windows', 'mac', 'linux', 'mobile')
+FORMATS = ('video', 'audio')
+MODES = ('single', 'playlist')
+DEFAULT_PROFILE = 'standard'
+
+# Windows commands run in cmd or PowerShell; everything else in a POSIX shell
+# (Termux on mobile).
+SHELLS = {
+    'windows': 'windows',
+    'mac': 'posix',
+    'linux': 'posix',
+    'mobile': 'posix',
+}
+
+# The desktop command is shown to users on any OS, so it must read the same
+# in every shell.
+DESKTOP_SHELL = 'windows'
+
+# Shown next to the desktop command, never inside it: cmd has no comments,
+# so anything after the URL would reach yt-dlp as arguments.
+COOKIES_HINT = 'Add --cookies cookies.txt for better success'
+
+# Where yt-dlp records finished downloads so re-runs skip them.
+ARCHIVE_FILE = 'yt-dlp-archive.txt'
+
+# Download profiles.  ``formats`` overrides the -f selector per format and
+# target ('client' or 'desktop'), and is always double-quoted in the
+# command since '[', '<' and '|' mean something to every shell.  ``options``
+# lists extra arguments per platform, with 'desktop' for the
+# platform-neutral command.  aria2c is
+# safe to name everywhere: yt-dlp falls back to its own downloader when it
+# is not installed.  Termux gets no aria2c, since it is rarely installed on
+# phones and extra connections cost battery there.
+_ARIA2C = ('--downloader aria2c', '--downloader-args "aria2c:-x 8 -s 8 -k 1M"')
+_FAST = ('--concurrent-fragments 8', '--throttled-rate 100K') + _ARIA2C
+_INCREMENTAL = (f'--download-archive {ARCHIVE_FILE}', '--lazy-playlist', '--ignore-errors',
+                '--throttled-rate 100K', '--sleep-requests 1')
+
+PROFILES = {
+    'standard': {
+        'label': 'Standard',
+        'formats': {},
+        'options': {},
+    },
+    'fast': {
+        'label': 'Fast connection',
+        'formats': {},
+        'options': {
+            'windows': _FAST,
+            'mac': _FAST,
+            'linux': _FAST,
+            'mobile': ('--concurrent-fragments 4', '--throttled-rate 100K'),
+            'desktop': _FAST,
+        },
+    },
+    'metered': {
+        'label': 'Metered / mobile data',
+        'formats': {
+            ('video', 'client'): 'best[height<=480]/best[height<=360]/worst',
+            ('video', 'desktop'): 'best[height<=480]/worst',
+            ('audio', 'client'): 'bestaudio[abr<=96]/worstaudio/worst',
+            ('audio', 'desktop'): 'bestaudio[abr<=96]/worstaudio/worst',
+        },
+        'options': {
+            'mobile': ('--limit-rate 2M',),
+        },
+    },
+    'huge-playlist': {
+        'label': 'Huge playlist',
+        'formats': {},
+        'options': {
+            'windows': _INCREMENTAL + ('--concurrent-fragments 4',),
+            'mac': _INCREMENTAL + ('--concurrent-fragments 4',),
+            'linux': _INCREMENTAL + ('--concurrent-fragments 4',),
+            'mobile': _INCREMENTAL + ('--concurrent-fragments 2',),
+            'desktop': _INCREMENTAL + ('--concurrent-fragments 4',),
+        },
+    },
+}
+
+# Characters left unescaped in URLs placed inside Windows double quotes.
+# '%' is kept so existing escapes survive; '"', '$', '`', '!' and '^' are
+# percent-encoded because cmd or PowerShell would interpret them.
+_WINDOWS_URL_SAFE = "/:?=&#;,+@.-_~%[]()*'"
+
+
+def normalize(fmt, mode, platform='linux', profile=DEFAULT_PROFILE):
+    """Map request values onto table keys, with the same fallbacks the routes always had.
+
+    Values come straight from request JSON, so lists and dicts are possible
+    and must fall back like any other unknown value, not fail the lookup.
+    """
+    if not isinstance(platform, str) or platform not in SHELLS:
+        platform = 'linux'
+    if fmt != 'video':
+        fmt = 'audio'
+    if mode != 'single':
+        mode = 'playlist'
+    if not isinstance(profile, str) or profile not in PROFILES:
+        profile = DEFAULT_PROFILE
+    return fmt, mode, platform, profile
+
+
+def quote_url(url, shell):
+    if shell == 'posix':
+        return shlex.quote(url)
+    return '"' + quote(url, safe=_WINDOWS_URL_SAFE) + '"'
+
+
+def _client_prefix(platform, fmt, mode, profile):
+    if platform == "windows":
+        base_command = "python -m yt_dlp"
+    elif platform == "mobile":
+        base_command = "pkg install python -y && pip install yt-dlp && python -m yt_dlp"
+    else:  # mac, linux
+        base_command = "python3 -m yt_dlp"
+
+    tuning = PROFILES[profile]
+    if fmt == 'video':
+        format_option = tuning['formats'].get(('video', 'client'), 'best[height<=1080]/best[height<=720]/best')
+        command_parts = [base_command, '-f', f'"{format_option}"', '--merge-output-format', 'mp4']
+    else:  # audio
+        format_option = tuning['formats'].get(('audio', 'client'), 'bestaudio/best')
+        command_parts = [base_command, '-f', f'"{format_option}"', '--extract-audio', '--audio-format', 'mp3']
+
+    if mode == 'single':
+        command_parts.append('--no-playlist')
+    else:
+        command_parts.append('--yes-playlist')
+
+    if platform == "windows":
+        command_parts.append('--no-check-certificate')
+    elif platform == "mobile":
+        command_parts.append('--no-check-certificate')
+        command_parts.append('--compat-options no-certifi')
+
+    command_parts.extend(tuning['options'].get(platform, ()))
+    return ' '.join(command_parts)
+
+
+def _desktop_prefix(fmt, mode, profile):
+    tuning = PROFILES[profile]
+    if fmt == 'video':
+        format_option = tuning['formats'].get(('video', 'desktop'), 'best[height<=1080]/best')
+        command_parts = ["python -m yt_dlp", '-f', f'"{format_option}"', '--merge-output-format', 'mp4']
+    else:
+        format_option = tuning['formats'].get(('audio', 'desktop'), 'bestaudio/best')
+        command_parts = ["python -m yt_dlp", '-f', f'"{format_option}"', '--extract-audio', '--audio-format', 'mp3']
+
+    if mode == 'single':
+        command_parts.append('--no-playlist')
+    else:
+        command_parts.append('--yes-playlist')
+
+    command_parts.extend(tuning['options'].get('desktop', ()))
+    return ' '.join(command_parts)
+
+
+CLIENT_PREFIXES = {
+    (platform, fmt, mode, profile): _client_prefix(platform, fmt, mode, profile)
+    for platform in PLATFORMS for fmt in FORMATS for mode in MODES for profile in PROFILES
+}
+
+DESKTOP_PREFIXES = {
+    (fmt, mode, profile): _desktop_prefix(fmt, mode, profile)
+    for fmt in FORMATS for mode in MODES for profile in PROFILES
+}
+
+
+@lru_cache(maxsize=8192)
+def _cached_client_command(platform, fmt, mode, profile, video_id, playlist_id):
+    url = ParsedURL('', video_id, playlist_id, None, '').canonical_url
+    return f'{CLIENT_PREFIXES[platform, fmt, mode, profile]} {quote_url(url, SHELLS[platform])}'
+
+
+@lru_cache(maxsize=8192)
+def _cached_desktop_command(fmt, mode, profile, video_id, playlist_id):
+    url = ParsedURL('', video_id, playlist_id, None, '').canonical_url
+    return f'{DESKTOP_PREFIXES[fmt, mode, profile]} {quote_url(url, DESKTOP_SHELL)}'
+
+
+def client_command(url, fmt, mode, platform, profile=DEFAULT_PROFILE):
+    """Command for running yt-dlp on the user's own ``platform``.
+
+    Recognised YouTube URLs are rewritten to their canonical form and served
+    from a cache keyed by video and playlist id; anything else is quoted as is.
+    """
+    fmt, mode, platform, profile = normalize(fmt, mode, platform, profile)
+    parsed = parse_youtube_url(url)
+    if parsed is not None:
+        return _cached_client_command(platform, fmt, mode, profile, parsed.video_id, parsed.playlist_id)
+    return f'{CLIENT_PREFIXES[platform, fmt, mode, profile]} {quote_url(url, SHELLS[platform])}'
+
+
+def desktop_command(url, fmt, mode, profile=DEFAULT_PROFILE):
+    """Platform-neutral command shown on the desktop tab."""
+    fmt, mode, _, profile = normalize(fmt, mode, profile=profile)
+    parsed = parse_youtube_url(url)
+    if parsed is not None:
+        return _cached_desktop_command(fmt, mode, profile, parsed.video_id, parsed.playlist_id)
+    return f'{DESKTOP_PREFIXES[fmt, mode, profile]} {quote_url(url, DESKTOP_SHELL)}'
+
+
+def video_command(video_id, fmt, platform=None, profile=DEFAULT_PROFILE):
+    """Single-video command for a known id, bypassing the caches.
+
+    For ids seen once, like the entries of a long playlist, which would
+    only push popular videos out of the caches.  ``platform=None`` gives the
+    desktop command.
+    """
+    if platform is None:
+        fmt, mode, _, profile = normalize(fmt, 'single', profile=profile)
+        return _cached_desktop_command.__wrapped__(fmt, mode, profile, video_id, None)
+    fmt, mode, platform, profile = normalize(fmt, 'single', platform, profile)
+    return _cached_client_command.__wrapped__(platform, fmt, mode, profile, video_id, None)
+
+
+def rules():
+    """Everything static/commands.js needs to build the same commands in the browser."""
+    return {
+        'client': {'|'.join(key): prefix for key, prefix in CLIENT_PREFIXES.items()},
+        'desktop': {'|'.join(key): prefix for key, prefix in DESKTOP_PREFIXES.items()},
+        'profiles': {name: profile['label'] for name, profile in PROFILES.items()},
+        'defaultProfile': DEFAULT_PROFILE,
+        'shells': SHELLS,
+        'desktopShell': DESKTOP_SHELL,
+        'cookiesHint': COOKIES_HINT,
+        'windowsUrlSafe': _WINDOWS_URL_SAFE,
+        'url': urlparser.rules(),
+    }
@@ -0,0 +1,154 @@
+# converters.py
+"""Online converter registry, ranked by a background health prober.
+
+``CONVERTERS`` lists the services /online-tools links to.  A
+``HealthProber`` runs an asyncio loop in a daemon thread that probes every
+service's ``probe_url`` concurrently each ``interval`` seconds and keeps
+the last ``window`` outcomes per service.  Requests only read that state:
+``ranked()`` orders services fastest healthy first, then unprobed ones,
+then failing ones, and reuses the order for ``cache_ttl`` seconds.
+Samples older than ``max_age`` are ignored, so a prober that has stopped
+does not keep vouching for a service.
+
+A probe is an HTTP/1.1 HEAD request over asyncio streams (TLS for https),
+timed to the status line.  Any status below 500 counts as reachable:
+converters often answer HEAD or unknown clients with 403 or 405 while up.
+"""
+import asyncio
+import os
+import ssl
+import statistics
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+UP = 'up'
+DOWN = 'down'
+UNKNOWN = 'unknown'
+_STATUS_ORDER = {UP: 0, UNKNOWN: 1, DOWN: 2}
+
+
+class Converter:
+    __slots__ = ('name', 'url_template', 'description', 'probe_url')
+
+    def __init__(self, name, url_template, description, probe_url):
+        self.name = name
+        self.url_template = url_template
+        self.description = description
+        self.probe_url = probe_url
+
+    def link(self, video_id):
+        return self.url_template.format(video_id=video_id)
+
+
+CONVERTERS = (
+    Converter('SSYouTube', 'https://ssyoutube.com/{video_id}',
+              'Fast and reliable YouTube video downloader', 'https://ssyoutube.com/'),
+    Converter('SaveFrom.net', 'https://savefrom.net/watch?v={video_id}',
+              'Browser extension method', 'https://savefrom.net/'),
+)
+
+
+def unranked(converters=CONVERTERS):
+    """``(converter, status, latency)`` in registry order, for when nothing is probed."""
+    return [(converter, UNKNOWN, None) for converter in converters]
+
+
+class HealthProber:
+    def __init__(self, converters=CONVERTERS, interval=300.0, timeout=5.0, window=10, max_age=None,
+                 cache_ttl=5.0):
+        self.converters = tuple(converters)
+        self.interval = interval
+        self.timeout = timeout
+        self.max_age = 3 * interval if max_age is None else max_age
+        self.cache_ttl = cache_ttl
+        self.rounds = 0
+        self._samples = {converter.name: deque(maxlen=window) for converter in self.converters}
+        self._lock = threading.Lock()
+        self._ranked = None
+        self._ranked_at = 0.0
+        self._thread_pid = None
+        self._ssl = None
+
+    def start(self):
+        """Start probing in this process unless it already is; returns at once."""
+        with self._lock:
+            # Threads do not survive a fork, so each gunicorn worker starts its own.
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=asyncio.run, args=(self._run(),), name='converter-prober', daemon=True).start()
+
+    async def _run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    async def probe_all(self):
+        """Probe every converter once, concurrently, and record the outcomes."""
+        outcomes = await asyncio.gather(*(self._probe(converter.probe_url) for converter in self.converters))
+        now = time.time()
+        with self._lock:
+            for converter, (ok, latency) in zip(self.converters, outcomes):
+                self._samples[converter.name].append((now, ok, latency))
+            self._ranked = None
+            self.rounds += 1
+
+    async def _probe(self, url):
+        """``(reachable, seconds to the status line)``."""
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(self._head(urlsplit(url)), self.timeout)
+        except Exception:
+            # Refused, timed out, TLS failure or garbage: all mean unusable right now.
+            return False, None
+        return status < 500, time.perf_counter() - started
+
+    async def _head(self, parts):
+        context = None
+        if parts.scheme == 'https':
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            context = self._ssl
+        port = parts.port or (443 if context else 80)
+        reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=context)
+        try:
+            path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+            writer.write(
+                f'HEAD {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                f'User-Agent: utube-health/1\r\nConnection: close\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
+
+    def health(self, name, now=None):
+        """``(status, median latency of recent successful probes)`` for one converter."""
+        now = time.time() if now is None else now
+        with self._lock:
+            recent = [sample for sample in self._samples[name] if now - sample[0] <= self.max_age]
+        if not recent:
+            return UNKNOWN, None
+        latencies = [latency for _, ok, latency in recent if ok]
+        # Down if the latest probe failed or most recent ones did.
+        if not recent[-1][1] or len(latencies) * 2 < len(recent):
+            return DOWN, None
+        return UP, statistics.median(latencies)
+
+    def ranked(self, now=None):
+        """``(converter, status, latency)`` for every converter, fastest healthy first."""
+        now = time.time() if now is None else now
+        ranked = self._ranked
+        if ranked is not None and now - self._ranked_at < self.cache_ttl:
+            return ranked
+        rounds = self.rounds
+        rows = [(converter, *self.health(converter.name, now)) for converter in self.converters]
+        ranked = sorted(rows, key=lambda row: (_STATUS_ORDER[row[1]], row[2] or 0.0))
+        with self._lock:
+            # Do not cache an order computed from samples a probe round has since replaced.
+            if self.rounds == rounds:
+                self._ranked, self._ranked_at = ranked, now
+        return ranked
@@ -0,0 +1,188 @@
+# cookiepool.py
+"""A pool of Netscape cookie files for server-side extraction.
+
+Every ``*.txt`` jar in the cookies directory is parsed once into memory.
+The directory is re-checked at most every ``rescan_interval`` seconds, and
+a jar is parsed again only when its mtime or size changes.  Only one
+thread rescans at a time; the others keep using the jars they already
+have.  ``acquire`` hands out jars round-robin, or with ``least-throttled``
+the jar whose last throttling is oldest.  Jars that are quarantined are
+skipped.
+
+Callers wrap an extraction in ``use()``.  If the extraction fails with a
+throttling error (HTTP 429, or YouTube's bot check), the jar is
+quarantined for ``cooldown`` seconds.  Replacing a jar's file with fresh
+cookies lifts its quarantine.  ``install`` gives a ``yt_dlp.YoutubeDL`` its
+own copy of a jar's cookies, so yt-dlp never reads or rewrites the file.
+"""
+import contextlib
+import copy
+import glob
+import http.cookiejar
+import itertools
+import os
+import threading
+import time
+
+ROUND_ROBIN = 'round-robin'
+LEAST_THROTTLED = 'least-throttled'
+
+# Lower-cased fragments of yt-dlp errors that mean "slow down", not "broken".
+THROTTLE_MARKERS = ('http error 429', 'too many requests', 'not a bot', 'rate-limited', 'rate limited')
+
+_HTTPONLY_PREFIX = '#HttpOnly_'
+
+
+def is_throttled(exc):
+    message = str(exc).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def parse(text):
+    """``http.cookiejar.Cookie`` objects from a Netscape cookie file; malformed lines are skipped."""
+    cookies = []
+    for line in text.splitlines():
+        rest = {}
+        if line.startswith(_HTTPONLY_PREFIX):
+            line, rest = line[len(_HTTPONLY_PREFIX):], {'HttpOnly': None}
+        if not line.strip() or line.startswith('#'):
+            continue
+        fields = line.split('\t')
+        if len(fields) != 7:
+            continue
+        domain, _, path, secure, expires, name, value = fields
+        try:
+            expires = (int(expires) or None) if expires else None
+        except ValueError:
+            continue
+        if not name:
+            # cookies.txt writes a bare ``Set-Cookie: foo`` as a nameless cookie.
+            name, value = value, None
+        cookies.append(http.cookiejar.Cookie(
+            0, name, value, None, False, domain, domain.startswith('.'), domain.startswith('.'),
+            path, True, secure == 'TRUE', expires, expires is None, None, None, rest,
+        ))
+    return tuple(cookies)
+
+
+class CookieFile:
+    """One parsed jar and its rotation state."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.cookies = ()
+        self.signature = None
+        self.uses = 0
+        self.throttles = 0
+        self.used_at = 0
+        self.throttled_at = 0.0
+        self.quarantined_until = 0.0
+
+    def cookiejar(self):
+        """A new yt-dlp cookie jar holding copies of this jar's cookies."""
+        from yt_dlp.cookies import YoutubeDLCookieJar
+
+        jar = YoutubeDLCookieJar()
+        for cookie in self.cookies:
+            jar.set_cookie(copy.copy(cookie))
+        return jar
+
+
+class CookiePool:
+    def __init__(self, directory, cooldown=900.0, strategy=ROUND_ROBIN, rescan_interval=2.0):
+        if strategy not in (ROUND_ROBIN, LEAST_THROTTLED):
+            raise ValueError(f'unknown strategy {strategy!r}')
+        self.directory = directory
+        self.cooldown = cooldown
+        self.strategy = strategy
+        self.rescan_interval = rescan_interval
+        self.parses = 0
+        self._files = {}
+        self._jars = ()
+        self._scanned_at = None
+        self._ticks = itertools.count(1)
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+
+    def refresh(self, now=None):
+        """Pick up added, removed and modified jars; unchanged jars are not parsed again."""
+        now = time.monotonic() if now is None else now
+        if self._scanned_at is not None and 0 <= now - self._scanned_at < self.rescan_interval:
+            return
+        # Until the first scan is done there is nothing to fall back on, so wait for it.
+        if not self._scan_lock.acquire(blocking=self._scanned_at is None):
+            return
+        try:
+            files = {}
+            for path in sorted(glob.glob(os.path.join(self.directory, '*.txt'))):
+                jar = files[path] = self._files.get(path) or CookieFile(path)
+                try:
+                    stat = os.stat(path)
+                    if (stat.st_mtime_ns, stat.st_size) != jar.signature:
+                        with open(path, encoding='utf-8', errors='replace') as f:
+                            # The file may have been replaced since the stat; record what was read.
+                            stat = os.fstat(f.fileno())
+                            signature = (stat.st_mtime_ns, stat.st_size)
+                            cookies = parse(f.read())
+                        with self._lock:
+                            jar.cookies, jar.signature = cookies, signature
+                            jar.quarantined_until = 0.0
+                        self.parses += 1
+                except OSError:
+                    continue
+            # Empty or unreadable files stay known, so they are not parsed again either.
+            self._files = files
+            self._jars = tuple(jar for jar in files.values() if jar.cookies)
+            self._scanned_at = now
+        finally:
+            self._scan_lock.release()
+
+    def acquire(self, now=None):
+        """The next jar to use, or ``None`` when there are none or all are quarantined."""
+        now = time.monotonic() if now is None else now
+        self.refresh(now)
+        with self._lock:
+            ready = [jar for jar in self._jars if jar.quarantined_until <= now]
+            if not ready:
+                return None
+            if self.strategy == LEAST_THROTTLED:
+                jar = min(ready, key=lambda jar: (jar.throttled_at, jar.used_at))
+            else:
+                jar = min(ready, key=lambda jar: jar.used_at)
+            jar.used_at = next(self._ticks)
+            jar.uses += 1
+            return jar
+
+    def quarantine(self, jar, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            jar.throttles += 1
+            jar.throttled_at = now
+            jar.quarantined_until = now + self.cooldown
+
+    @contextlib.contextmanager
+    def use(self):
+        """Yield a jar (or ``None``); a throttling error raised inside quarantines it."""
+        jar = self.acquire()
+        try:
+            yield jar
+        except Exception as exc:
+            if jar is not None and is_throttled(exc):
+                self.quarantine(jar)
+            raise
+
+    def counts(self, now=None):
+        """``{'ready': n, 'quarantined': n}`` for monitoring."""
+        now = time.monotonic() if now is None else now
+        self.refresh(now)
+        jars = self._jars
+        quarantined = sum(1 for jar in jars if jar.quarantined_until > now)
+        return {'ready': len(jars) - quarantined, 'quarantined': quarantined}
+
+
+def install(ydl, jar):
+    """Give ``ydl`` its own copy of ``jar``'s cookies; a ``None`` jar leaves it cookieless."""
+    if jar is not None:
+        # ``YoutubeDL.cookiejar`` is a cached_property, so this replaces loading from ``cookiefile``.
+        ydl.cookiejar = jar.cookiejar()
@@ -0,0 +1,109 @@
+# gunicorn.conf.py
+"""Production gunicorn settings, picked up automatically from the working directory.
+
+    gunicorn app:app
+
+Worker count is derived from the CPUs and memory actually available to the
+container and can be pinned with WEB_CONCURRENCY; with DOWNLOAD_JOBS_ENABLED=1
+it defaults to one, since jobs are per worker.  GUNICORN_WORKER_CLASS
+picks ``gthread`` (default), ``gevent`` or ``sync``; GUNICORN_THREADS sets
+threads per gthread worker.
+
+The app is preloaded in the master and workers are forked from it, so
+imports and the prebuilt assets are shared copy-on-write.  ``kill -HUP``
+on the master starts fresh workers and retires the old ones gracefully;
+because of preloading, picking up new code needs a full restart.
+"""
+import multiprocessing
+import os
+
+# Resident memory of one worker after serving traffic, in MiB; used to cap
+# the worker count on small instances.
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MB', 96))
+
+
+def _cpu_count():
+    # Honour cgroup CPU quotas, which multiprocessing.cpu_count() ignores.
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+def _memory_mb():
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _worker_class():
+    requested = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    if requested == 'gevent':
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            return 'gthread'
+    return requested
+
+
+def _workers(cpus, memory_mb):
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    if os.environ.get('DOWNLOAD_JOBS_ENABLED') == '1':
+        # Jobs live in the worker that accepted them; any other worker would
+        # answer 404 for them.
+        return 1
+    workers = 2 * cpus + 1
+    if memory_mb:
+        # Leave room for the master process.
+        workers = min(workers, max(1, memory_mb // WORKER_MEMORY_MB - 1))
+    return max(1, workers)
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = _worker_class()
+workers = _workers(_cpu_count(), _memory_mb())
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot build up; the jitter
+# keeps them from all restarting at once.
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    server.log.info(
+        'Serving with %d %s worker(s)%s',
+        workers, worker_class, f' x {threads} threads' if worker_class == 'gthread' else '',
+    )
+    if workers > 1 and os.environ.get('DOWNLOAD_JOBS_ENABLED') == '1':
+        server.log.warning(
+            'DOWNLOAD_JOBS_ENABLED=1 with WEB_CONCURRENCY=%d: jobs are only visible to the worker '
+            'that accepted them, so /jobs/<id> needs sticky sessions', workers,
+        )
@@ -0,0 +1,312 @@
+# jobs.py
+"""Server-side download jobs run through ``yt_dlp.YoutubeDL`` on a bounded pool.
+
+A fixed number of worker threads take jobs from a bounded queue, so the
+amount of work in flight never exceeds ``workers + max_queued``.  When the
+queue is full ``submit`` raises ``QueueFull`` instead of waiting, and
+``ClientLimit`` caps unfinished jobs per client.
+
+Each job keeps a short, numbered event log (state changes plus throttled
+progress from yt-dlp's progress hooks) that ``sse_events`` turns into a
+Server-Sent Events stream, resuming from ``Last-Event-ID``.  Cancelling a
+queued job drops it; cancelling a running one makes the next progress hook
+raise ``DownloadCancelled`` inside yt-dlp.
+
+With a ``mediacache.MediaCache`` attached, finished files move into the
+cache and a job whose (video id, format, post-processing) is already
+cached finishes without downloading.  Identical jobs running at the same
+time are coalesced through ``flight`` (a ``singleflight`` group), so only
+one of them downloads and the rest pick the file up from the cache.
+With a ``cookiepool.CookiePool`` each download borrows a cookie jar from it.
+
+Workers are started lazily in the process that submits, so with gunicorn's
+``preload_app`` every worker gets its own pool rather than threads that
+died in the master at fork.
+"""
+import collections
+import contextlib
+import json
+import os
+import queue
+import secrets
+import shutil
+import threading
+import time
+
+import cookiepool
+import mediacache
+import singleflight
+
+QUEUED, RUNNING, FINISHED, FAILED, CANCELLED = 'queued', 'running', 'finished', 'failed', 'cancelled'
+DONE_STATES = (FINISHED, FAILED, CANCELLED)
+
+# yt-dlp format selectors that need no ffmpeg merge step.
+FORMAT_SELECTORS = {
+    'video': 'best[acodec!=none][vcodec!=none]/best',
+    'audio': 'bestaudio/best',
+}
+
+
+class QueueFull(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class ClientLimit(Exception):
+    """The client already has its maximum number of unfinished jobs."""
+
+
+class Job:
+    def __init__(self, url, fmt, client, directory, video_id=None, max_events=256):
+        self.id = secrets.token_urlsafe(12)
+        self.url = url
+        self.video_id = video_id
+        self.format = fmt
+        self.client = client
+        self.directory = os.path.join(directory, self.id)
+        self.state = QUEUED
+        self.progress = {}
+        self.filename = None
+        self.download_name = None
+        self.cached = False
+        self.error = None
+        self.created = time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        self._events = collections.deque(maxlen=max_events)
+        self._seq = 0
+        self._changed = threading.Condition()
+        self._last_progress = 0.0
+        self.publish('state', {'state': QUEUED})
+
+    @property
+    def done(self):
+        return self.state in DONE_STATES
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'format': self.format,
+            'state': self.state,
+            'progress': self.progress,
+            'filename': self.download_name,
+            'cached': self.cached,
+            'error': self.error,
+        }
+
+    def publish(self, kind, data):
+        with self._changed:
+            self._seq += 1
+            self._events.append((self._seq, kind, data))
+            self._changed.notify_all()
+
+    def set_state(self, state, error=None):
+        """Move to ``state`` and tell listeners; returns False once the job is already done."""
+        with self._changed:
+            if self.done:
+                return False
+            self.state = state
+            self.error = error
+            if state in DONE_STATES:
+                self.finished_at = time.time()
+        event = {'state': state}
+        if state == FINISHED:
+            event['filename'] = self.download_name
+            event['cached'] = self.cached
+        if error:
+            event['error'] = error
+        self.publish('state', event)
+        return True
+
+    def events_after(self, seq, timeout):
+        """Events newer than ``seq``, waiting up to ``timeout`` seconds for one."""
+        with self._changed:
+            if self._seq <= seq and not self.done:
+                self._changed.wait(timeout)
+            return [event for event in self._events if event[0] > seq]
+
+    def progress_hook(self, status, min_interval=0.25):
+        """yt-dlp progress hook: aborts cancelled jobs and publishes throttled progress."""
+        if self.cancel_requested:
+            from yt_dlp.utils import DownloadCancelled
+            raise DownloadCancelled('cancelled by client')
+        downloaded = status.get('downloaded_bytes')
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        self.progress = {
+            'status': status.get('status'),
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'percent': round(downloaded * 100 / total, 1) if downloaded and total else None,
+            'speed': status.get('speed'),
+            'eta': status.get('eta'),
+        }
+        if status.get('status') == 'finished':
+            self.filename = status.get('filename')
+        now = time.monotonic()
+        if status.get('status') != 'downloading' or now - self._last_progress >= min_interval:
+            self._last_progress = now
+            self.publish('progress', self.progress)
+
+
+class JobQueue:
+    def __init__(self, directory, workers=2, max_queued=8, per_client=2, keep_seconds=3600,
+                 ydl_options=None, cache=None, flight=None, cookies=None):
+        self.directory = directory
+        self.cookies = cookies
+        self.cache = cache
+        self.flight = flight or singleflight.Group()
+        self.workers = workers
+        self.max_queued = max_queued
+        self.per_client = per_client
+        self.keep_seconds = keep_seconds
+        self.ydl_options = ydl_options or {}
+        self.jobs = {}
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_workers(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queued)
+            for index in range(self.workers):
+                threading.Thread(target=self._work, name=f'download-worker-{index}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, url, fmt='video', client='unknown', video_id=None):
+        self._ensure_workers()
+        self._prune()
+        with self._lock:
+            active = sum(1 for job in self.jobs.values() if job.client == client and not job.done)
+            if active >= self.per_client:
+                raise ClientLimit(f'at most {self.per_client} unfinished jobs per client')
+            job = Job(url, fmt, client, self.directory, video_id)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull('download queue is full') from None
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        job.cancel_requested = True
+        if job.state == QUEUED:
+            # The worker skips it when it comes up; report it cancelled now.
+            job.set_state(CANCELLED)
+        return job
+
+    def saturation(self):
+        """Queued jobs waiting for a worker, for load-shedding decisions."""
+        return self._queue.qsize()
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        with self._lock:
+            expired = [job for job in self.jobs.values() if job.done and job.finished_at < cutoff]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            except Exception as exc:  # keep the worker alive whatever yt-dlp raises
+                job.set_state(FAILED, error=str(exc))
+
+    def _options(self, job):
+        return {
+            'format': FORMAT_SELECTORS.get(job.format, FORMAT_SELECTORS['video']),
+            'outtmpl': os.path.join(job.directory, '%(title).80B [%(id)s].%(ext)s'),
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'progress_hooks': [job.progress_hook],
+            **self.ydl_options,
+        }
+
+    def cache_key(self, job):
+        options = self._options(job)
+        return mediacache.cache_key(job.video_id or job.url, options['format'], options.get('postprocessors', ()))
+
+    def _run(self, job):
+        if job.cancel_requested or not job.set_state(RUNNING):
+            return
+        if self.cache is None:
+            self._download(job, None)
+            return
+        key = self.cache_key(job)
+        while not job.done:
+            entry = self.cache.get(key)
+            if entry is not None:
+                job.filename, job.download_name, job.cached = entry.path, entry.download_name, True
+                job.set_state(FINISHED)
+                return
+            if job.cancel_requested:
+                job.set_state(CANCELLED)
+                return
+            try:
+                self.flight.do(key, lambda: self._download(job, key))
+            except Exception as exc:  # the leader's failure, possibly from another process
+                job.set_state(FAILED, error=str(exc))
+                return
+            # The leader has settled its own job.  Anyone who waited on it goes
+            # round again: to the cached file, or to download it themselves if
+            # the leader was cancelled.
+
+    def _download(self, job, key):
+        """Download ``job`` and settle its state; returns the cached path, if any."""
+        import yt_dlp
+        from yt_dlp.utils import DownloadCancelled
+
+        cookies = self.cookies.use() if self.cookies else contextlib.nullcontext()
+        try:
+            with cookies as jar, yt_dlp.YoutubeDL(self._options(job)) as ydl:
+                cookiepool.install(ydl, jar)
+                info = ydl.extract_info(job.url, download=True)
+                job.filename = job.filename or ydl.prepare_filename(info)
+        except DownloadCancelled:
+            shutil.rmtree(job.directory, ignore_errors=True)
+            job.set_state(CANCELLED)
+            return None
+        except yt_dlp.utils.DownloadError as exc:
+            job.set_state(FAILED, error=str(exc.msg or exc))
+            raise
+        if job.cancel_requested:
+            job.set_state(CANCELLED)
+            return None
+        job.download_name = os.path.basename(job.filename)
+        if key:
+            job.filename = self.cache.add(key, job.filename).path
+            shutil.rmtree(job.directory, ignore_errors=True)
+        job.set_state(FINISHED)
+        return job.filename
+
+
+def sse_events(job, last_id=0, heartbeat=15.0):
+    """Yield the job's events as Server-Sent Events until it is done."""
+    yield 'retry: 2000\n\n'
+    while True:
+        events = job.events_after(last_id, heartbeat)
+        if not events:
+            if job.done:
+                return
+            yield ': keep-alive\n\n'
+            continue
+        for seq, kind, data in events:
+            last_id = seq
+            yield f'id: {seq}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+        if job.done and not job.events_after(last_id, 0):
+            return
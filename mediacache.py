@@ -0,0 +1,222 @@
+# mediacache.py
+"""Content-addressed on-disk cache for downloaded media, bounded by size.
+
+Entries are keyed by a hash of (video id, format selector, post-processing
+options) and stored as ``objects/<2 hex>/<key>.<download name>``, so the
+file name alone is the index: startup rebuilds it with one ``scandir`` per
+shard, and the user-facing name survives restarts without a sidecar file.
+Recency is the file's mtime, refreshed at most once a minute on a hit, and
+eviction drops the least recently used entries until the total fits.
+
+Files are moved in with ``os.replace`` (through a temp file in the cache
+when crossing filesystems), so readers never see a partial file.  An evicted file that is
+still being sent stays readable through the open descriptor.
+
+Every gunicorn worker keeps its own index of the shared directory; a miss
+checks the shard on disk before giving up, and the index is rescanned
+before evicting when it is older than ``rescan_interval``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+KEY_LENGTH = 32
+TOUCH_INTERVAL = 60.0
+
+
+def cache_key(video_id, format_selector, postprocessing=()):
+    """Stable key for one rendition of one video."""
+    material = json.dumps([video_id, format_selector, postprocessing], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()[:KEY_LENGTH]
+
+
+class CacheEntry:
+    __slots__ = ('key', 'path', 'size', 'used')
+
+    def __init__(self, key, path, size, used):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.used = used
+
+    @property
+    def download_name(self):
+        return os.path.basename(self.path)[KEY_LENGTH + 1:]
+
+
+class MediaCache:
+    def __init__(self, directory, max_bytes, rescan_interval=300.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._objects = os.path.join(directory, 'objects')
+        self._tmp = os.path.join(directory, 'tmp')
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._scanned = 0.0
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+        self.rescan()
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _shard(self, key):
+        return os.path.join(self._objects, key[:2])
+
+    def _scan_shard(self, shard):
+        try:
+            with os.scandir(shard) as it:
+                for item in it:
+                    if len(item.name) > KEY_LENGTH and item.name[KEY_LENGTH] == '.' and item.is_file():
+                        st = item.stat()
+                        yield CacheEntry(item.name[:KEY_LENGTH], item.path, st.st_size, st.st_mtime)
+        except FileNotFoundError:
+            return
+
+    def rescan(self):
+        """Rebuild the index from the directory, oldest first."""
+        entries = []
+        with os.scandir(self._objects) as shards:
+            for shard in shards:
+                if shard.is_dir():
+                    entries.extend(self._scan_shard(shard.path))
+        entries.sort(key=lambda entry: entry.used)
+        with self._lock:
+            self._entries = OrderedDict((entry.key, entry) for entry in entries)
+            self._size = sum(entry.size for entry in entries)
+            self._scanned = time.monotonic()
+
+    def get(self, key):
+        """The entry for ``key`` with its recency bumped, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            # Another worker may have added it since our last scan.
+            entry = next((found for found in self._scan_shard(self._shard(key)) if found.key == key), None)
+            if entry is not None:
+                with self._lock:
+                    if key not in self._entries:
+                        self._size += entry.size
+                    self._entries[key] = entry
+        if entry is None or not os.path.exists(entry.path):
+            if entry is not None:
+                self._forget(key)
+            self.misses += 1
+            return None
+
+        now = time.time()
+        if now - entry.used > TOUCH_INTERVAL:
+            entry.used = now
+            try:
+                os.utime(entry.path, (now, now))
+            except OSError:
+                pass
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def add(self, key, source_path, download_name=None):
+        """Move ``source_path`` into the cache under ``key`` and return its entry."""
+        name = download_name or os.path.basename(source_path)
+        shard = self._shard(key)
+        os.makedirs(shard, exist_ok=True)
+        path = os.path.join(shard, f'{key}.{name}')
+        try:
+            os.replace(source_path, path)
+        except OSError:
+            # Different filesystem: copy next to the destination, then swap in atomically.
+            tmp = os.path.join(self._tmp, f'{key}.{os.getpid()}.{threading.get_ident()}')
+            shutil.copyfile(source_path, tmp)
+            os.replace(tmp, path)
+            os.unlink(source_path)
+
+        # A different download name for the same key leaves an older file behind.
+        for stale in self._scan_shard(shard):
+            if stale.key == key and stale.path != path:
+                try:
+                    os.unlink(stale.path)
+                except OSError:
+                    pass
+
+        entry = CacheEntry(key, path, os.path.getsize(path), time.time())
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+            self._entries[key] = entry
+            self._size += entry.size
+        self._evict(keep=key)
+        return entry
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry.size
+
+    def _evict(self, keep):
+        if self._size <= self.max_bytes:
+            return
+        if time.monotonic() - self._scanned > self.rescan_interval:
+            self.rescan()
+        while True:
+            with self._lock:
+                if self._size <= self.max_bytes or len(self._entries) <= 1:
+                    return
+                key, entry = next(iter(self._entries.items()))
+                if key == keep:
+                    self._entries.move_to_end(key)
+                    continue
+                del self._entries[key]
+                self._size -= entry.size
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+
+class FileRange:
+    """Read-only view of ``length`` bytes of an open file from its current position.
+
+    It keeps ``fileno()`` so a WSGI server can still hand the range to
+    sendfile, while servers that read it in Python stop at the range end.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
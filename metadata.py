@@ -0,0 +1,340 @@
+# metadata.py
+"""Video and playlist metadata from yt-dlp, cached in a shared SQLite file.
+
+``MetadataService.lookup`` answers from the cache while an entry is fresh
+(``ttl``), answers from it and refreshes in the background while it is
+stale (up to ``stale_ttl``), and otherwise extracts it, coalescing
+concurrent extractions of one key through a ``singleflight`` group.
+Extractions that fail for good (unavailable, private, removed) are stored
+as negative entries for ``negative_ttl``; other errors are not cached.
+
+The store is one WAL-mode SQLite file that every gunicorn worker opens, and
+it is trimmed to ``max_entries`` by dropping the entries that go stale
+first.  Extraction sits behind any object with ``extract(url) -> dict`` that
+raises ``ExtractionError`` for permanent failures, so a fake can stand in
+for ``YtDlpExtractor`` offline.  Given a ``cookiepool.CookiePool``,
+``YtDlpExtractor`` borrows a cookie jar from it for every extraction.
+"""
+import contextlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cookiepool
+import singleflight
+import sqlitedb
+
+MAX_PLAYLIST_ENTRIES = 5000
+
+
+class ExtractionError(Exception):
+    """The target cannot be extracted and retrying soon will not help."""
+
+
+class MetadataUnavailable(Exception):
+    """Lookup result for a target with a (possibly cached) permanent failure."""
+
+
+def _format_summary(fmt):
+    has_video = fmt.get('vcodec') not in (None, 'none')
+    has_audio = fmt.get('acodec') not in (None, 'none')
+    return {
+        'format_id': fmt.get('format_id'),
+        'ext': fmt.get('ext'),
+        'height': fmt.get('height'),
+        'fps': fmt.get('fps'),
+        'vcodec': fmt.get('vcodec') if has_video else None,
+        'acodec': fmt.get('acodec') if has_audio else None,
+        'filesize': fmt.get('filesize') or fmt.get('filesize_approx'),
+        'tbr': fmt.get('tbr'),
+        'note': fmt.get('format_note'),
+        # A yt-dlp -f value that yields this format with sound.
+        'selector': fmt['format_id'] + ('+bestaudio' if has_video and not has_audio else ''),
+    }
+
+
+def summarise(info):
+    """The parts of a yt-dlp info dict the UI needs, small enough to cache."""
+    if info.get('_type') == 'playlist':
+        entries = []
+        for entry in info.get('entries') or ():
+            if len(entries) >= MAX_PLAYLIST_ENTRIES:
+                break
+            if entry:
+                entries.append({
+                    'id': entry.get('id'),
+                    'title': entry.get('title'),
+                    'duration': entry.get('duration'),
+                })
+        return {
+            'kind': 'playlist',
+            'id': info.get('id'),
+            'title': info.get('title'),
+            'uploader': info.get('uploader') or info.get('channel'),
+            'entry_count': info.get('playlist_count') or len(entries),
+            'entries': entries,
+        }
+
+    formats = [
+        _format_summary(fmt) for fmt in info.get('formats') or ()
+        if fmt.get('format_id') and (fmt.get('vcodec'), fmt.get('acodec')) != ('none', 'none')
+    ]
+    return {
+        'kind': 'video',
+        'id': info.get('id'),
+        'title': info.get('title'),
+        'duration': info.get('duration'),
+        'uploader': info.get('uploader') or info.get('channel'),
+        'thumbnail': info.get('thumbnail'),
+        'formats': formats,
+        'heights': sorted({fmt['height'] for fmt in formats if fmt['height']}, reverse=True),
+    }
+
+
+class _YtDlpLogger:
+    """Sends yt-dlp's output to ``logging`` instead of stderr."""
+
+    log = logging.getLogger('yt_dlp')
+
+    def debug(self, message):
+        self.log.debug(message)
+
+    def info(self, message):
+        self.log.info(message)
+
+    def warning(self, message):
+        self.log.warning(message)
+
+    def error(self, message):
+        self.log.error(message)
+
+
+@contextlib.contextmanager
+def _extraction_errors():
+    """Turn yt-dlp's errors for unavailable videos into ``ExtractionError``."""
+    import yt_dlp
+
+    try:
+        yield
+    except yt_dlp.utils.DownloadError as exc:
+        cause = exc.exc_info[1] if exc.exc_info else None
+        # ``expected`` marks errors such as private or removed videos, not network trouble.
+        if isinstance(cause, yt_dlp.utils.ExtractorError) and cause.expected:
+            raise ExtractionError(str(exc.msg or exc)) from None
+        raise
+
+
+class YtDlpExtractor:
+    def __init__(self, options=None, cookies=None):
+        self.cookies = cookies
+        self.options = {
+            'logger': _YtDlpLogger(),
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            'noplaylist': True,
+            'extract_flat': 'in_playlist',
+            # yt-dlp resolves a playlist page by page up to here before
+            # returning, so stop where ``summarise`` would cut it anyway.
+            'playlistend': MAX_PLAYLIST_ENTRIES,
+            **(options or {}),
+        }
+
+    def _cookies(self):
+        # A jar from the pool, quarantined if YouTube throttles it.
+        return self.cookies.use() if self.cookies else contextlib.nullcontext()
+
+    def extract(self, url):
+        import yt_dlp
+
+        with _extraction_errors():
+            with self._cookies() as jar, yt_dlp.YoutubeDL(self.options) as ydl:
+                cookiepool.install(ydl, jar)
+                info = ydl.extract_info(url, download=False)
+        return summarise(info)
+
+    @contextlib.contextmanager
+    def open_playlist(self, url):
+        """Context manager for ``(summary, entries)``, with ``entries`` still unresolved.
+
+        Nothing beyond the first page is fetched until ``entries`` is iterated,
+        and later pages come through this ``YoutubeDL`` and cookie jar, so
+        iterate it (with ``iter_entries``) before the block exits.
+        """
+        import yt_dlp
+
+        options = dict(self.options, noplaylist=False, extract_flat=True, playlistend=None)
+        with _extraction_errors(), self._cookies() as jar, yt_dlp.YoutubeDL(options) as ydl:
+            cookiepool.install(ydl, jar)
+            info = ydl.extract_info(url, download=False, process=False)
+            if info.get('_type') != 'playlist':
+                raise ExtractionError('Not a playlist')
+            summary = {
+                'id': info.get('id'),
+                'title': info.get('title'),
+                'uploader': info.get('uploader') or info.get('channel'),
+                'entry_count': info.get('playlist_count'),
+            }
+            yield summary, info.get('entries') or ()
+
+
+def iter_entries(entries, offset=0):
+    """Yield ``(index, entry)`` from ``offset`` on, one page at a time.
+
+    ``entries`` is whatever yt-dlp left in an unprocessed playlist: a
+    generator, a ``LazyList`` or a ``PagedList``.  Paged lists are read a
+    page-sized slice at a time so skipping to ``offset`` fetches no pages
+    before it; everything else is consumed lazily.
+    """
+    if hasattr(entries, 'getslice'):
+        step = getattr(entries, '_pagesize', None) or 100
+        start = offset
+        while True:
+            chunk = entries.getslice(start, start + step)
+            for index, entry in enumerate(chunk, start):
+                if entry:
+                    yield index, entry
+            if len(chunk) < step:
+                return
+            start += step
+    else:
+        for index, entry in enumerate(itertools.islice(entries, offset, None), offset):
+            if entry:
+                yield index, entry
+
+
+class SQLiteStore:
+    """Metadata rows in a SQLite file shared by every process on the host."""
+
+    def __init__(self, path, max_entries=10000, trim_interval=60.0):
+        self._connect = sqlitedb.Connections(path)
+        self.max_entries = max_entries
+        self._trim_interval = trim_interval
+        self._next_trim = 0.0
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metadata ('
+                ' key TEXT PRIMARY KEY, value TEXT NOT NULL, ok INTEGER NOT NULL,'
+                ' fresh_until REAL NOT NULL, stale_until REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS metadata_stale_until ON metadata (stale_until)')
+
+    def get(self, key):
+        """``(value, ok, fresh_until, stale_until)`` or None."""
+        row = self._connect().execute(
+            'SELECT value, ok, fresh_until, stale_until FROM metadata WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), bool(row[1]), row[2], row[3]
+
+    def put(self, key, value, ok, fresh_until, stale_until, now):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO metadata (key, value, ok, fresh_until, stale_until) VALUES (?, ?, ?, ?, ?)',
+            (key, json.dumps(value, separators=(',', ':')), int(ok), fresh_until, stale_until),
+        )
+        if now >= self._next_trim:
+            self._next_trim = now + self._trim_interval
+            self.trim(now)
+
+    def trim(self, now):
+        """Drop expired entries, then the soonest-to-expire ones beyond ``max_entries``."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            removed = conn.execute('DELETE FROM metadata WHERE stale_until < ?', (now,)).rowcount
+            excess = conn.execute('SELECT COUNT(*) FROM metadata').fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    'DELETE FROM metadata WHERE key IN'
+                    ' (SELECT key FROM metadata ORDER BY stale_until LIMIT ?)', (excess,)
+                ).rowcount
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self.evictions += removed
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM metadata').fetchone()[0]
+
+
+class MetadataService:
+    def __init__(self, store, extractor, ttl=3600.0, negative_ttl=300.0, stale_ttl=86400.0,
+                 flight=None, refresh_workers=1):
+        self.store = store
+        self.extractor = extractor
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.flight = flight or singleflight.Group()
+        self.refresh_workers = refresh_workers
+        self.stats = {'hit': 0, 'stale': 0, 'miss': 0}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def lookup(self, key, url):
+        """Return ``(metadata, status)`` with status ``hit``, ``stale`` or ``miss``.
+
+        ``key`` identifies the target (``ParsedURL.key``) and ``url`` is what
+        gets extracted.  Raises ``MetadataUnavailable`` for permanent failures.
+        """
+        now = time.time()
+        row = self.store.get(key)
+        status = 'miss'
+        if row is not None:
+            value, ok, fresh_until, stale_until = row
+            if now < fresh_until:
+                status = 'hit'
+            elif ok and now < stale_until:
+                status = 'stale'
+                self._refresh_later(key, url)
+        if status == 'miss':
+            outcome, _ = self.flight.do(key, lambda: self._fetch(key, url))
+            value, ok = outcome['value'], outcome['ok']
+        self.stats[status] += 1
+        if not ok:
+            raise MetadataUnavailable(value['error'])
+        return value, status
+
+    def _fetch(self, key, url):
+        try:
+            value, ok = self.extractor.extract(url), True
+        except ExtractionError as exc:
+            value, ok = {'error': str(exc)}, False
+        now = time.time()
+        if ok:
+            self.store.put(key, value, True, now + self.ttl, now + self.ttl + self.stale_ttl, now)
+        else:
+            self.store.put(key, value, False, now + self.negative_ttl, now + self.negative_ttl, now)
+        return {'value': value, 'ok': ok}
+
+    def _refresh_later(self, key, url):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            # Created lazily so each forked worker gets live threads.
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.refresh_workers, thread_name_prefix='metadata-refresh')
+                self._executor_pid = os.getpid()
+            executor = self._executor
+        executor.submit(self._refresh, key, url)
+
+    def _refresh(self, key, url):
+        try:
+            self.flight.do(key, lambda: self._fetch(key, url))
+        except Exception:
+            # Keep serving the stale entry; the next lookup after it expires retries.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
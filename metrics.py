@@ -0,0 +1,259 @@
+# metrics.py
+"""Low-overhead counters and histograms in the Prometheus text format.
+
+Every OS thread writes to its own shard, so recording a sample is a few
+dict and list operations with no lock.  A scrape walks all shards and sums
+them; it may miss an update in flight, which Prometheus tolerates.
+Shards are keyed by the native thread id rather than thread-locals, so
+gevent greenlets sharing a thread share a shard instead of making one per
+request.
+
+Each gunicorn worker keeps its own registry and labels its series with
+``worker`` (its pid), so series from different workers never collide.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    __slots__ = ('counters', 'histograms', 'gauges')
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+
+class Registry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._shards = {}
+        self._shards_lock = threading.Lock()
+        self._descriptions = {}
+        self._callbacks = []
+
+    def describe(self, name, kind, help_text):
+        self._descriptions[name] = (kind, help_text)
+
+    def callback(self, name, kind, help_text, fn):
+        """Register a metric computed at scrape time; ``fn`` returns ``{labels: value}``."""
+        self.describe(name, kind, help_text)
+        self._callbacks.append((name, fn))
+
+    def _shard(self):
+        tid = threading.get_native_id()
+        shard = self._shards.get(tid)
+        if shard is None:
+            with self._shards_lock:
+                shard = self._shards.setdefault(tid, _Shard())
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def add(self, name, labels=(), value=1):
+        """Move a gauge up (or down, with a negative ``value``)."""
+        gauges = self._shard().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def record_request(self, route_labels, status_labels, seconds):
+        """One finished request: in-flight down, counter up, latency observed, one shard lookup."""
+        shard = self._shard()
+        gauges, counters, histograms = shard.gauges, shard.counters, shard.histograms
+        key = ('http_requests_in_flight', ())
+        gauges[key] = gauges.get(key, 0) - 1
+        key = ('http_requests_total', status_labels)
+        counters[key] = counters.get(key, 0) + 1
+        key = ('http_request_duration_seconds', route_labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        entry[1] += seconds
+
+    def _collect(self):
+        counters, gauges, histograms = {}, {}, {}
+        for shard in list(self._shards.values()):
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, value in list(shard.gauges.items()):
+                gauges[key] = gauges.get(key, 0) + value
+            for key, (counts, total) in list(shard.histograms.items()):
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        return counters, gauges, histograms
+
+    def render(self, extra_labels=()):
+        counters, gauges, histograms = self._collect()
+        samples = {}
+        for (name, labels), value in sorted(counters.items()) + sorted(gauges.items()):
+            samples.setdefault(name, []).append((name, labels + extra_labels, value))
+        for (name, labels), (counts, total) in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append((f'{name}_bucket', labels + extra_labels + (('le', le),), cumulative))
+            lines.append((f'{name}_sum', labels + extra_labels, total))
+            lines.append((f'{name}_count', labels + extra_labels, cumulative))
+        for name, fn in self._callbacks:
+            for labels, value in fn().items():
+                samples.setdefault(name, []).append((name, labels + extra_labels, value))
+
+        out = []
+        for name in sorted(samples):
+            if name in self._descriptions:
+                kind, help_text = self._descriptions[name]
+                out.append(f'# HELP {name} {help_text}')
+                out.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in samples[name]:
+                out.append(f'{sample}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(out) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def process_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        # No procfs: fall back to the peak RSS, which Linux reports in KiB and macOS in bytes.
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def register_process_metrics(registry):
+    registry.callback(
+        'process_resident_memory_bytes', 'gauge', 'Resident set size of this worker.',
+        lambda: {(): process_rss_bytes()},
+    )
+    registry.callback(
+        'process_cpu_seconds_total', 'counter', 'User and system CPU time used by this worker.',
+        lambda: {(): round(sum(os.times()[:2]), 3)},
+    )
+
+
+class _TrackedResponse:
+    """Wraps one response so it can be recorded when the server closes it."""
+
+    __slots__ = ('_metrics', '_environ', '_start_response', '_started', '_status', '_iterable')
+
+    def __init__(self, metrics, environ, start_response):
+        self._metrics = metrics
+        self._environ = environ
+        self._start_response = start_response
+        self._started = time.perf_counter()
+        self._status = '500'
+        self._iterable = ()
+
+    def start_response(self, status_line, headers, exc_info=None):
+        self._status = status_line[:3]
+        return self._start_response(status_line, headers, exc_info)
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        try:
+            close = getattr(self._iterable, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._metrics.finish(self._environ, self._status, time.perf_counter() - self._started)
+
+
+class _FinishOnClose:
+    """File proxy that records the request when the server closes the file.
+
+    Re-wrapping a ``wsgi.file_wrapper`` body around this keeps it eligible
+    for the server's sendfile path, which a plain wrapper iterable is not.
+    """
+
+    __slots__ = ('_file', '_tracked')
+
+    def __init__(self, file, tracked):
+        self._file = file
+        self._tracked = tracked
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def close(self):
+        self._tracked.close()
+
+
+class RequestMetrics:
+    """WSGI middleware recording request counts, latency and in-flight requests.
+
+    Latency runs until the server closes the response, so streamed bodies
+    are included.  The route label is read from ``environ[ROUTE_KEY]``,
+    which the application sets once it has matched the URL.
+    """
+
+    ROUTE_KEY = 'metrics.route'
+    UNMATCHED = (('route', 'unmatched'),)
+    # The method comes from the client, so any other verb shares one series.
+    METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'PATCH'))
+
+    def __init__(self, wsgi_app, registry):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+        self._status_labels = {}
+
+    def __call__(self, environ, start_response):
+        self.registry.add('http_requests_in_flight')
+        tracked = _TrackedResponse(self, environ, start_response)
+        try:
+            iterable = tracked._iterable = self.wsgi_app(environ, tracked.start_response)
+        except BaseException:
+            tracked.close()
+            raise
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(file_wrapper, type) and isinstance(iterable, file_wrapper) and hasattr(iterable, 'filelike'):
+            return file_wrapper(_FinishOnClose(iterable.filelike, tracked), getattr(iterable, 'blksize', 8192))
+        return tracked
+
+    def finish(self, environ, status, seconds):
+        labels = environ.get(self.ROUTE_KEY, self.UNMATCHED)
+        method = environ['REQUEST_METHOD']
+        key = (labels, method if method in self.METHODS else 'other', status)
+        status_labels = self._status_labels.get(key)
+        if status_labels is None:
+            status_labels = self._status_labels.setdefault(
+                key, labels + (('method', key[1]), ('status', status)))
+        self.registry.record_request(labels, status_labels, seconds)
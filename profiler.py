@@ -0,0 +1,332 @@
+# profiler.py
+"""Opt-in profiling of a sample of live requests, aggregated per route.
+
+Two modes:
+
+* ``cprofile`` runs cProfile around the sampled request and merges the
+  result into a per-route ``pstats.Stats``; download it and open it with
+  ``python -m pstats`` or snakeviz.
+* ``stack`` leaves the request alone and lets one background thread grab
+  its Python stack every few milliseconds; the result is collapsed stacks
+  (``frame;frame;frame count``) for flamegraph.pl or speedscope.
+
+Overhead is bounded by the sample rate and by ``max_concurrent``, the number
+of requests a worker will profile at the same time.  With profiling off the
+middleware is never installed.
+
+Each worker aggregates its own samples.  With ``directory`` set, every
+worker also writes its per-route aggregates there after each sample, so
+``collect_dir`` can merge all workers.  Under gevent, cProfile also sees
+other greenlets running on the same thread while a sampled request waits.
+"""
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ('cprofile', 'stack')
+
+
+def route_slug(route):
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'index'
+
+
+def _frame_name(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f'{module}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _write_atomic(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class _RouteProfile:
+    __slots__ = ('samples', 'seconds', 'stats', 'stacks')
+
+    def __init__(self):
+        self.samples = 0
+        self.seconds = 0.0
+        self.stats = None
+        self.stacks = Counter()
+
+
+class _StackSampler(threading.Thread):
+    """Samples the stacks of registered threads while any are registered."""
+
+    def __init__(self, interval):
+        super().__init__(name='profiler-stack-sampler', daemon=True)
+        self.interval = interval
+        self.active = {}
+        self._wake = threading.Event()
+
+    def register(self, thread_id, stacks):
+        self.active[thread_id] = stacks
+        self._wake.set()
+
+    def unregister(self, thread_id):
+        self.active.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            if not self.active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for thread_id, stacks in list(self.active.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[_collapse(frame)] += 1
+
+
+class _ProfiledResponse:
+    """Keeps the profiler running while the body is produced, records on close."""
+
+    __slots__ = ('_profiler', '_environ', '_session', '_iterable')
+
+    def __init__(self, profiler, environ, session, iterable):
+        self._profiler = profiler
+        self._environ = environ
+        self._session = session
+        self._iterable = iterable
+
+    def __iter__(self):
+        iterator = iter(self._iterable)
+        while True:
+            self._session.resume()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._session.pause()
+            yield chunk
+
+    def close(self):
+        try:
+            close = getattr(self._iterable, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._profiler.finish(self._environ, self._session)
+
+
+class _Session:
+    """One profiled request; ``resume``/``pause`` bracket the code we own."""
+
+    def __init__(self, profiler):
+        self.started = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.profile = cProfile.Profile() if profiler.mode == 'cprofile' else None
+        self.stacks = Counter()
+        self.sampler = profiler._sampler() if self.profile is None else None
+
+    def resume(self):
+        if self.profile is not None:
+            self.profile.enable()
+        else:
+            self.sampler.register(self.thread_id, self.stacks)
+
+    def pause(self):
+        if self.profile is not None:
+            self.profile.disable()
+        else:
+            self.sampler.unregister(self.thread_id)
+
+
+class Profiler:
+    """WSGI middleware profiling one in ``sample_every`` requests.
+
+    A request carrying ``header`` with the value ``token`` is always
+    profiled.  The route is read from ``environ[route_key]`` when the
+    response finishes, so the application must tag it.
+    """
+
+    def __init__(self, wsgi_app, route_key, sample_every=0, mode='cprofile', token=None,
+                 header='X-Profile', max_concurrent=1, interval=0.005, directory=None):
+        if mode not in MODES:
+            raise ValueError(f'unknown profiler mode {mode!r}, expected one of {MODES}')
+        self.wsgi_app = wsgi_app
+        self.route_key = route_key
+        self.sample_every = sample_every
+        self.mode = mode
+        self.token = token
+        self.environ_header = 'HTTP_' + header.upper().replace('-', '_')
+        self.max_concurrent = max_concurrent
+        self.interval = interval
+        self.directory = directory
+        self.routes = {}
+        self._counter = itertools.count(1)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._stack_sampler = None
+        self._sampler_pid = None
+
+    def _sampler(self):
+        # Started lazily so it exists in each forked worker, not only in the master.
+        if self._sampler_pid != os.getpid():
+            with self._lock:
+                if self._sampler_pid != os.getpid():
+                    self._stack_sampler = _StackSampler(self.interval)
+                    self._stack_sampler.start()
+                    self._sampler_pid = os.getpid()
+        return self._stack_sampler
+
+    def _wanted(self, environ):
+        header = environ.get(self.environ_header)
+        # WSGI headers are latin-1 strings; compare bytes in constant time.
+        if self.token and header is not None and hmac.compare_digest(header.encode('latin-1'), self.token.encode()):
+            return True
+        return self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ) or not self._slots.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        session = _Session(self)
+        session.resume()
+        try:
+            iterable = self.wsgi_app(environ, start_response)
+        except BaseException:
+            session.pause()
+            self.finish(environ, session)
+            raise
+        session.pause()
+        return _ProfiledResponse(self, environ, session, iterable)
+
+    def finish(self, environ, session):
+        try:
+            labels = environ.get(self.route_key)
+            route = labels[0][1] if labels else 'unmatched'
+            seconds = time.perf_counter() - session.started
+            with self._lock:
+                entry = self.routes.get(route)
+                if entry is None:
+                    entry = self.routes[route] = _RouteProfile()
+                entry.samples += 1
+                entry.seconds += seconds
+                if session.profile is not None:
+                    if entry.stats is None:
+                        entry.stats = pstats.Stats(session.profile, stream=io.StringIO())
+                    else:
+                        entry.stats.add(session.profile)
+                else:
+                    entry.stacks.update(session.stacks)
+                if self.directory:
+                    self._dump(route, entry)
+        finally:
+            self._slots.release()
+
+    def _dump(self, route, entry):
+        base = os.path.join(self.directory, f'{route_slug(route)}.{os.getpid()}')
+        _write_atomic(base + '.meta', f'{entry.samples} {entry.seconds!r} {route}'.encode())
+        if entry.stats is not None:
+            _write_atomic(base + '.pstats', pstats_bytes(entry.stats))
+        if entry.stacks:
+            _write_atomic(base + '.collapsed', collapsed_text(entry.stacks).encode())
+
+    def snapshot(self):
+        """A copy of this worker's ``{route: profile}`` aggregates."""
+        with self._lock:
+            copies = {}
+            for route, entry in self.routes.items():
+                copy = copies[route] = _RouteProfile()
+                copy.samples, copy.seconds = entry.samples, entry.seconds
+                if entry.stats is not None:
+                    copy.stats = pstats.Stats(stream=io.StringIO())
+                    copy.stats.add(entry.stats)
+                copy.stacks = Counter(entry.stacks)
+            return copies
+
+
+def pstats_bytes(stats):
+    """``stats`` in the file format ``pstats.Stats`` and snakeviz load."""
+    return marshal.dumps(stats.stats)
+
+
+def collapsed_text(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def summarise(entry, top=15, focus=()):
+    """Sample count, mean latency and the most expensive functions or frames of one route.
+
+    ``focus`` keeps only functions or frames whose name contains one of the
+    given substrings (e.g. ``('urlparser', 'get_json', 'commands')``), so
+    their costs can be compared side by side.
+    """
+    samples, stats, stacks = entry.samples, entry.stats, entry.stacks
+    wanted = (lambda name: any(part in name for part in focus)) if focus else (lambda name: True)
+    result = {'samples': samples, 'mean_ms': round(entry.seconds / samples * 1e3, 3) if samples else 0.0}
+    if stats is not None:
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            function = f'{os.path.basename(filename)}:{line}({name})'
+            if wanted(function):
+                rows.append({'function': function, 'calls': calls,
+                             'tottime': round(tottime, 6), 'cumtime': round(cumtime, 6)})
+        rows.sort(key=lambda row: row['cumtime'], reverse=True)
+        result['functions'] = rows[:top]
+    if stacks:
+        leaves = Counter()
+        for stack, count in stacks.items():
+            # Attribute each sample to its innermost focused frame, if any.
+            frames = [frame for frame in stack.split(';') if wanted(frame)]
+            if frames:
+                leaves[frames[-1]] += count
+        total = sum(leaves.values())
+        result['frames'] = [{'frame': frame, 'samples': count, 'share': round(count / total, 4)}
+                            for frame, count in leaves.most_common(top)]
+    return result
+
+
+def collect_dir(directory):
+    """Merge what every worker wrote to ``directory`` into ``{route: profile}``."""
+    files = {}
+    for filename in os.listdir(directory):
+        parts = filename.split('.')
+        if len(parts) == 3 and parts[1].isdigit() and parts[2] in ('meta', 'pstats', 'collapsed'):
+            files.setdefault((parts[0], parts[1]), {})[parts[2]] = os.path.join(directory, filename)
+
+    merged = {}
+    for (_, _), paths in sorted(files.items()):
+        if 'meta' not in paths:
+            continue
+        with open(paths['meta']) as f:
+            samples, seconds, route = f.read().split(' ', 2)
+        entry = merged.get(route)
+        if entry is None:
+            entry = merged[route] = _RouteProfile()
+        entry.samples += int(samples)
+        entry.seconds += float(seconds)
+        if 'pstats' in paths:
+            if entry.stats is None:
+                entry.stats = pstats.Stats(paths['pstats'], stream=io.StringIO())
+            else:
+                entry.stats.add(paths['pstats'])
+        if 'collapsed' in paths:
+            with open(paths['collapsed']) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if count.isdigit():
+                        entry.stacks[stack] += int(count)
+    return merged
@@ -0,0 +1,200 @@
+# ratelimit.py
+"""Sliding-window rate limiter with pluggable storage backends.
+
+Each client costs a fixed amount of state: the count for the current
+window, the count for the previous one and the index of the current
+window.  The effective rate is the current count plus the previous
+count weighted by how much of the previous window still overlaps the
+sliding window, which approximates a true sliding log without keeping
+one timestamp per request.
+"""
+import os
+import threading
+import time
+
+import sqlitedb
+
+
+class _Window:
+    __slots__ = ('index', 'prev', 'curr')
+
+    def __init__(self, index):
+        self.index = index
+        self.prev = 0
+        self.curr = 0
+
+
+def _estimate(prev, curr, now, window):
+    elapsed = (now % window) / window
+    return prev * (1.0 - elapsed) + curr
+
+
+class MemoryBackend:
+    """Per-process backend.  Idle clients are swept every ``sweep_interval`` seconds."""
+
+    def __init__(self, sweep_interval=60.0):
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        self.evictions = 0
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(index)
+                self._next_sweep = now + self._sweep_interval
+
+            state = self._windows.get(key)
+            if state is None:
+                state = self._windows[key] = _Window(index)
+            elif state.index != index:
+                state.prev = state.curr if state.index == index - 1 else 0
+                state.curr = 0
+                state.index = index
+
+            if _estimate(state.prev, state.curr, now, window) >= limit:
+                return False
+            state.curr += 1
+            return True
+
+    def _sweep(self, index):
+        # A client whose last window is two or more behind contributes nothing
+        # to the estimate any more, so its entry can go.
+        stale = [key for key, state in self._windows.items() if state.index < index - 1]
+        for key in stale:
+            del self._windows[key]
+        self.evictions += len(stale)
+
+    def __len__(self):
+        return len(self._windows)
+
+
+class SQLiteBackend:
+    """Backend stored in a SQLite file, shared by every process on the host."""
+
+    def __init__(self, path, sweep_interval=60.0):
+        self._connect = sqlitedb.Connections(path)
+        self._sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                ' key TEXT PRIMARY KEY, idx INTEGER NOT NULL,'
+                ' prev INTEGER NOT NULL, curr INTEGER NOT NULL)'
+            )
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now >= self._next_sweep:
+                cur = conn.execute('DELETE FROM rate_limit WHERE idx < ?', (index - 1,))
+                self.evictions += cur.rowcount
+                self._next_sweep = now + self._sweep_interval
+
+            row = conn.execute(
+                'SELECT idx, prev, curr FROM rate_limit WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                prev, curr = 0, 0
+            elif row[0] == index:
+                prev, curr = row[1], row[2]
+            else:
+                prev, curr = (row[2] if row[0] == index - 1 else 0), 0
+
+            allowed = _estimate(prev, curr, now, window) < limit
+            if allowed:
+                curr += 1
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit (key, idx, prev, curr) VALUES (?, ?, ?, ?)',
+                (key, index, prev, curr),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM rate_limit').fetchone()[0]
+
+
+class RedisBackend:
+    """Backend for any client exposing the redis-py ``register_script`` API.
+
+    Keys carry their window index and expire after two windows, so Redis
+    does the eviction.  The check and the increment run as one Lua script,
+    so workers hitting the same key at once cannot both slip under the limit.
+    The script also adds the client to a HyperLogLog for the current window,
+    so ``len()`` is one PFCOUNT (an estimate within about 1%) instead of a
+    scan of the keyspace.
+    """
+
+    _HIT = """
+    redis.call('PFADD', KEYS[3], ARGV[4])
+    redis.call('EXPIRE', KEYS[3], ARGV[3])
+    local prev = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local curr = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if prev * tonumber(ARGV[1]) + curr >= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return 1
+    """
+
+    def __init__(self, client, prefix='rl:'):
+        self._client = client
+        self._prefix = prefix
+        self._hit = client.register_script(self._HIT)
+        self._window = None
+        self.evictions = 0
+
+    def _clients_key(self, index):
+        return f'{self._prefix}#clients:{index}'
+
+    def hit(self, key, limit, window, now):
+        self._window = window
+        index = int(now // window)
+        # The weight of the previous window, as in _estimate.
+        weight = 1.0 - (now % window) / window
+        keys = [f'{self._prefix}{key}:{index - 1}', f'{self._prefix}{key}:{index}', self._clients_key(index)]
+        return bool(self._hit(keys=keys, args=[repr(weight), limit, int(window * 2), key]))
+
+    def __len__(self):
+        """Distinct clients seen in the current window, across all workers."""
+        if self._window is None:
+            return 0
+        return self._client.pfcount(self._clients_key(int(time.time() // self._window)))
+
+
+class RateLimiter:
+    def __init__(self, limit, window=60.0, backend=None):
+        self.limit = limit
+        self.window = window
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    def hit(self, key, now=None):
+        """Record a request for ``key``; return False if it is over the limit."""
+        if now is None:
+            now = time.time()
+        return self.backend.hit(key, self.limit, self.window, now)
+
+
+def backend_from_env():
+    """Build the backend named by ``RATE_LIMIT_BACKEND``.
+
+    Accepted values are ``memory`` (default), ``sqlite:///path/to/file.db``
+    and ``redis://host:port/db``.
+    """
+    spec = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    if spec.startswith('sqlite:///'):
+        return SQLiteBackend(spec[len('sqlite:///'):])
+    if spec.startswith(('redis://', 'rediss://')):
+        import redis
+        return RedisBackend(redis.Redis.from_url(spec))
+    return MemoryBackend()
@@ -0,0 +1,181 @@
+# singleflight.py
+"""Run concurrent identical work once and share the outcome.
+
+``Group.do(key, fn)`` calls ``fn`` for the first caller of ``key``; callers
+arriving while it runs wait and receive the same return value or exception.
+Nothing is cached afterwards: the next call for ``key`` runs ``fn`` again.
+
+``FileGroup`` extends this across processes (gunicorn workers) sharing a
+directory.  Within a process it first coalesces through a ``Group``; the one
+thread left per process then takes an ``flock`` on a per-key lock file.  The
+leader writes its outcome as JSON before unlocking, and a process that was
+waiting picks that up instead of running ``fn``.  Cross-process results
+must therefore be JSON-serialisable, and errors reach other processes as
+``SharedError``.  The lock is polled rather than blocked on, so it also
+behaves under gevent.  Where ``fcntl`` is missing it is in-process only.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class SharedError(Exception):
+    """An error raised by the leader in another process."""
+
+    def __init__(self, kind, message):
+        super().__init__(f'{kind}: {message}')
+        self.kind = kind
+        self.message = message
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Group:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+
+    def do(self, key, fn):
+        """Return ``(value, shared)``; ``shared`` is True when another caller ran ``fn``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+class FileGroup:
+    def __init__(self, directory, poll_interval=0.01, max_poll_interval=0.1, sweep_every=1000, max_age=3600.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.sweep_every = sweep_every
+        self.max_age = max_age
+        self._local = Group()
+        self.executions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def do(self, key, fn):
+        """Like ``Group.do``, but also coalesced with other processes using ``directory``."""
+        if fcntl is None:
+            return self._local.do(key, fn)
+        (value, shared_remote), shared_local = self._local.do(key, lambda: self._do_locked(key, fn))
+        return value, shared_local or shared_remote
+
+    def _paths(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()[:32]
+        base = os.path.join(self.directory, name)
+        return base + '.lock', base + '.result'
+
+    def _do_locked(self, key, fn):
+        lock_path, result_path = self._paths(key)
+        waiting_since = time.time()
+        with open(lock_path, 'a') as lock_file:
+            self._acquire(lock_file)
+            try:
+                outcome = self._read_result(result_path, key, waiting_since)
+                if outcome is not None:
+                    return self._unpack(outcome), True
+                self.executions += 1
+                if self.executions % self.sweep_every == 0:
+                    self.sweep()
+                try:
+                    value = fn()
+                except Exception as exc:
+                    self._write_result(result_path, {'key': key, 'error': [type(exc).__name__, str(exc)]})
+                    raise
+                self._write_result(result_path, {'key': key, 'value': value})
+                return value, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, lock_file):
+        delay = self.poll_interval
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_poll_interval)
+
+    def _read_result(self, path, key, since):
+        # Only an outcome written while we waited counts; older ones are stale.
+        try:
+            if os.stat(path).st_mtime < since:
+                return None
+            with open(path) as f:
+                outcome = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return outcome if outcome.get('key') == key else None
+
+    def _write_result(self, path, outcome):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(outcome, f)
+        os.replace(tmp, path)
+
+    def sweep(self):
+        """Delete lock and result files of keys idle for ``max_age`` seconds.
+
+        A lock file is only removed while we can lock it ourselves; a process
+        that opened it just before the unlink may still run ``fn`` once more
+        alongside a new leader, which costs duplicate work but nothing else.
+        """
+        cutoff = time.time() - self.max_age
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue
+                    if entry.name.endswith('.lock'):
+                        with open(entry.path, 'a') as lock_file:
+                            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                            os.unlink(entry.path)
+                    elif entry.name.endswith(('.result', '.tmp')):
+                        os.unlink(entry.path)
+                except OSError:
+                    continue
+
+    @staticmethod
+    def _unpack(outcome):
+        if 'error' in outcome:
+            raise SharedError(*outcome['error'])
+        return outcome['value']
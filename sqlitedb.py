@@ -0,0 +1,30 @@
+# sqlitedb.py
+"""Per-thread connections to a SQLite file shared between processes.
+
+``Connections(path)()`` returns this thread's connection to ``path``,
+opening it on first use.  Connections are in autocommit mode (callers
+issue ``BEGIN IMMEDIATE`` themselves when they need a transaction), use
+WAL so readers do not block the writer, and are reopened after a fork
+rather than shared with the parent.
+"""
+import os
+import sqlite3
+import threading
+
+
+class Connections:
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork, so tie them to the pid.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
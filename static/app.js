@@ -0,0 +1,227 @@
+let selectedPlatform = 'windows';
+let commandRules = null;
+
+// Commands are built in the browser from the server's rule table; until it
+// has loaded (or if it fails to) the server endpoints are used instead.
+fetch('/command-rules.json').then(r => r.json()).then(rules => {
+  commandRules = YtCommands.compile(rules);
+}).catch(() => {});
+
+if ('serviceWorker' in navigator) {
+  navigator.serviceWorker.register('/sw.js').catch(() => {});
+}
+
+function switchTab(tabName) {
+  document.querySelectorAll('.tab-content').forEach(tab => tab.classList.remove('active'));
+  document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
+  document.getElementById(tabName).classList.add('active');
+  event.target.classList.add('active');
+}
+
+function selectPlatform(platform, element) {
+  selectedPlatform = platform;
+  document.querySelectorAll('.platform-btn').forEach(btn => btn.classList.remove('active'));
+  element.classList.add('active');
+}
+
+function generateClientCommand(ev) {
+  ev.preventDefault();
+  const url = document.getElementById('clientUrl').value.trim();
+  const format = document.getElementById('clientFormat').value;
+  const mode = document.getElementById('clientMode').value;
+  const profile = document.getElementById('clientProfile').value;
+
+  if(!url) {
+    showError('Please enter a YouTube URL');
+    return;
+  }
+
+  if (commandRules) {
+    if (!YtCommands.parse(commandRules, url)) {
+      showError('Invalid YouTube URL');
+      return;
+    }
+    showClientCommand(YtCommands.clientCommand(commandRules, url, format, mode, selectedPlatform, profile));
+    return;
+  }
+
+  const submitBtn = ev.target.querySelector('button[type="submit"]');
+  submitBtn.disabled = true;
+  submitBtn.textContent = 'Generating...';
+
+  fetch('/generate-client-command', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({url, format, mode, platform: selectedPlatform, profile})
+  }).then(r => r.json()).then(data => {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Generate Download Command';
+    
+    if (data.error) {
+      showError(data.error);
+      return;
+    }
+    
+    showClientCommand(data.command);
+  }).catch(err => {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Generate Download Command';
+    showError('Error generating command');
+  });
+}
+
+function generateLocalCommand(ev) {
+  ev.preventDefault();
+  const url = document.getElementById('localUrl').value.trim();
+  const format = document.getElementById('localFormat').value;
+  const mode = document.getElementById('localMode').value;
+  const profile = document.getElementById('localProfile').value;
+
+  if(!url) {
+    showError('Please enter a YouTube URL');
+    return;
+  }
+
+  if (commandRules) {
+    if (!YtCommands.parse(commandRules, url)) {
+      showError('Invalid YouTube URL');
+      return;
+    }
+    showLocalCommand(YtCommands.desktopCommand(commandRules, url, format, mode, profile), commandRules.rules.cookiesHint);
+    return;
+  }
+
+  const submitBtn = ev.target.querySelector('button[type="submit"]');
+  submitBtn.disabled = true;
+  submitBtn.textContent = 'Generating...';
+
+  fetch('/generate-command', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({url, format, mode, profile})
+  }).then(r => r.json()).then(data => {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Generate Desktop Command';
+    
+    if (data.error) {
+      showError(data.error);
+      return;
+    }
+    
+    showLocalCommand(data.command, data.hint);
+  }).catch(err => {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Generate Desktop Command';
+    showError('Error generating command');
+  });
+}
+
+function showClientCommand(command) {
+  document.getElementById('clientCommandOutput').textContent = command;
+  document.getElementById('clientCommandResult').style.display = 'block';
+  document.getElementById('clientCommandResult').scrollIntoView({ behavior: 'smooth' });
+  hideError();
+}
+
+function showLocalCommand(command, hint) {
+  document.getElementById('commandOutput').textContent = command;
+  document.getElementById('commandHint').textContent = hint || '';
+  document.getElementById('localCommandResult').style.display = 'block';
+  document.getElementById('localCommandResult').scrollIntoView({ behavior: 'smooth' });
+  hideError();
+}
+
+function generateOnlineTools(ev) {
+  ev.preventDefault();
+  const url = document.getElementById('onlineUrl').value.trim();
+
+  if(!url) {
+    showError('Please enter a YouTube URL');
+    return;
+  }
+
+  const submitBtn = ev.target.querySelector('button[type="submit"]');
+  submitBtn.disabled = true;
+  submitBtn.textContent = 'Getting Tools...';
+
+  fetch('/online-tools', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({url})
+  }).then(r => r.json()).then(data => {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Get Online Converter Links';
+    
+    if (data.error) {
+      showError(data.error);
+      return;
+    }
+    
+    const result = document.getElementById('onlineResult');
+    result.innerHTML = `
+      <div class="success">
+        <h3>Online Download Tools</h3>
+        <p>${data.instructions}</p>
+        ${data.tools.map(tool => `
+          <div class="tool-card">
+            <div class="tool-name">${tool.name}</div>
+            <div class="tool-desc">${tool.description}</div>
+            ${tool.status === 'up' ? `<div class="tool-desc">Online, responds in ${tool.latency_ms} ms</div>` : ''}
+            ${tool.status === 'down' ? '<div class="tool-desc">Currently not responding</div>' : ''}
+            <a href="${tool.url}" target="_blank" style="background:var(--accent);color:white;padding:10px 15px;border-radius:6px;text-decoration:none;display:inline-block;">
+              Open ${tool.name}
+            </a>
+          </div>
+        `).join('')}
+      </div>
+    `;
+    result.style.display = 'block';
+    hideError();
+  }).catch(err => {
+    submitBtn.disabled = false;
+    submitBtn.textContent = 'Get Online Converter Links';
+    showError('Error getting tools');
+  });
+}
+
+function copyClientCommand() {
+  copyToClipboard(document.getElementById('clientCommandOutput').textContent);
+}
+
+function copyCommand() {
+  copyToClipboard(document.getElementById('commandOutput').textContent);
+}
+
+function copyToClipboard(text) {
+  navigator.clipboard.writeText(text).then(() => {
+    alert('Command copied to clipboard!');
+  });
+}
+
+function showError(message) {
+  let errorDiv = document.getElementById('errorArea');
+  if (!errorDiv) {
+    errorDiv = document.createElement('div');
+    errorDiv.id = 'errorArea';
+    errorDiv.className = 'error';
+    document.querySelector('.card').appendChild(errorDiv);
+  }
+  errorDiv.textContent = message;
+  errorDiv.style.display = 'block';
+}
+
+function hideError() {
+  const errorDiv = document.getElementById('errorArea');
+  if (errorDiv) errorDiv.style.display = 'none';
+}
+
+document.querySelectorAll('input[type="url"]').forEach(input => {
+  input.addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+      const activeTab = document.querySelector('.tab-content.active').id;
+      if (activeTab === 'client-tab') generateClientCommand(new Event('submit'));
+      else if (activeTab === 'desktop-tab') generateLocalCommand(new Event('submit'));
+      else if (activeTab === 'online-tab') generateOnlineTools(new Event('submit'));
+    }
+  });
+});
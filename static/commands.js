@@ -0,0 +1,169 @@
+// Browser port of urlparser.parse_youtube_url and commands.client_command /
+// commands.desktop_command. All tables come from /command-rules.json, which the
+// server generates from the Python modules; tools/check_command_parity.py keeps
+// the two implementations in step.
+var YtCommands = (function() {
+  function compile(rules) {
+    const url = rules.url;
+    return {
+      rules: rules,
+      unsafe: new RegExp(url.unsafe),
+      videoId: new RegExp('^(?:' + url.videoId + ')$'),
+      listId: new RegExp('^(?:' + url.listId + ')$'),
+      youtubeHosts: new Set(url.youtubeHosts),
+      shortHosts: new Set(url.shortHosts),
+      idPaths: new Map(Object.entries(url.idPaths)),
+      shells: new Map(Object.entries(rules.shells)),
+      windowsUrlSafe: new Set(rules.windowsUrlSafe),
+    };
+  }
+
+  // Same splitting rules as Python's urllib.parse.urlsplit for http(s) URLs.
+  function splitUrl(url) {
+    url = url.replace(/[\t\r\n]/g, '');
+    let rest = url.slice(url.indexOf(':') + 1);
+    let netloc = '';
+    if (rest.startsWith('//')) {
+      let end = rest.length;
+      for (const c of '/?#') {
+        const i = rest.indexOf(c, 2);
+        if (i >= 0 && i < end) end = i;
+      }
+      netloc = rest.slice(2, end);
+      rest = rest.slice(end);
+      if (netloc.includes('[') !== netloc.includes(']')) return null;
+    }
+    const hash = rest.indexOf('#');
+    if (hash >= 0) rest = rest.slice(0, hash);
+    const q = rest.indexOf('?');
+    return {
+      netloc: netloc,
+      path: q >= 0 ? rest.slice(0, q) : rest,
+      query: q >= 0 ? rest.slice(q + 1) : '',
+    };
+  }
+
+  function queryParams(query) {
+    const params = new Map();
+    if (query) {
+      for (const pair of query.split('&')) {
+        const eq = pair.indexOf('=');
+        const key = eq >= 0 ? pair.slice(0, eq) : pair;
+        const value = eq >= 0 ? pair.slice(eq + 1) : '';
+        if (['v', 'list', 't', 'start'].includes(key) && !params.has(key)) params.set(key, value);
+      }
+    }
+    return params;
+  }
+
+  function parse(c, url) {
+    if (!(url.startsWith('http://') || url.startsWith('https://')) || c.unsafe.test(url.toLowerCase())) {
+      return null;
+    }
+    const parts = splitUrl(url);
+    if (!parts) return null;
+
+    const host = parts.netloc.toLowerCase();
+    const segments = parts.path.split('/');
+    const params = queryParams(parts.query);
+
+    const playlistId = params.has('list') ? params.get('list') : null;
+    if (playlistId !== null && !c.listId.test(playlistId)) return null;
+
+    let kind, videoId;
+    if (c.shortHosts.has(host)) {
+      kind = 'video';
+      videoId = segments.length > 1 ? segments[1] : '';
+    } else if (c.youtubeHosts.has(host)) {
+      const head = segments.length > 1 ? segments[1] : '';
+      if (head === 'watch') {
+        kind = 'video';
+        videoId = params.has('v') ? params.get('v') : null;
+      } else if (head === 'playlist') {
+        kind = 'playlist';
+        videoId = null;
+      } else if (c.idPaths.has(head) && segments.length > 2) {
+        kind = c.idPaths.get(head);
+        videoId = segments[2];
+        if (head === 'embed' && videoId === 'videoseries') {
+          kind = 'playlist';
+          videoId = null;
+        }
+      } else {
+        return null;
+      }
+    } else {
+      return null;
+    }
+
+    if (videoId === null) {
+      if (playlistId === null) return null;
+      kind = 'playlist';
+    } else if (!c.videoId.test(videoId)) {
+      return null;
+    }
+    return {kind: kind, videoId: videoId, playlistId: playlistId, url: url};
+  }
+
+  function canonicalUrl(parsed) {
+    if (parsed.videoId === null) return 'https://www.youtube.com/playlist?list=' + parsed.playlistId;
+    if (parsed.playlistId === null) return 'https://www.youtube.com/watch?v=' + parsed.videoId;
+    return 'https://www.youtube.com/watch?v=' + parsed.videoId + '&list=' + parsed.playlistId;
+  }
+
+  const ALWAYS_SAFE = /^[A-Za-z0-9_.\-~]$/;
+  const POSIX_UNSAFE = /[^\w@%+=:,.\/-]/;
+
+  function quoteUrl(c, url, shell) {
+    if (shell === 'posix') {
+      if (!url) return "''";
+      if (!POSIX_UNSAFE.test(url)) return url;
+      return "'" + url.replace(/'/g, "'\"'\"'") + "'";
+    }
+    let out = '';
+    for (const ch of url) {
+      if (ALWAYS_SAFE.test(ch) || c.windowsUrlSafe.has(ch)) {
+        out += ch;
+      } else {
+        for (const b of new TextEncoder().encode(ch)) {
+          out += '%' + b.toString(16).toUpperCase().padStart(2, '0');
+        }
+      }
+    }
+    return '"' + out + '"';
+  }
+
+  function normalize(c, fmt, mode, platform, profile) {
+    return [
+      fmt === 'video' ? 'video' : 'audio',
+      mode === 'single' ? 'single' : 'playlist',
+      c.shells.has(platform) ? platform : 'linux',
+      Object.prototype.hasOwnProperty.call(c.rules.profiles, profile) ? profile : c.rules.defaultProfile,
+    ];
+  }
+
+  function clientCommand(c, url, fmt, mode, platform, profile) {
+    [fmt, mode, platform, profile] = normalize(c, fmt, mode, platform, profile);
+    const parsed = parse(c, url);
+    const target = parsed ? canonicalUrl(parsed) : url;
+    const prefix = c.rules.client[platform + '|' + fmt + '|' + mode + '|' + profile];
+    return prefix + ' ' + quoteUrl(c, target, c.shells.get(platform));
+  }
+
+  function desktopCommand(c, url, fmt, mode, profile) {
+    [fmt, mode, , profile] = normalize(c, fmt, mode, undefined, profile);
+    const parsed = parse(c, url);
+    const target = parsed ? canonicalUrl(parsed) : url;
+    const prefix = c.rules.desktop[fmt + '|' + mode + '|' + profile];
+    return prefix + ' ' + quoteUrl(c, target, c.rules.desktopShell);
+  }
+
+  return {
+    compile: compile,
+    parse: parse,
+    clientCommand: clientCommand,
+    desktopCommand: desktopCommand,
+  };
+})();
+
+if (typeof module !== 'undefined') module.exports = YtCommands;
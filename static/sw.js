@@ -0,0 +1,33 @@
+// Service worker caching the app shell. assets.build() fills in the cache
+// name and the list of URLs, so every deploy that changes a file installs a
+// fresh cache and drops the old one.
+const CACHE_NAME = '__CACHE_NAME__';
+const APP_SHELL = __APP_SHELL__;
+
+self.addEventListener('install', event => {
+  event.waitUntil(
+    caches.open(CACHE_NAME)
+      .then(cache => cache.addAll(APP_SHELL))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil(
+    caches.keys()
+      .then(keys => Promise.all(keys.filter(key => key !== CACHE_NAME).map(key => caches.delete(key))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  const url = new URL(request.url);
+  // Command, batch and tool requests always go to the server.
+  if (request.method !== 'GET' || url.origin !== self.location.origin || !APP_SHELL.includes(url.pathname)) {
+    return;
+  }
+  event.respondWith(
+    caches.match(request, {ignoreSearch: true}).then(cached => cached || fetch(request))
+  );
+});
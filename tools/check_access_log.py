@@ -0,0 +1,177 @@
+# tools/check_access_log.py
+"""Check the JSON access log: fields, batching, dropping and rotation.
+
+    python tools/check_access_log.py
+
+Sends requests through the app and checks the logged fields.  Then it
+checks that records are written in batches, that a stuck writer makes
+the log drop records instead of blocking requests, and that rotation by
+size and by age keeps every line.  The size check includes four worker
+processes rotating one shared file.  Exits non-zero on the first failure.
+"""
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import accesslog
+from check_download_jobs import check
+
+VIDEO_URL = 'https://youtu.be/dQw4w9WgXcQ?si=x'
+
+
+def read_lines(pattern):
+    lines = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def check_fields(tmp):
+    import app as app_module
+    path = os.path.join(tmp, 'access.log')
+    flask_app = app_module.create_app({'ACCESS_LOG': path})
+    client = flask_app.test_client()
+    client.post('/generate-client-command', json={'url': VIDEO_URL, 'platform': 'linux'})
+    client.post('/generate-client-command', json={'url': 'https://example.com/watch?v=dQw4w9WgXcQ'})
+    client.get('/')
+    client.get('/no-such-page')
+    for _ in range(16):
+        limited = client.post('/online-tools', json={'url': VIDEO_URL}, environ_base={'REMOTE_ADDR': '10.9.9.9'})
+    flask_app.extensions['access_log'].stop()
+    records = [json.loads(line) for line in read_lines(path)]
+    check(len(records) == 20, f'every request is logged once ({len(records)} records)')
+    first = records[0]
+    check(set(first) == {'ts', 'pid', 'method', 'route', 'status', 'latency_ms', 'video_id', 'rate_limit'},
+          f'records carry the expected fields ({sorted(first)})')
+    check(first['route'] == '/generate-client-command' and first['status'] == 200 and first['method'] == 'POST'
+          and first['video_id'] == 'dQw4w9WgXcQ' and first['rate_limit'] == 'allowed' and first['pid'] == os.getpid()
+          and 0 < first['latency_ms'] < 1000, 'a command request logs its route, video id and rate-limit decision')
+    check(records[1]['video_id'] is None, 'an invalid URL logs no video id')
+    check(records[2]['rate_limit'] is None and records[3]['route'] == 'unmatched' and records[3]['status'] == 404,
+          'unlimited and unmatched routes are logged too')
+    check(limited.status_code == 429 and records[-1]['rate_limit'] == 'limited' and records[-1]['video_id'] is None,
+          'rate-limited requests are logged as such')
+
+
+class CountingWriter(accesslog.RotatingWriter):
+    def __init__(self, path, gate=None):
+        super().__init__(path)
+        self.writes = 0
+        self.gate = gate
+
+    def write(self, text, now=None):
+        if self.gate is not None:
+            self.gate.wait()
+        self.writes += 1
+        super().write(text, now)
+
+
+def check_batching(tmp):
+    log = accesslog.AccessLog(os.path.join(tmp, 'batched.log'))
+    log.writer = CountingWriter(log.writer.path)
+    for index in range(2000):
+        log.log({'index': index})
+    log.stop()
+    indexes = [json.loads(line)['index'] for line in read_lines(log.writer.path)]
+    check(indexes == list(range(2000)), 'records are written in order')
+    check(log.writer.writes <= 20, f'2000 records take {log.writer.writes} writes')
+
+    gate = threading.Event()
+    stuck = accesslog.AccessLog(os.path.join(tmp, 'stuck.log'), queue_size=100)
+    stuck.writer = CountingWriter(stuck.writer.path, gate)
+    slowest = 0.0
+    for index in range(1000):
+        started = time.perf_counter()
+        stuck.log({'index': index})
+        slowest = max(slowest, time.perf_counter() - started)
+    check(slowest < 0.05, f'a stuck writer never blocks a request (slowest {slowest * 1000:.2f} ms)')
+    check(stuck.dropped >= 800, f'records beyond the queue are dropped and counted ({stuck.dropped})')
+    gate.set()
+    stuck.stop()
+    written = len(read_lines(stuck.writer.path))
+    check(written + stuck.dropped == 1000, f'everything not dropped is written ({written} + {stuck.dropped})')
+
+    handler = accesslog.DroppingQueueHandler(queue.Queue(maxsize=10))
+    handler.lock = CountingLock()
+    threads = [threading.Thread(target=lambda: [handler.handle(logging.makeLogRecord({})) for _ in range(5000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check(handler.lock.acquired == 0, 'handling a record takes no handler lock')
+    check(handler.dropped == 8 * 5000 - 10, f'drops from 8 threads are all counted ({handler.dropped})')
+
+
+class CountingLock:
+    """Stands in for a handler's lock and counts how often it is taken."""
+
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+    def release(self):
+        pass
+
+
+def check_time_rotation(tmp):
+    path = os.path.join(tmp, 'timed.log')
+    writer = accesslog.RotatingWriter(path, max_bytes=0, interval=3600, backups=2)
+    start = time.time()
+    for hour in range(5):
+        writer.write(f'hour {hour}\n', now=start + hour * 3600 + 1)
+    writer.close()
+    rotated = sorted(glob.glob(path + '.2*'))
+    check(writer.rotations == 4 and len(rotated) == 2, f'hourly rotation keeps 2 backups ({len(rotated)} kept)')
+    check(read_lines(path) == ['hour 4'], 'the current file only holds the current hour')
+
+
+def write_many(path, worker, count):
+    writer = accesslog.RotatingWriter(path, max_bytes=64 * 1024, interval=0, backups=1000)
+    for start in range(0, count, 50):
+        writer.write(''.join(json.dumps({'worker': worker, 'n': n, 'pad': 'x' * 60}) + '\n'
+                             for n in range(start, start + 50)))
+    writer.close()
+
+
+def check_size_rotation(tmp):
+    path = os.path.join(tmp, 'shared.log')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=write_many, args=(path, worker, 4000)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    files = glob.glob(path + '*')
+    files.remove(path + '.lock')
+    records = [json.loads(line) for name in files for line in read_lines(name)]
+    seen = {(record['worker'], record['n']) for record in records}
+    check(len(records) == len(seen) == 16000, f'4 processes rotating one file lose no lines ({len(records)} kept)')
+    largest = max(os.path.getsize(name) for name in files)
+    check(len(files) > 10 and largest < 2 * 64 * 1024, f'the file is rotated by size ({len(files)} files)')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_fields(tmp)
+        check_batching(tmp)
+        check_time_rotation(tmp)
+        check_size_rotation(tmp)
+
+
+if __name__ == '__main__':
+    main()
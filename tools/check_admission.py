@@ -0,0 +1,150 @@
+# tools/check_admission.py
+"""Check admission control: slots, the wait queue, shedding and adaptive limits.
+
+    python tools/check_admission.py
+
+Exercises admission.Limiter directly, then floods /metadata (backed by a
+slow stand-in extractor) through the Flask app and checks that extra
+requests get 503 with Retry-After while cheap routes still answer, and that
+slots are returned once streamed responses are closed.  Exits non-zero on
+the first failure.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import admission
+from check_download_jobs import check
+
+
+def rejected(limiter):
+    try:
+        limiter.acquire()
+    except admission.Rejected as exc:
+        return exc
+    return None
+
+
+def check_limiter():
+    limiter = admission.Limiter('test', 2, queue_size=1, queue_timeout=0.2, adaptive=False)
+    limiter.acquire()
+    limiter.acquire()
+    started = time.perf_counter()
+    exc = rejected(limiter)
+    elapsed = time.perf_counter() - started
+    check(exc is not None and 0.18 < elapsed < 0.5 and exc.retry_after >= 1,
+          f'a queued request is rejected at its deadline ({elapsed * 1000:.0f} ms, Retry-After {exc and exc.retry_after})')
+
+    waiting = threading.Thread(target=limiter.acquire)
+    waiting.start()
+    time.sleep(0.05)
+    check(limiter.queued == 1 and rejected(limiter) is not None and limiter.rejected == 2,
+          'a full queue rejects at once')
+    limiter.release()
+    waiting.join(1)
+    check(not waiting.is_alive() and limiter.in_flight == 2 and limiter.queued == 0,
+          'a released slot goes to the queued request')
+    limiter.release()
+    limiter.release()
+    check(limiter.in_flight == 0, 'every slot is returned')
+
+    adaptive = admission.Limiter('adaptive', 4, min_limit=1, max_limit=8)
+    for _ in range(50):
+        adaptive.acquire()
+        adaptive.release(0.01)
+    check(adaptive.limit == 4, f'an idle class does not grow its limit ({adaptive.limit})')
+    for _ in range(50):
+        for _ in range(int(adaptive.limit)):
+            adaptive.acquire()
+        for _ in range(int(adaptive.limit)):
+            adaptive.release(0.01)
+    check(adaptive.limit == 8, f'a busy class with steady latency grows to max_limit ({adaptive.limit:.2f})')
+    for _ in range(30):
+        adaptive.acquire()
+        adaptive.release(0.5)
+    check(adaptive.limit < 2, f'rising latency shrinks the limit ({adaptive.limit:.2f})')
+    check(adaptive.retry_after() == 1, 'Retry-After is whole seconds, at least one')
+    for _ in range(400):
+        for _ in range(int(adaptive.limit)):
+            adaptive.acquire()
+        for _ in range(int(adaptive.limit)):
+            adaptive.release(0.5)
+    check(adaptive.limit > 4, f'the limit recovers once the latency is the new normal ({adaptive.limit:.2f})')
+
+    sluggish = admission.Limiter('sluggish', 4, recent_weight=0.01)
+    for latency in [0.01] * 20 + [0.5] * 5:
+        sluggish.acquire()
+        sluggish.release(latency)
+    check(sluggish.limit == 4 and sluggish.recent_latency < 0.1,
+          f'recent_weight sets how fast the recent latency moves ({sluggish.recent_latency:.3f})')
+
+
+class SlowExtractor:
+    def extract(self, url):
+        time.sleep(0.5)
+        return {'title': url}
+
+
+def check_app():
+    import app as app_module
+    flask_app = app_module.create_app({
+        'ADMISSION_ENABLED': True,
+        'METADATA_ENABLED': True,
+        'METADATA_DB': os.path.join(tempfile.mkdtemp(), 'metadata.db'),
+        'METADATA_EXTRACTOR': SlowExtractor(),
+    })
+    limiters = flask_app.extensions['admission']
+    check(limiters['expensive'].max_limit > limiters['expensive'].limit,
+          f'the expensive class may grow past its starting limit (to {limiters["expensive"].max_limit})')
+    statuses = []
+
+    def lookup(index):
+        response = flask_app.test_client().get(
+            '/metadata', query_string={'url': f'https://youtu.be/{index:011d}'},
+            environ_base={'REMOTE_ADDR': f'10.0.0.{index}'})
+        statuses.append((response.status_code, response.headers.get('Retry-After')))
+
+    threads = [threading.Thread(target=lookup, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    client = flask_app.test_client()
+    started = time.perf_counter()
+    response = client.post('/generate-client-command', json={'url': 'https://youtu.be/dQw4w9WgXcQ'})
+    elapsed = time.perf_counter() - started
+    check(response.status_code == 200 and elapsed < 0.1,
+          f'cheap routes answer while /metadata is saturated ({elapsed * 1000:.1f} ms)')
+    gauges = client.get('/metrics').get_data(as_text=True)
+    check('admission_in_flight{class="expensive"' in gauges and 'admission_queued{class="expensive"' in gauges,
+          '/metrics exposes in-flight and queued requests per class')
+    for thread in threads:
+        thread.join()
+    served = [status for status, _ in statuses if status == 200]
+    shed = [retry for status, retry in statuses if status == 503]
+    check(len(served) == 2 and len(shed) == 4 and all(retry and int(retry) >= 1 for retry in shed),
+          f'/metadata beyond limit + queue is shed with 503 and Retry-After ({sorted(statuses, key=str)})')
+    check('admission_rejected_total{class="expensive"' in client.get('/metrics').get_data(as_text=True),
+          'rejections are counted')
+
+    with client.post('/generate-script', data='https://youtu.be/dQw4w9WgXcQ') as response:
+        response.get_data()
+        check(limiters['cheap'].in_flight == 1, 'a streamed response holds its slot while it is sent')
+    check(all(limiter.in_flight == 0 for limiter in limiters.values()), 'closing a response returns its slot')
+
+    disabled = app_module.create_app({'ADMISSION_ENABLED': False})
+    check('admission' not in disabled.extensions, 'ADMISSION_ENABLED=0 turns admission control off')
+
+
+def main():
+    check_limiter()
+    check_app()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# tools/check_batch.py
+"""Check /generate-batch against the body shapes clients send.
+
+    python tools/check_batch.py
+
+Posts JSON objects, bare JSON lists, other JSON values and newline
+separated text, and checks the per-item results and errors.  Bodies over
+the size cap must be refused, with or without a Content-Length, and the
+results of a text body must be streamed.  Exits non-zero
+on the first failure.
+"""
+import io
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', str(10 ** 9))
+
+from check_download_jobs import check
+
+URLS = ['https://youtu.be/dQw4w9WgXcQ', 'https://example.com/', 'https://www.youtube.com/shorts/9bZkp7q19f0']
+
+
+def items(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def main():
+    import app as app_module
+    client = app_module.create_app({'METRICS_ENABLED': False}).test_client()
+
+    result = items(client.post('/generate-batch', json={'urls': URLS + [42], 'platform': 'linux'}))
+    check([('command' in item, item.get('error')) for item in result]
+          == [(True, None), (False, 'Invalid YouTube URL'), (True, None), (False, 'Invalid YouTube URL')],
+          'a JSON object yields one result per URL, with per-item errors')
+    check(result[0]['command'].startswith('python3 '), 'the spec in the object is used')
+    result = items(client.post('/generate-batch', json=URLS))
+    check(len(result) == 3 and result[0]['command'].startswith('python -m yt_dlp'),
+          'a bare JSON list is read as the URLs, with the default spec')
+    for body in ('"text"', '42', 'null', '{"urls": "x"}', '{not json'):
+        response = client.post('/generate-batch', data=body, content_type='application/json')
+        check(response.status_code == 400 and response.get_json() == {'error': 'Expected a list of URLs'},
+              f'a JSON body of {body} gets a 400')
+
+    response = client.post('/generate-batch', query_string={'target': 'desktop'}, data='\n'.join(URLS) + '\n')
+    check([item['index'] for item in items(response)] == [0, 1, 2], 'a text body is read line by line')
+
+    limit = app_module.MAX_BODY_BYTES
+    line = (URLS[0] + '?si=' + 'x' * 400 + '\n').encode()
+    oversized = line * (limit // len(line) + 1)
+    response = client.post('/generate-batch', json=[URLS[0]] * (limit // len(URLS[0])))
+    check(response.status_code == 413, 'an oversized JSON body is refused')
+    response = client.post('/generate-batch', data=oversized)
+    check(response.status_code == 413, 'an oversized text body with a Content-Length is refused')
+    with client.post('/generate-batch', input_stream=io.BytesIO(oversized),
+                     headers={'Transfer-Encoding': 'chunked'},
+                     environ_base={'wsgi.input_terminated': True}) as response:
+        result = items(response)
+    check(len(result) == limit // len(line) + 1 and 'command' in result[-2] and result[-1]['error'] == 'URL too long',
+          f'a chunked body stops at the cap with an error item ({len(result)} items)')
+
+    with client.post('/generate-batch', data=line * 2000) as response:
+        first = next(iter(response.response))
+        check(response.is_streamed and json.loads(first)['index'] == 0, 'results stream as the body is read')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# tools/check_batch_scripts.py
+"""Check the generated batch download scripts.
+
+    python tools/check_batch_scripts.py
+
+Every bash variant (mac, linux, Termux for each format, mode and profile)
+must pass ``bash -n``; the PowerShell variants go through PowerShell's
+parser when ``pwsh`` is on PATH.  Every bash variant is then run against
+stand-in ``python``/``pkg``/``pip`` commands that record their arguments,
+which must match the client command for the same variant, with no file
+left behind by a stray redirect.  The stand-ins also check the parallelism
+bound, the shared archive and the exit status, and /generate-script is
+checked to stream.  Exits non-zero on the first failure.
+"""
+import itertools
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batchscript
+import commands
+from check_download_jobs import check
+
+URLS = [f'https://youtu.be/{index:011d}' for index in range(12)]
+
+# Logs its start and end with the URL (its last argument) and its own name,
+# then exits with $STUB_STATUS.
+STUB = '''#!/bin/sh
+for last; do :; done
+echo "start $(date +%s.%N) $last $(basename "$0") $*" >> "$STUB_LOG"
+sleep 0.3
+echo "end $(date +%s.%N) $last" >> "$STUB_LOG"
+exit "${STUB_STATUS:-0}"
+'''
+
+# Appends its arguments to $STUB_LOG, NUL-separated, one invocation per line.
+ARGV_STUB = '''#!/bin/sh
+{ printf '%s\\0' "$@"; echo; } >> "$STUB_LOG"
+'''
+
+
+def render(platform, fmt='video', mode='single', profile=commands.DEFAULT_PROFILE, urls=URLS, jobs=4):
+    return ''.join(batchscript.script(urls, fmt, mode, platform, profile, jobs))
+
+
+def check_syntax(tmp):
+    posix = [platform for platform in commands.PLATFORMS if commands.SHELLS[platform] == 'posix']
+    variants = list(itertools.product(posix, commands.FORMATS, commands.MODES, commands.PROFILES))
+    for platform, fmt, mode, profile in variants:
+        path = os.path.join(tmp, 'download.sh')
+        with open(path, 'w') as f:
+            f.write(render(platform, fmt, mode, profile))
+        result = subprocess.run(['bash', '-n', path], capture_output=True, text=True)
+        if result.returncode:
+            check(False, f'bash -n {platform}/{fmt}/{mode}/{profile}: {result.stderr.strip()}')
+    check(True, f'{len(variants)} bash variants pass bash -n')
+
+    pwsh = shutil.which('pwsh') or shutil.which('powershell')
+    if pwsh is None:
+        print('skip: PowerShell variants (no pwsh on PATH)')
+        return
+    variants = list(itertools.product(commands.FORMATS, commands.MODES, commands.PROFILES))
+    for fmt, mode, profile in variants:
+        path = os.path.join(tmp, 'download.ps1')
+        with open(path, 'w') as f:
+            f.write(render('windows', fmt, mode, profile))
+        parse = ('$errors = $null; [void][System.Management.Automation.Language.Parser]::ParseFile('
+                 f"'{path}', [ref]$null, [ref]$errors); $errors | ForEach-Object {{ $_.Message }}")
+        errors = subprocess.run([pwsh, '-NoProfile', '-Command', parse], capture_output=True, text=True).stdout
+        check(not errors.strip(), f'PowerShell parses windows/{fmt}/{mode}/{profile} {errors.strip()}')
+
+
+def expected_argv(url, fmt, mode, platform, profile):
+    """The client command's yt-dlp arguments, with the archive the script always adds."""
+    words = shlex.split(commands.client_command(url, fmt, mode, platform, profile).rsplit(' && ', 1)[-1])[1:]
+    if '--download-archive' not in words:
+        words[-1:-1] = ['--download-archive', commands.ARCHIVE_FILE]
+    return words
+
+
+def check_variants(tmp):
+    bin_dir = os.path.join(tmp, 'argv-bin')
+    os.makedirs(bin_dir)
+    for name in ('python', 'python3', 'pkg', 'pip'):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(ARGV_STUB)
+        os.chmod(path, 0o755)
+    urls = [f'https://www.youtube.com/watch?v={index:011d}' for index in range(2)]
+    log = os.path.join(tmp, 'argv.log')
+    workdir = os.path.join(tmp, 'work')
+    posix = [platform for platform in commands.PLATFORMS if commands.SHELLS[platform] == 'posix']
+    variants = list(itertools.product(posix, commands.FORMATS, commands.MODES, commands.PROFILES))
+    for platform, fmt, mode, profile in variants:
+        name = f'{platform}/{fmt}/{mode}/{profile}'
+        os.makedirs(workdir)
+        open(log, 'w').close()
+        script = os.path.join(tmp, 'download.sh')
+        with open(script, 'w') as f:
+            f.write(render(platform, fmt, mode, profile, urls=urls, jobs=2))
+        env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ['PATH'], STUB_LOG=log)
+        result = subprocess.run(['bash', script], cwd=workdir, env=env, capture_output=True, text=True, timeout=60)
+        if result.returncode:
+            check(False, f'{name}: script exited {result.returncode}: {result.stderr.strip()}')
+        # A selector outside quotes turns '<' or '>' into a redirect.
+        if os.listdir(workdir):
+            check(False, f'{name}: script left {os.listdir(workdir)} behind')
+        with open(log) as f:
+            downloads = sorted(call for call in (line.rstrip('\n').split('\0')[:-1] for line in f)
+                               if call[:2] == ['-m', 'yt_dlp'])
+        expected = [expected_argv(url, fmt, mode, platform, profile) for url in urls]
+        if downloads != expected:
+            check(False, f'{name}: yt-dlp got {downloads}, expected {expected}')
+        os.remove(log)
+        os.rmdir(workdir)
+    check(True, f'{len(variants)} bash variants give yt-dlp the client command for every URL')
+
+
+def run(tmp, platform, status=0, jobs=4):
+    """Run the bash script for ``platform`` against the stub; return (exit code, stderr, log lines)."""
+    bin_dir = os.path.join(tmp, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    for name in ('python', 'python3', 'pkg', 'pip'):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(STUB)
+        os.chmod(path, 0o755)
+    log = os.path.join(tmp, f'{platform}.log')
+    script = os.path.join(tmp, f'{platform}.sh')
+    with open(script, 'w') as f:
+        f.write(render(platform, jobs=jobs))
+    env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ['PATH'],
+               STUB_LOG=log, STUB_STATUS=str(status))
+    result = subprocess.run(['bash', script], cwd=tmp, env=env, capture_output=True, text=True, timeout=60)
+    with open(log) as f:
+        return result.returncode, result.stderr, [line.split() for line in f]
+
+
+def max_overlap(lines):
+    running = peak = 0
+    for line in sorted(lines, key=lambda line: (float(line[1]), line[0] == 'start')):
+        running += 1 if line[0] == 'start' else -1
+        peak = max(peak, running)
+    return peak
+
+
+def check_runs(tmp):
+    canonical = [f'https://www.youtube.com/watch?v={index:011d}' for index in range(12)]
+    for platform in ('linux', 'mac', 'mobile'):
+        code, _, lines = run(tmp, platform, jobs=3)
+        downloads = [line for line in lines if line[0] == 'start' and '-m' in line]
+        check(code == 0, f'{platform}: script exits 0')
+        check(sorted(line[2] for line in downloads) == canonical, f'{platform}: every URL downloaded once')
+        check(all(f'--download-archive {commands.ARCHIVE_FILE}' in ' '.join(line) for line in downloads),
+              f'{platform}: every download shares the archive')
+        peak = max_overlap([line for line in lines if line[2] in canonical])
+        check(1 < peak <= 3, f'{platform}: at most JOBS=3 downloads at once (saw {peak})')
+        if platform == 'mobile':
+            starts = [line[3] for line in lines if line[0] == 'start']
+            check(starts[:2] == ['pkg', 'pip'], 'mobile: installs python and yt-dlp first')
+
+    code, stderr, _ = run(tmp, 'linux', status=1)
+    check(code != 0 and 'run this script again' in stderr, 'failed downloads make the script fail')
+
+
+def check_streaming():
+    consumed = []
+
+    def urls():
+        for index in range(100000):
+            consumed.append(index)
+            yield f'https://youtu.be/{index:011d}'
+
+    chunks = batchscript.script(urls(), 'video', 'single', 'linux')
+    while 'watch?v=' not in next(chunks):
+        pass
+    check(len(consumed) == 1, 'the script starts before the URL list is read')
+    body = ''.join(chunks)
+    check(body.count('watch?v=') == 9999 and '# Skipped entries: 90000 over the limit' in body,
+          'URLs beyond the limit are counted, not written')
+
+    empty = render('linux', urls=['nope', ''])
+    check('xargs' not in empty and '1 not a YouTube URL' in empty, 'a list without YouTube URLs runs nothing')
+    hostile = render('linux', urls=['https://youtu.be/dQw4w9WgXcQ?x=$(id)', 'URLS\n$(id)'])
+    check('$(id)' not in hostile, 'request input never reaches the script verbatim')
+
+    import app as app_module
+    client = app_module.create_app().test_client()
+    with client.post('/generate-script', query_string={'platform': 'windows'}, data='\n'.join(URLS)) as response:
+        check(response.is_streamed and response.headers['Content-Disposition'].endswith('download.ps1"')
+              and response.get_data(as_text=True).count("'https://www.youtube.com/watch?v=") == len(URLS),
+              '/generate-script streams a PowerShell script for windows')
+    response = client.post('/generate-script', json={'urls': URLS, 'platform': 'mobile', 'jobs': 99})
+    check('JOBS:-16' in response.get_data(as_text=True), 'parallelism is capped')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_syntax(tmp)
+        check_variants(tmp)
+        check_runs(tmp)
+    check_streaming()
+
+
+if __name__ == '__main__':
+    main()
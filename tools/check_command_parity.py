@@ -0,0 +1,120 @@
+# tools/check_command_parity.py
+"""Check that static/commands.js and commands.py produce identical output.
+
+    python tools/check_command_parity.py
+
+Runs every URL in the corpus through both implementations, for every
+platform, format, mode and profile, and exits non-zero on the first difference.
+Needs ``node`` on PATH.
+"""
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import commands
+from urlparser import parse_youtube_url
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+LIST_ID = 'PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI'
+
+CORPUS = [
+    f'https://www.youtube.com/watch?v={VIDEO_ID}',
+    f'http://youtube.com/watch?v={VIDEO_ID}&t=42s',
+    f'https://www.youtube.com/watch?feature=share&v={VIDEO_ID}&list={LIST_ID}',
+    f'https://youtu.be/{VIDEO_ID}?si=abc&list={LIST_ID}',
+    f'https://WWW.YouTube.com/watch?v={VIDEO_ID}',
+    f'https://m.youtube.com/watch?v={VIDEO_ID}#t=10',
+    f'https://music.youtube.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/shorts/{VIDEO_ID}',
+    f'https://www.youtube.com/live/{VIDEO_ID}?feature=share',
+    f'https://www.youtube-nocookie.com/embed/{VIDEO_ID}',
+    f'https://www.youtube.com/embed/videoseries?list={LIST_ID}',
+    f'https://www.youtube.com/playlist?list={LIST_ID}',
+    f'https://www.youtube.com/playlist?list=',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}x',
+    f'https://www.youtube.com/watch?v=',
+    f'https://youtube.com@evil.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com:443/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}&next=javascript:alert(1)',
+    f'https://www.youtube.com/../watch?v={VIDEO_ID}',
+    f'https://[www.youtube.com/watch?v={VIDEO_ID}',
+    f'https://www.you\ttube.com/watch?v={VIDEO_ID}',
+    f'youtube.com/watch?v={VIDEO_ID}',
+    'https://example.com/?q="$(rm -rf ~)"&x=`id`!^%20\'',
+    'https://example.com/ünïcode',
+    '',
+]
+
+# 'toString' must not be mistaken for a profile by the JS object lookup.
+PROFILES = tuple(commands.PROFILES) + ('other', 'toString')
+
+
+def python_results():
+    results = []
+    for url in CORPUS:
+        parsed = parse_youtube_url(url)
+        results.append({'valid': parsed is not None})
+        for platform, fmt, mode, profile in itertools.product(
+                commands.PLATFORMS + ('other',), commands.FORMATS, commands.MODES, PROFILES):
+            results.append(commands.client_command(url, fmt, mode, platform, profile))
+        for fmt, mode, profile in itertools.product(commands.FORMATS, commands.MODES, PROFILES):
+            results.append(commands.desktop_command(url, fmt, mode, profile))
+    return results
+
+
+NODE_SCRIPT = """
+const YtCommands = require(process.argv[1]);
+const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const c = YtCommands.compile(input.rules);
+const results = [];
+for (const url of input.corpus) {
+  results.push({valid: YtCommands.parse(c, url) !== null});
+  for (const platform of input.platforms) for (const fmt of input.formats) for (const mode of input.modes) {
+    for (const profile of input.profiles) {
+      results.push(YtCommands.clientCommand(c, url, fmt, mode, platform, profile));
+    }
+  }
+  for (const fmt of input.formats) for (const mode of input.modes) for (const profile of input.profiles) {
+    results.push(YtCommands.desktopCommand(c, url, fmt, mode, profile));
+  }
+}
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def node_results():
+    payload = json.dumps({
+        'rules': commands.rules(),
+        'corpus': CORPUS,
+        'platforms': list(commands.PLATFORMS) + ['other'],
+        'formats': list(commands.FORMATS),
+        'modes': list(commands.MODES),
+        'profiles': list(PROFILES),
+    })
+    output = subprocess.run(
+        ['node', '-e', NODE_SCRIPT, os.path.join(ROOT, 'static', 'commands.js')],
+        input=payload, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    expected = python_results()
+    actual = node_results()
+    for want, got in zip(expected, actual):
+        if want != got:
+            print(f'MISMATCH\n  python: {want!r}\n  js:     {got!r}')
+            sys.exit(1)
+    if len(expected) != len(actual):
+        print(f'MISMATCH: {len(expected)} python results, {len(actual)} js results')
+        sys.exit(1)
+    print(f'{len(expected)} results identical across {len(CORPUS)} urls')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# tools/check_command_profiles.py
+"""Check that every generated command is a valid yt-dlp invocation.
+
+    python tools/check_command_profiles.py
+
+Builds the client command for every platform, format, mode and profile,
+and the desktop command for every format, mode and profile.  Commands for
+a POSIX shell (and the desktop command, which is shown on every OS) are
+run with ``bash -c`` against stand-ins for python, pip and pkg that print
+their arguments; any redirect, pipe or glob shows up as a failed run, a
+stray file or a changed argument.  Commands for cmd must keep ``<>|&^``
+inside double quotes.  The resulting yt-dlp arguments go through yt-dlp's
+own option parser.  Also checks that the format selector compiles, that a
+named external downloader exists, and that the URL is the only positional
+argument, and that request values of the wrong type (lists, objects) fall
+back to the defaults instead of failing.  Exits non-zero on the first failure.
+"""
+import contextlib
+import io
+import itertools
+import optparse
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yt_dlp
+from yt_dlp.downloader.external import list_external_downloaders
+
+import commands
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI'
+
+# Stand-ins put first on PATH: python prints each argument NUL-terminated,
+# the install steps succeed silently.
+ECHO_ARGV = "#!/bin/sh\nprintf '%s\\0' \"$@\"\n"
+SUCCEED = '#!/bin/sh\nexit 0\n'
+STUBS = {'python': ECHO_ARGV, 'python3': ECHO_ARGV, 'pip': SUCCEED, 'pkg': SUCCEED}
+
+CMD_METACHARACTERS = re.compile(r'[<>|&^]')
+
+
+def install_stubs(directory):
+    for name, script in STUBS.items():
+        path = os.path.join(directory, name)
+        with open(path, 'w') as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+
+
+def bash_argv(command, stubs, workdir):
+    """The arguments bash passes to python when it runs ``command``."""
+    env = dict(os.environ, PATH=stubs + os.pathsep + os.environ.get('PATH', ''))
+    result = subprocess.run(['bash', '-c', command], cwd=workdir, env=env, capture_output=True)
+    if result.returncode != 0:
+        raise ValueError(f'bash exited {result.returncode}: {result.stderr.decode().strip()}')
+    if os.listdir(workdir):
+        raise ValueError(f'bash created {os.listdir(workdir)} (an unquoted redirect)')
+    words = result.stdout.decode().split('\0')[:-1]
+    if words[:2] != ['-m', 'yt_dlp']:
+        raise ValueError(f'does not run yt_dlp: {words[:2]}')
+    return words[2:]
+
+
+def cmd_argv(command):
+    """The arguments given to yt-dlp by cmd, which has no quoting but double quotes."""
+    unquoted = re.sub(r'"[^"]*"', '', command)
+    if CMD_METACHARACTERS.search(unquoted):
+        raise ValueError(f'unquoted {CMD_METACHARACTERS.findall(unquoted)} would be interpreted by cmd')
+    # Without backslashes, shlex splits double-quoted words as cmd does.
+    words = shlex.split(command)
+    if words[1:3] != ['-m', 'yt_dlp']:
+        raise ValueError(f'does not run yt_dlp: {words[:3]}')
+    return words[3:]
+
+
+def validate(command, name, shells, stubs):
+    try:
+        argvs = []
+        if 'posix' in shells:
+            with tempfile.TemporaryDirectory() as workdir:
+                argvs.append(bash_argv(command, stubs, workdir))
+        if 'windows' in shells:
+            argvs.append(cmd_argv(command))
+        if any(argv != argvs[0] for argv in argvs):
+            raise ValueError(f'shells disagree: {argvs}')
+        argv = argvs[0]
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            parsed = yt_dlp.parse_options(argv)
+    except optparse.OptParseError as exc:
+        fail(name, command, str(exc).strip().splitlines()[-1])
+    except SystemExit:
+        fail(name, command, stderr.getvalue().strip() or 'yt-dlp exited')
+    except ValueError as exc:
+        fail(name, command, exc)
+
+    options = parsed.ydl_opts
+    if parsed.urls != [URL]:
+        fail(name, command, f'positional arguments {parsed.urls}')
+    try:
+        yt_dlp.YoutubeDL({'quiet': True}).build_format_selector(options['format'])
+    except Exception as exc:
+        fail(name, command, f'format {options["format"]!r}: {exc}')
+    for downloader in (options.get('external_downloader') or {}).values():
+        if downloader not in list_external_downloaders():
+            fail(name, command, f'unknown downloader {downloader!r}')
+    return options
+
+
+def fail(name, command, reason):
+    print(f'FAIL {name}: {reason}\n  {command}')
+    sys.exit(1)
+
+
+def main():
+    checked = 0
+    with tempfile.TemporaryDirectory() as stubs:
+        install_stubs(stubs)
+        for platform, fmt, mode, profile in itertools.product(
+                commands.PLATFORMS, commands.FORMATS, commands.MODES, commands.PROFILES):
+            name = f'client {platform}/{fmt}/{mode}/{profile}'
+            options = validate(commands.client_command(URL, fmt, mode, platform, profile), name,
+                               (commands.SHELLS[platform],), stubs)
+            if (profile == 'huge-playlist') != bool(options.get('download_archive')):
+                fail(name, '', 'only the huge-playlist profile keeps a download archive')
+            checked += 1
+        for fmt, mode, profile in itertools.product(commands.FORMATS, commands.MODES, commands.PROFILES):
+            validate(commands.desktop_command(URL, fmt, mode, profile), f'desktop {fmt}/{mode}/{profile}',
+                     ('posix', 'windows'), stubs)
+            checked += 1
+        print(f'{checked} commands run in their shells as valid yt-dlp invocations')
+
+    default = commands.client_command(URL, 'video', 'single', 'linux')
+    for platform, profile in ((['linux'], 'standard'), ({}, 'standard'), ('linux', ['fast']), ('linux', {})):
+        if commands.client_command(URL, 'video', 'single', platform, profile) != default:
+            fail(f'client platform={platform!r} profile={profile!r}', '', 'does not fall back to the default')
+    if commands.desktop_command(URL, 'video', 'single', ['fast']) != commands.desktop_command(URL, 'video', 'single'):
+        fail('desktop profile=[\'fast\']', '', 'does not fall back to the default')
+    print('request values of the wrong type fall back to the defaults')
+
+
+if __name__ == '__main__':
+    main()
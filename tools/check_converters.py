@@ -0,0 +1,147 @@
+# tools/check_converters.py
+"""Check converter health probing against local stand-in servers.
+
+    python tools/check_converters.py
+
+Starts a fast, a slow, a failing (503) and a hanging HTTP server plus a
+closed port, probes them with converters.HealthProber and checks the
+ranking, expiry of old samples, and that /online-tools answers at once
+while probes are still waiting on the hanging server.  Exits non-zero on
+the first failure.
+"""
+import asyncio
+import http.server
+import os
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import converters
+from check_download_jobs import QuietServer, check
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+class StandIn(http.server.BaseHTTPRequestHandler):
+    delay = 0.0
+    status = 200
+
+    def do_HEAD(self):
+        time.sleep(self.delay)
+        self.send_response(self.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def stand_in(name, **attributes):
+    server = QuietServer(('127.0.0.1', 0), type(name, (StandIn,), attributes))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+def hanging():
+    """A server that accepts connections and never answers."""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    return listener, f'http://127.0.0.1:{listener.getsockname()[1]}/'
+
+
+def closed_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return f'http://127.0.0.1:{probe.getsockname()[1]}/'
+
+
+def registry(urls):
+    return tuple(converters.Converter(name, f'https://{name}.example/{{video_id}}', name, url)
+                 for name, url in urls.items())
+
+
+def order(prober, now=None):
+    return [(converter.name, status) for converter, status, _ in prober.ranked(now)]
+
+
+def main():
+    servers = []
+    urls = {}
+    for name, attributes in (('slow', {'delay': 0.15}), ('failing', {'status': 503}),
+                             ('fast', {}), ('forbidden', {'status': 403})):
+        server, urls[name] = stand_in(name, **attributes)
+        servers.append(server)
+    listener, urls['hanging'] = hanging()
+    urls['closed'] = closed_port()
+
+    prober = converters.HealthProber(registry(urls), interval=60, timeout=0.5, window=4, cache_ttl=0)
+    check(all(status == converters.UNKNOWN for _, status in order(prober)), 'nothing is ranked before probing')
+    started = time.perf_counter()
+    asyncio.run(prober.probe_all())
+    elapsed = time.perf_counter() - started
+    check(elapsed < 0.9, f'converters are probed concurrently ({elapsed:.2f}s for a 0.5s timeout)')
+    ranking = order(prober)
+    check([name for name, _ in ranking[:3]] in (['fast', 'forbidden', 'slow'], ['forbidden', 'fast', 'slow']),
+          f'healthy converters come first, fastest first: {ranking}')
+    check({name for name, status in ranking[3:] if status == converters.DOWN} == {'failing', 'hanging', 'closed'},
+          '5xx, hanging and refused converters are down')
+    status, latency = prober.health('slow')
+    check(status == converters.UP and latency >= 0.15, f'latency is measured ({latency * 1000:.0f} ms)')
+
+    servers[0].RequestHandlerClass.delay = 0.0
+    for _ in range(3):
+        asyncio.run(prober.probe_all())
+    check(prober.health('slow')[1] < 0.15, 'latency follows recent probes')
+    servers[1].RequestHandlerClass.status = 200
+    asyncio.run(prober.probe_all())
+    check(prober.health('failing')[0] == converters.DOWN, 'one good probe does not outweigh recent failures')
+    asyncio.run(prober.probe_all())
+    check(prober.health('failing')[0] == converters.UP, 'a recovered converter is up once half its window is good')
+    check(order(prober, time.time() + prober.max_age + 1)[0][1] == converters.UNKNOWN, 'old samples expire')
+
+    cached = converters.HealthProber(registry(urls), timeout=0.5, cache_ttl=60)
+    first = cached.ranked()
+    check(cached.ranked() is first, 'the ranking is reused within cache_ttl')
+    asyncio.run(cached.probe_all())
+    check(cached.ranked() is not first, 'a probe round invalidates it')
+
+    import app as app_module
+    flask_app = app_module.create_app({'CONVERTER_PROBE_INTERVAL': 60})
+    flask_app.extensions['converters'] = converters.HealthProber(
+        registry({'hanging': urls['hanging'], 'fast': urls['fast']}), interval=60, timeout=2.0)
+    client = flask_app.test_client()
+    started = time.perf_counter()
+    tools = client.post('/online-tools', json={'url': VIDEO_URL}).json['tools']
+    elapsed = time.perf_counter() - started
+    check(elapsed < 0.1 and [tool['status'] for tool in tools] == ['unknown', 'unknown'],
+          f'the first request starts probing without waiting for it ({elapsed * 1000:.1f} ms)')
+    prober = flask_app.extensions['converters']
+    slowest = 0.0
+    for _ in range(5):
+        started = time.perf_counter()
+        client.post('/online-tools', json={'url': VIDEO_URL})
+        slowest = max(slowest, time.perf_counter() - started)
+        time.sleep(0.2)
+    check(prober.rounds == 0 and slowest < 0.1,
+          f'requests do not wait on a probe in progress (slowest {slowest * 1000:.1f} ms)')
+    deadline = time.time() + 5
+    while prober.rounds == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    tools = client.post('/online-tools', json={'url': VIDEO_URL}).json['tools']
+    check([(tool['name'], tool['status']) for tool in tools] == [('fast', 'up'), ('hanging', 'down')]
+          and tools[0]['url'] == 'https://fast.example/dQw4w9WgXcQ' and tools[0]['latency_ms'] is not None,
+          '/online-tools lists the background results fastest-healthy-first')
+
+    for server in servers:
+        server.shutdown()
+    listener.close()
+
+
+if __name__ == '__main__':
+    main()
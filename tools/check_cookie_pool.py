@@ -0,0 +1,247 @@
+# tools/check_cookie_pool.py
+"""Check the cookie pool against synthetic jars.
+
+    python tools/check_cookie_pool.py
+
+Writes throwaway Netscape jars to a temporary directory and checks that
+each jar is parsed once and parsed again only when its file changes, that
+rotation is fair (also from many threads), that throttling quarantines a
+jar for the cooldown, and that jars rewritten while 16 threads keep
+acquiring never show up half-read.  Finally a download job fetches from a
+local server that records the Cookie header, and a 429 from that server
+quarantines the jar that was used.  Exits non-zero on the first failure.
+"""
+import collections
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cookiepool
+import jobs
+from check_download_jobs import MediaHandler, QuietServer, check, wait
+
+
+def write_jar(directory, name, version=0, domain='.youtube.com', cookies=20, secure=True):
+    """A jar whose cookies all carry ``version`` in their value, written atomically."""
+    lines = ['# Netscape HTTP Cookie File', '']
+    for index in range(cookies):
+        prefix = '#HttpOnly_' if index % 2 else ''
+        lines.append(f'{prefix}{domain}\tTRUE\t/\t{"TRUE" if secure else "FALSE"}\t2000000000\tc{index}\t{name}-{version}')
+    path = os.path.join(directory, name)
+    with open(path + '.tmp', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    # Some filesystems keep coarse mtimes; make every rewrite visible.
+    os.utime(path + '.tmp', ns=(time.time_ns(), time.time_ns() + version))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def check_parse():
+    cookies = cookiepool.parse(
+        '# Netscape HTTP Cookie File\n'
+        '.youtube.com\tTRUE\t/\tTRUE\t0\tSESSION\ta\n'
+        '#HttpOnly_.youtube.com\tTRUE\t/\tFALSE\t2000000000\tHTTPONLY\tb\n'
+        'www.youtube.com\tFALSE\t/tv\tTRUE\t2000000000\t\tbare\n'
+        'not\ta\tcookie\n'
+        '.youtube.com\tTRUE\t/\tTRUE\tsoon\tBROKEN\tx\n'
+    )
+    by_name = {cookie.name: cookie for cookie in cookies}
+    check(sorted(by_name) == ['HTTPONLY', 'SESSION', 'bare'], 'well-formed lines are parsed, others skipped')
+    check(by_name['SESSION'].expires is None and by_name['SESSION'].discard, 'expiry 0 is a session cookie')
+    check(by_name['HTTPONLY'].has_nonstandard_attr('HttpOnly') and not by_name['HTTPONLY'].secure,
+          '#HttpOnly_ lines keep the flag')
+    check(by_name['bare'].value is None and not by_name['bare'].domain_specified and by_name['bare'].path == '/tv',
+          'nameless cookies and host-only domains follow cookies.txt')
+
+
+def check_caching(tmp):
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        write_jar(tmp, name)
+    with open(os.path.join(tmp, 'empty.txt'), 'w') as f:
+        f.write('# Netscape HTTP Cookie File\n')
+    with open(os.path.join(tmp, 'notes.md'), 'w') as f:
+        f.write('not a jar')
+    pool = cookiepool.CookiePool(tmp, rescan_interval=0)
+    for _ in range(1000):
+        pool.acquire()
+    check(pool.parses == 4, f'1000 acquisitions parse each jar once ({pool.parses} parses)')
+    check(sorted(jar.name for jar in pool._jars) == ['a.txt', 'b.txt', 'c.txt'],
+          'empty jars and other files are left out')
+    write_jar(tmp, 'b.txt', version=1)
+    for _ in range(10):
+        pool.acquire()
+    check(pool.parses == 5 and {cookie.value for cookie in pool._jars[1].cookies} == {'b.txt-1'},
+          'a changed jar is parsed again, once')
+    os.remove(os.path.join(tmp, 'c.txt'))
+    write_jar(tmp, 'd.txt')
+    pool.acquire()
+    check([jar.name for jar in pool._jars] == ['a.txt', 'b.txt', 'd.txt'], 'removed and added jars are picked up')
+
+    lazy = cookiepool.CookiePool(tmp, rescan_interval=60)
+    lazy.acquire(now=0.0)
+    write_jar(tmp, 'a.txt', version=2)
+    lazy.acquire(now=30.0)
+    check(lazy.parses == 4, 'the directory is not re-checked within rescan_interval')
+    lazy.acquire(now=61.0)
+    check(lazy.parses == 5, 'and is after it')
+
+
+def check_rotation(tmp):
+    pool = cookiepool.CookiePool(tmp, cooldown=60, rescan_interval=0)
+    picks = [pool.acquire().name for _ in range(9)]
+    check(picks == ['a.txt', 'b.txt', 'd.txt'] * 3, f'round-robin visits jars in turn ({picks[:3]})')
+
+    uses = collections.Counter()
+    lock = threading.Lock()
+
+    def worker():
+        local = collections.Counter(pool.acquire().name for _ in range(1000))
+        with lock:
+            uses.update(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check(sorted(uses.values()) == [4000, 4000, 4000], f'12 threads share jars evenly ({dict(uses)})')
+
+    now = time.monotonic()
+    try:
+        with pool.use() as jar:
+            raise RuntimeError('ERROR: [youtube] x: Sign in to confirm you’re not a bot')
+    except RuntimeError:
+        pass
+    check(jar.quarantined_until > now and jar.throttles == 1, 'a bot check quarantines the jar')
+    check(jar not in [pool.acquire() for _ in range(10)], 'a quarantined jar is skipped')
+    check(pool.counts() == {'ready': 2, 'quarantined': 1}, 'counts report the quarantine')
+    try:
+        with pool.use() as other:
+            raise RuntimeError('ERROR: [youtube] x: Video unavailable')
+    except RuntimeError:
+        pass
+    check(other.throttles == 0, 'other errors do not quarantine')
+    check(pool.acquire(now=now + 61) is jar or pool.acquire(now=now + 61) is jar, 'the cooldown ends')
+
+    pool.quarantine(jar)
+    write_jar(tmp, jar.name, version=5)
+    check(jar in [pool.acquire() for _ in range(3)], 'fresh cookies in the file lift the quarantine')
+
+    least = cookiepool.CookiePool(tmp, cooldown=0, strategy=cookiepool.LEAST_THROTTLED, rescan_interval=0)
+    first, second, third = (least.acquire() for _ in range(3))
+    least.quarantine(first, now=10.0)
+    least.quarantine(second, now=5.0)
+    picks = [least.acquire().name for _ in range(3)]
+    check(picks == [third.name, third.name, third.name], 'least-throttled prefers jars never throttled')
+    least.quarantine(third, now=20.0)
+    check(least.acquire() is second, 'then the one throttled longest ago')
+
+    everything = cookiepool.CookiePool(tmp, cooldown=60, rescan_interval=0)
+    everything.refresh()
+    for jar in everything._jars:
+        everything.quarantine(jar)
+    check(everything.acquire() is None, 'with every jar quarantined, extraction goes without cookies')
+
+
+def check_concurrent_reload(tmp):
+    names = ['r0.txt', 'r1.txt', 'r2.txt', 'r3.txt']
+    for name in names:
+        write_jar(tmp, name, cookies=200)
+    pool = cookiepool.CookiePool(tmp, rescan_interval=0)
+    stop = threading.Event()
+    problems = []
+    acquired = [0]
+
+    def reader():
+        while not stop.is_set():
+            jar = pool.acquire()
+            values = {cookie.value for cookie in jar.cookies}
+            if len(jar.cookies) != 200 or len(values) != 1 or not values.pop().startswith(jar.name):
+                problems.append(jar.name)
+            acquired[0] += 1
+            time.sleep(0.0001)
+
+    threads = [threading.Thread(target=reader) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    writes = 0
+    for version in range(1, 41):
+        for name in names:
+            write_jar(tmp, name, version=version, cookies=200)
+            writes += 1
+        time.sleep(0.005)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    check(not problems, f'{acquired[0]} acquisitions during {writes} rewrites never saw a half-read jar')
+    check(pool.parses <= writes + len(names), f'rewrites are parsed at most once each ({pool.parses} parses)')
+    pool.refresh()
+    check({cookie.value for jar in pool._jars for cookie in jar.cookies} == {f'{name}-40' for name in names},
+          'the pool ends up with the latest version of every jar')
+
+
+class CookieHandler(MediaHandler):
+    seen = []
+
+    def do_GET(self):
+        self.seen.append(self.headers.get('Cookie'))
+        if self.path.startswith('/throttled/'):
+            self.send_error(429)
+            return
+        super().do_GET()
+
+
+def check_download(tmp):
+    jar_dir = os.path.join(tmp, 'jars')
+    os.makedirs(jar_dir)
+    # The stand-in server is plain HTTP, so these cookies are not Secure.
+    write_jar(jar_dir, 'one.txt', domain='127.0.0.1', cookies=1, secure=False)
+    write_jar(jar_dir, 'two.txt', domain='127.0.0.1', cookies=1, secure=False)
+    media = os.path.join(tmp, 'media')
+    os.makedirs(media)
+    with open(os.path.join(media, 'clip.mp4'), 'wb') as f:
+        f.write(os.urandom(64 * 1024))
+    server = QuietServer(('127.0.0.1', 0), functools.partial(CookieHandler, directory=media))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    pool = cookiepool.CookiePool(jar_dir, cooldown=60, rescan_interval=0)
+    queue = jobs.JobQueue(os.path.join(tmp, 'downloads'), workers=1, max_queued=4, per_client=4, cookies=pool)
+    first = queue.submit(f'{base}/clip.mp4', client='a')
+    second = queue.submit(f'{base}/clip.mp4', client='a')
+    check(wait(first) and wait(second) and first.state == second.state == jobs.FINISHED,
+          f'downloads with pooled cookies finish ({first.error or second.error or "ok"})')
+    sent = {header for header in CookieHandler.seen if header}
+    check(sent == {'c0=one.txt-0', 'c0=two.txt-0'}, f'consecutive jobs send different jars ({sorted(sent)})')
+
+    mtimes = {name: os.stat(os.path.join(jar_dir, name)).st_mtime_ns for name in ('one.txt', 'two.txt')}
+    throttled = queue.submit(f'{base}/throttled/clip.mp4', client='b')
+    check(wait(throttled) and throttled.state == jobs.FAILED and '429' in throttled.error,
+          'a 429 fails the job')
+    check(pool.counts() == {'ready': 1, 'quarantined': 1}, 'and quarantines the jar it used')
+    check(all(os.stat(os.path.join(jar_dir, name)).st_mtime_ns == mtime for name, mtime in mtimes.items()),
+          'yt-dlp never writes the jar files')
+    server.shutdown()
+
+
+def main():
+    check_parse()
+    with tempfile.TemporaryDirectory() as tmp:
+        check_caching(tmp)
+        check_rotation(tmp)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_concurrent_reload(tmp)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_download(tmp)
+
+
+if __name__ == '__main__':
+    main()
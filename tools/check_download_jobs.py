@@ -0,0 +1,170 @@
+# tools/check_download_jobs.py
+"""Exercise the download job queue offline, against a local HTTP file server.
+
+    python tools/check_download_jobs.py
+
+Serves a generated media file from 127.0.0.1 (optionally throttled), then
+checks that a job downloads it intact with progress over SSE, that a
+repeat request is served from the media cache, that a running job can be
+cancelled, and that the per-client limit and the bounded queue reject
+excess work.  Jobs are per worker, so gunicorn.conf.py must start one
+worker when they are enabled and warn when more are forced.  Exits
+non-zero on the first failure.
+"""
+import functools
+import hashlib
+import http.server
+import json
+import os
+import runpy
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jobs
+import mediacache
+
+MEDIA_BYTES = 4 * 1024 * 1024
+
+
+class MediaHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files with a video content type; ``/slow/...`` trickles the body."""
+
+    extensions_map = {'.mp4': 'video/mp4'}
+
+    def log_message(self, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        if not self.path.startswith('/slow/'):
+            return super().copyfile(source, outputfile)
+        while chunk := source.read(16 * 1024):
+            outputfile.write(chunk)
+            time.sleep(0.05)
+
+    def translate_path(self, path):
+        return super().translate_path(path.replace('/slow/', '/', 1))
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # yt-dlp probes and cancelled downloads hang up mid-body; that is expected.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(directory):
+    handler = functools.partial(MediaHandler, directory=directory)
+    server = QuietServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def wait(job, timeout=60):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.05)
+    return job.done
+
+
+def check(condition, message):
+    if not condition:
+        sys.exit(f'FAIL: {message}')
+    print(f'ok: {message}')
+
+
+class FakeLog:
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, *args):
+        pass
+
+    def warning(self, message, *args):
+        self.warnings.append(message % args)
+
+
+def gunicorn_config(**env):
+    """gunicorn.conf.py's settings under ``env``, and the warnings ``when_ready`` logs."""
+    saved = {name: os.environ.pop(name, None) for name in ('WEB_CONCURRENCY', 'DOWNLOAD_JOBS_ENABLED')}
+    os.environ.update(env)
+    try:
+        config = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+        server = type('Server', (), {'log': FakeLog()})()
+        config['when_ready'](server)
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+    return config, server.log.warnings
+
+
+def check_worker_count():
+    config, warnings = gunicorn_config(DOWNLOAD_JOBS_ENABLED='1')
+    check(config['workers'] == 1 and not warnings, 'with jobs enabled gunicorn starts one worker')
+    config, warnings = gunicorn_config(DOWNLOAD_JOBS_ENABLED='1', WEB_CONCURRENCY='3')
+    check(config['workers'] == 3 and 'sticky sessions' in ''.join(warnings), 'and warns when WEB_CONCURRENCY forces more')
+    config, warnings = gunicorn_config(WEB_CONCURRENCY='3')
+    check(config['workers'] == 3 and not warnings, 'without jobs WEB_CONCURRENCY is taken as is')
+
+
+def main():
+    check_worker_count()
+    with tempfile.TemporaryDirectory() as media, tempfile.TemporaryDirectory() as downloads:
+        payload = os.urandom(MEDIA_BYTES)
+        with open(os.path.join(media, 'clip.mp4'), 'wb') as f:
+            f.write(payload)
+        server, base = serve(media)
+
+        cache = mediacache.MediaCache(os.path.join(downloads, 'cache'), 64 * 1024 * 1024)
+        queue = jobs.JobQueue(downloads, workers=1, max_queued=1, per_client=2, cache=cache)
+
+        job = queue.submit(f'{base}/clip.mp4', client='a')
+        events = [chunk for chunk in jobs.sse_events(job, heartbeat=1.0) if chunk.startswith('id:')]
+        check(job.state == jobs.FINISHED, f'job finished ({job.error or job.state})')
+        with open(job.filename, 'rb') as f:
+            check(hashlib.sha256(f.read()).digest() == hashlib.sha256(payload).digest(), 'downloaded file is intact')
+        kinds = [chunk.split('\n')[1] for chunk in events]
+        check('event: progress' in kinds and kinds[-1] == 'event: state', 'SSE carried progress and a final state')
+        last = json.loads(events[-1].split('data: ', 1)[1])
+        check(last == {'state': 'finished', 'filename': job.download_name, 'cached': False}, 'final event names the file')
+        resumed = [chunk for chunk in jobs.sse_events(job, last_id=len(events) - 1) if chunk.startswith('id:')]
+        check(resumed == events[-1:], 'Last-Event-ID resumes after the given event')
+
+        repeat = queue.submit(f'{base}/clip.mp4', client='a')
+        check(wait(repeat) and repeat.cached and repeat.filename == job.filename, 'repeat job is served from the cache')
+        check(mediacache.MediaCache(cache.directory, cache.max_bytes).get(queue.cache_key(job)) is not None,
+              'a fresh index finds the cached file')
+
+        slow = queue.submit(f'{base}/slow/clip.mp4', client='b')
+        while slow.state != jobs.RUNNING or not slow.progress:
+            time.sleep(0.05)
+        queued = queue.submit(f'{base}/clip.mp4', client='b')
+        try:
+            queue.submit(f'{base}/clip.mp4', client='b')
+        except jobs.ClientLimit:
+            check(True, 'third unfinished job for one client is refused')
+        else:
+            check(False, 'third unfinished job for one client is refused')
+        try:
+            queue.submit(f'{base}/clip.mp4', client='c')
+        except jobs.QueueFull:
+            check(True, 'a full queue refuses new jobs')
+        else:
+            check(False, 'a full queue refuses new jobs')
+
+        queue.cancel(queued.id)
+        check(queued.state == jobs.CANCELLED, 'queued job cancels immediately')
+        queue.cancel(slow.id)
+        check(wait(slow) and slow.state == jobs.CANCELLED, 'running job stops on cancel')
+        check(not os.path.exists(slow.directory), 'cancelled job leaves no partial file')
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+# tools/check_metadata.py
+"""Exercise the metadata cache offline with a fake extractor.
+
+    python tools/check_metadata.py
+
+Checks fresh hits, stale-while-revalidate, negative caching, coalescing of
+concurrent misses, the size bound, the /metadata endpoint and streamed
+playlist enumeration, using an in-process extractor instead of yt-dlp.
+``YtDlpExtractor`` is run against a stand-in ``YoutubeDL`` to check which
+yt-dlp errors become ``ExtractionError``.  Exits non-zero on the first
+failure.
+"""
+import contextlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metadata
+import yt_dlp
+from yt_dlp.utils import DownloadError, ExtractorError, OnDemandPagedList
+from check_download_jobs import check
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+PLAYLIST_URL = 'https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI'
+
+
+class FakeExtractor:
+    """Returns a canned summary per URL; ``gone`` URLs fail permanently."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.gone = set()
+        self.version = 1
+        self.open_playlists = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open_playlist(self, url, length=1000):
+        def entries():
+            for index in range(length):
+                if not self.open_playlists:
+                    raise RuntimeError('playlist read after it was closed')
+                yield {'id': f'{index:011d}', 'title': f'entry {index}', 'duration': index}
+        self.open_playlists += 1
+        try:
+            yield {'id': url.rsplit('=', 1)[-1], 'title': 'fake playlist'}, entries()
+        finally:
+            self.open_playlists -= 1
+
+    def extract(self, url):
+        with self._lock:
+            self.calls.append(url)
+        time.sleep(self.delay)
+        if url in self.gone:
+            raise metadata.ExtractionError('Video unavailable')
+        return metadata.summarise({
+            'id': url[-11:], 'title': f'v{self.version}', 'duration': 212,
+            'formats': [
+                {'format_id': '18', 'ext': 'mp4', 'height': 360, 'vcodec': 'avc1', 'acodec': 'mp4a', 'filesize': 1000},
+                {'format_id': '137', 'ext': 'mp4', 'height': 1080, 'vcodec': 'avc1', 'acodec': 'none'},
+                {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a'},
+                {'format_id': 'sb0', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none'},
+            ],
+        })
+
+
+class FakeYoutubeDL:
+    """Stands in for ``yt_dlp.YoutubeDL``; ``extract_info`` raises ``error`` if set.
+
+    Processed playlists are resolved the way yt-dlp does, up to
+    ``playlistend``, and ``fetched`` counts the entries that took.
+    """
+
+    error = None
+    fetched = 0
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+        return False
+
+    def extract_info(self, url, download=True, process=True):
+        if self.error is not None:
+            raise self.error
+        self.closed = False
+
+        def entries(length):
+            # Later pages are fetched through this instance, so it must still be open.
+            for index in range(length):
+                FakeYoutubeDL.fetched += 1
+                yield {'id': str(index), 'open': not self.closed}
+        if not process:
+            return {'_type': 'playlist', 'id': 'PL', 'title': 'playlist', 'entries': entries(3)}
+        FakeYoutubeDL.fetched = 0
+        resolved = list(itertools.islice(entries(100000), self.options.get('playlistend')))
+        return {'_type': 'playlist', 'id': 'PL', 'title': 'playlist', 'entries': resolved}
+
+
+def extraction_outcome(call):
+    try:
+        call()
+    except metadata.ExtractionError:
+        return 'extraction'
+    except DownloadError:
+        return 'download'
+    return 'ok'
+
+
+def read_playlist(extractor):
+    with extractor.open_playlist(PLAYLIST_URL) as (_, entries):
+        return list(entries)
+
+
+def check_yt_dlp_errors():
+    extractor = metadata.YtDlpExtractor()
+    original, yt_dlp.YoutubeDL = yt_dlp.YoutubeDL, FakeYoutubeDL
+    try:
+        for expected, outcome in ((True, 'extraction'), (False, 'download')):
+            cause = ExtractorError('Video unavailable', expected=expected)
+            FakeYoutubeDL.error = DownloadError('ERROR: Video unavailable', (type(cause), cause, None))
+            check(extraction_outcome(lambda: extractor.extract(VIDEO_URL)) == outcome
+                  and extraction_outcome(lambda: read_playlist(extractor)) == outcome,
+                  f'expected={expected} extractor errors raise {outcome} errors from extract and open_playlist')
+        FakeYoutubeDL.error = None
+        summary = extractor.extract(PLAYLIST_URL)
+        check(len(summary['entries']) == FakeYoutubeDL.fetched == metadata.MAX_PLAYLIST_ENTRIES,
+              f'extract stops fetching a playlist at MAX_PLAYLIST_ENTRIES ({FakeYoutubeDL.fetched} fetched)')
+        with extractor.open_playlist(PLAYLIST_URL) as (summary, entries):
+            read = [entry['open'] for _, entry in metadata.iter_entries(entries)]
+        check(summary['id'] == 'PL' and read == [True] * 3, 'playlist entries are read while the YoutubeDL is open')
+    finally:
+        FakeYoutubeDL.error = None
+        yt_dlp.YoutubeDL = original
+
+
+def stream_peak_bytes(client, length):
+    """Peak traced memory while streaming a ``length``-entry playlist, and the line count."""
+    extractor = client.application.extensions['metadata'].extractor
+    original = extractor.open_playlist
+    extractor.open_playlist = lambda url: original(url, length)
+    tracemalloc.start()
+    lines = 0
+    with client.get('/playlist-stream', query_string={'url': PLAYLIST_URL}) as response:
+        for _ in response.response:
+            lines += 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    extractor.open_playlist = original
+    return peak, lines
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def main():
+    check_yt_dlp_errors()
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = FakeExtractor()
+        store = metadata.SQLiteStore(os.path.join(tmp, 'meta.db'), max_entries=50)
+        service = metadata.MetadataService(store, fake, ttl=0.3, negative_ttl=0.3, stale_ttl=60)
+
+        info, status = service.lookup('video:dQw4w9WgXcQ', VIDEO_URL)
+        check(status == 'miss' and len(fake.calls) == 1, 'first lookup extracts')
+        check([f['selector'] for f in info['formats']] == ['18', '137+bestaudio', '140'], 'formats carry usable selectors')
+        check(info['heights'] == [1080, 360], 'available heights are listed')
+        info, status = service.lookup('video:dQw4w9WgXcQ', VIDEO_URL)
+        check(status == 'hit' and len(fake.calls) == 1, 'second lookup is a cache hit')
+
+        time.sleep(0.35)
+        fake.version = 2
+        info, status = service.lookup('video:dQw4w9WgXcQ', VIDEO_URL)
+        check(status == 'stale' and info['title'] == 'v1', 'expired entry is served stale')
+        check(wait_until(lambda: store.get('video:dQw4w9WgXcQ')[0]['title'] == 'v2'), 'and refreshed in the background')
+        check(service.lookup('video:dQw4w9WgXcQ', VIDEO_URL)[1] == 'hit', 'refreshed entry is fresh again')
+
+        gone = 'https://www.youtube.com/watch?v=aaaaaaaaaaa'
+        fake.gone.add(gone)
+        for _ in range(3):
+            try:
+                service.lookup('video:aaaaaaaaaaa', gone)
+            except metadata.MetadataUnavailable:
+                pass
+        check(fake.calls.count(gone) == 1, 'permanent failures are cached')
+        time.sleep(0.35)
+        try:
+            service.lookup('video:aaaaaaaaaaa', gone)
+        except metadata.MetadataUnavailable:
+            pass
+        check(fake.calls.count(gone) == 2, 'negative entries expire after negative_ttl')
+
+        slow = FakeExtractor(delay=0.3)
+        coalesced = metadata.MetadataService(store, slow)
+        threads = [threading.Thread(target=coalesced.lookup, args=('video:bbbbbbbbbbb', VIDEO_URL[:-11] + 'b' * 11))
+                   for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        check(len(slow.calls) == 1, '50 concurrent misses extract once')
+
+        for index in range(120):
+            store.put(f'video:{index:011d}', {'title': index}, True, 0, time.time() + 3600 + index, now=0)
+        store.trim(time.time())
+        check(len(store) == 50, 'store is trimmed to max_entries')
+        check(store.get('video:00000000119') is not None and store.get('video:00000000000') is None,
+              'entries that go stale first are dropped first')
+
+        import app as app_module
+        flask_app = app_module.create_app({
+            'METADATA_ENABLED': True,
+            'METADATA_DB': os.path.join(tmp, 'app.db'),
+            'METADATA_EXTRACTOR': FakeExtractor(),
+        })
+        client = flask_app.test_client()
+        response = client.get('/metadata', query_string={'url': 'https://youtu.be/dQw4w9WgXcQ?si=x'})
+        check(response.status_code == 200 and response.headers['X-Cache'] == 'miss', '/metadata extracts on a miss')
+        response = client.get('/metadata', query_string={'url': VIDEO_URL + '&t=42s'})
+        check(response.headers['X-Cache'] == 'hit', 'another spelling of the same video hits the cache')
+        check(client.get('/metadata', query_string={'url': 'https://example.com'}).status_code == 400,
+              'non-YouTube URLs are rejected')
+
+        # Streamed responses are closed, as a WSGI server would, to return their admission slot.
+        with client.get('/playlist-stream', query_string={'url': PLAYLIST_URL, 'platform': 'linux'}) as response:
+            lines = response.data.splitlines()
+        items = [json.loads(line) for line in lines]
+        check(items[0]['type'] == 'playlist' and items[-1] == {'type': 'done', 'count': 1000, 'next_offset': 1000},
+              'NDJSON stream opens with the playlist and ends with a count')
+        check(items[1]['index'] == 0 and items[1]['command'].endswith("'https://www.youtube.com/watch?v=00000000000'"),
+              'each entry carries its own command')
+        with client.get('/playlist-stream', query_string={'url': PLAYLIST_URL, 'offset': 990}) as response:
+            lines = response.data.splitlines()
+        check([json.loads(line).get('index') for line in lines[1:-1]] == list(range(990, 1000)), 'offset resumes the stream')
+        with client.get('/playlist-stream', query_string={'url': PLAYLIST_URL},
+                        headers={'Accept': 'text/event-stream', 'Last-Event-ID': '997'}) as response:
+            body = response.data.decode()
+        check(body.count('event: entry') == 2 and 'id: 998\n' in body, 'SSE resumes after Last-Event-ID')
+        extractor = flask_app.extensions['metadata'].extractor
+        response = client.get('/playlist-stream', query_string={'url': PLAYLIST_URL})
+        check(extractor.open_playlists == 1, 'the playlist stays open while its response streams')
+        response.close()
+        check(extractor.open_playlists == 0, 'and is closed with the response, even if never read')
+
+        small, _ = stream_peak_bytes(client, 2000)
+        large, count = stream_peak_bytes(client, 50000)
+        check(count == 50002 and large < small * 1.5, f'memory stays flat: {small >> 10} KiB for 2k, {large >> 10} KiB for 50k')
+
+        pages = []
+        paged = OnDemandPagedList(lambda page: pages.append(page) or
+                                  [{'id': f'{page * 100 + i:011d}'} for i in range(100)] if page < 10 else [], 100)
+        indexes = [index for index, _ in metadata.iter_entries(paged, 750)]
+        check(indexes == list(range(750, 1000)) and min(pages) == 7, 'paged playlists skip straight to the offset')
+
+
+if __name__ == '__main__':
+    main()
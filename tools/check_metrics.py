@@ -0,0 +1,48 @@
+# tools/check_metrics.py
+"""Check that clients cannot add series to /metrics.
+
+    python tools/check_metrics.py
+
+Sends made-up HTTP methods to a matched and an unmatched route and checks
+that they all land in ``method="other"``, while the standard methods keep
+their own label.  Exits non-zero on the first failure.
+"""
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', str(10 ** 9))
+
+from check_download_jobs import check
+
+
+def series(body):
+    return {line.rpartition(' ')[0] for line in body.splitlines() if line.startswith('http_requests_total{')}
+
+
+def main():
+    import app as app_module
+    # Responses are buffered so each is closed and gives back its admission slot.
+    client = app_module.create_app({'METRICS_ENABLED': True}).test_client()
+    client.get('/nope', buffered=True)
+    client.post('/generate-command', json={'url': 'https://youtu.be/dQw4w9WgXcQ'}, buffered=True)
+    client.get('/metrics', buffered=True)
+    before = series(client.get('/metrics', buffered=True).get_data(as_text=True))
+
+    for index in range(400):
+        for path in ('/nope', '/generate-command'):
+            client.open(path, method=f'VERB{index}', buffered=True)
+    after = series(client.get('/metrics', buffered=True).get_data(as_text=True))
+    added = after - before
+    check(all('method="other"' in line for line in added) and len(added) <= 4,
+          f'400 made-up methods add {len(added)} series, all method="other"')
+    check(not any(re.search(r'method="VERB', line) for line in after), 'no made-up method reaches a label')
+    check(any('method="POST"' in line for line in after) and any('method="GET"' in line for line in after),
+          'standard methods keep their label')
+
+
+if __name__ == '__main__':
+    main()
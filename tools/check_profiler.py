@@ -0,0 +1,144 @@
+# tools/check_profiler.py
+"""Check request profiling: the sample rate, the token and the downloads.
+
+    python tools/check_profiler.py
+
+Sends requests through apps built with different settings.  It checks
+that one in ``PROFILE_SAMPLE_EVERY`` requests is profiled and that
+``X-Profile`` forces a sample.  ``/debug/profile`` must be a 404 unless a
+token is configured and sent; the token may come from ``create_app``
+config as well as the environment.  Every format is then downloaded and
+loaded back: JSON, pstats, collapsed stacks, and ``scope=all`` merged
+from ``PROFILE_DIR``.  Exits non-zero on the first failure.
+"""
+import io
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', str(10 ** 9))
+
+from check_download_jobs import check
+
+TOKEN = 'check-token'
+AUTH = {'Authorization': f'Bearer {TOKEN}'}
+BODY = {'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'platform': 'linux'}
+
+
+def make_app(**config):
+    import app as app_module
+    flask_app = app_module.create_app(dict({'METRICS_ENABLED': False}, **config))
+
+    def slow():
+        # Long enough for the stack sampler to see it several times.
+        time.sleep(0.05)
+        return 'ok'
+
+    flask_app.add_url_rule('/slow', 'slow', slow)
+    return flask_app, flask_app.test_client()
+
+
+def post(client, count, headers=None):
+    for _ in range(count):
+        client.post('/generate-client-command', json=BODY, headers=headers, buffered=True)
+
+
+def samples(flask_app, route='/generate-client-command'):
+    entry = flask_app.extensions['profiler'].snapshot().get(route)
+    return entry.samples if entry is not None else 0
+
+
+def check_sampling():
+    flask_app, client = make_app(PROFILE_SAMPLE_EVERY=5, PROFILE_TOKEN=None)
+    post(client, 50)
+    check(samples(flask_app) == 10, f'PROFILE_SAMPLE_EVERY=5 profiles 10 of 50 requests ({samples(flask_app)})')
+
+    flask_app, client = make_app(PROFILE_SAMPLE_EVERY=0, PROFILE_TOKEN=TOKEN)
+    post(client, 5)
+    check(samples(flask_app) == 0, 'with only a token, plain requests are not profiled')
+    post(client, 3, {'X-Profile': TOKEN})
+    check(samples(flask_app) == 3, 'X-Profile with the token profiles the request')
+    post(client, 3, {'X-Profile': 'wrong'})
+    post(client, 1, {'X-Profile': 'check-tokén'})
+    check(samples(flask_app) == 3, 'X-Profile with another value does not, even outside ASCII')
+
+
+def check_token():
+    flask_app, client = make_app(PROFILE_SAMPLE_EVERY=1, PROFILE_TOKEN=None)
+    post(client, 2)
+    check(client.get('/debug/profile').status_code == 404, 'sampling without a token keeps /debug/profile hidden')
+    check(client.get('/debug/profile', headers={'Authorization': 'Bearer '}).status_code == 404,
+          'an empty bearer token does not open it')
+
+    flask_app, client = make_app(PROFILE_SAMPLE_EVERY=1, PROFILE_TOKEN=TOKEN)
+    post(client, 2)
+    check(client.get('/debug/profile').status_code == 404, 'a token set through create_app config is required')
+    check(client.get('/debug/profile', headers={'Authorization': 'Bearer nope'}).status_code == 404,
+          'a wrong token gets a 404')
+    response = client.get('/debug/profile', headers=AUTH)
+    check(response.status_code == 200 and '/generate-client-command' in response.get_json()['routes'],
+          'the right token gets the profiles')
+
+    _, client = make_app(PROFILE_SAMPLE_EVERY=0, PROFILE_TOKEN=None)
+    check(client.get('/debug/profile', headers=AUTH).status_code == 404, 'with profiling off there is no endpoint')
+
+
+def check_formats(tmp):
+    flask_app, client = make_app(PROFILE_SAMPLE_EVERY=1, PROFILE_TOKEN=TOKEN, PROFILE_MODE='cprofile')
+    post(client, 3)
+    summary = client.get('/debug/profile', query_string={'focus': 'commands'}, headers=AUTH).get_json()
+    route = summary['routes']['/generate-client-command']
+    check(summary['mode'] == 'cprofile' and route['samples'] == 3 and route['functions']
+          and all('commands' in row['function'] for row in route['functions']),
+          'JSON summarises each route, filtered by focus')
+    response = client.get('/debug/profile', query_string={'route': '/generate-client-command', 'format': 'pstats'},
+                          headers=AUTH)
+    check(response.status_code == 200 and response.headers['Content-Disposition'].endswith('generate_client_command.pstats"'),
+          'pstats downloads as a file')
+    with tempfile.NamedTemporaryFile(suffix='.pstats', dir=tmp, delete=False) as f:
+        f.write(response.get_data())
+    stats = pstats.Stats(f.name, stream=io.StringIO())
+    check(any(name == 'client_command' for _, _, name in stats.stats), 'and loads into pstats.Stats')
+    check(client.get('/debug/profile', query_string={'route': '/generate-client-command', 'format': 'collapsed'},
+                     headers=AUTH).status_code == 404, 'cprofile mode has no collapsed stacks')
+    check(client.get('/debug/profile', query_string={'route': '/nope', 'format': 'pstats'},
+                     headers=AUTH).status_code == 404, 'an unknown route is a 404')
+
+    directory = os.path.join(tmp, 'profiles')
+    _, first_client = make_app(PROFILE_SAMPLE_EVERY=1, PROFILE_TOKEN=TOKEN, PROFILE_MODE='stack',
+                               PROFILE_DIR=directory)
+    _, second_client = make_app(PROFILE_SAMPLE_EVERY=1, PROFILE_TOKEN=TOKEN, PROFILE_MODE='stack',
+                                PROFILE_DIR=directory)
+    for client in (first_client, second_client):
+        for _ in range(3):
+            client.get('/slow', buffered=True)
+    response = first_client.get('/debug/profile', query_string={'route': '/slow', 'format': 'collapsed'}, headers=AUTH)
+    lines = response.get_data(as_text=True).splitlines()
+    check(response.status_code == 200 and lines and all(line.rpartition(' ')[2].isdigit() for line in lines)
+          and any('check_profiler:' in line for line in lines), f'stack mode serves collapsed stacks ({len(lines)} lines)')
+    check(first_client.get('/debug/profile', query_string={'route': '/slow', 'format': 'pstats'},
+                           headers=AUTH).status_code == 404, 'stack mode has no pstats')
+
+    # Both apps dump under this pid, so scope=all sees the later one's file.
+    merged = first_client.get('/debug/profile', query_string={'scope': 'all'}, headers=AUTH).get_json()
+    check(merged['routes']['/slow']['samples'] == 3 and merged['routes']['/slow']['frames'],
+          'scope=all reads the profiles written to PROFILE_DIR')
+    _, no_dir = make_app(PROFILE_SAMPLE_EVERY=1, PROFILE_TOKEN=TOKEN)
+    check(no_dir.get('/debug/profile', query_string={'scope': 'all'}, headers=AUTH).status_code == 400,
+          'scope=all without PROFILE_DIR is a 400')
+
+
+def main():
+    check_sampling()
+    check_token()
+    with tempfile.TemporaryDirectory() as tmp:
+        check_formats(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# tools/check_rate_limit.py
+"""Check that the rate limiter keys on the real client and holds across workers.
+
+    python tools/check_rate_limit.py [--redis redis://localhost:6379/15]
+
+Behind ``PROXY_HOPS`` proxies, clients sharing the proxy's address must
+get their own buckets, and a forged leftmost ``X-Forwarded-For`` entry
+must not buy a fresh one.  Without ``PROXY_HOPS`` the header is ignored.
+Then four processes hit one key at once through the SQLite backend and,
+with ``--redis``, the Redis backend; exactly ``limit`` hits may pass.
+With ``--redis`` it also checks that the backend's client count does not
+double-count windows.  Exits non-zero on the first failure.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ratelimit
+from check_download_jobs import check
+
+BODY = {'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'platform': 'linux'}
+PROXY = '10.0.0.1'
+
+
+def statuses(client, forwarded_for, count):
+    headers = {'X-Forwarded-For': forwarded_for} if forwarded_for else {}
+    return [client.post('/generate-client-command', json=BODY, headers=headers,
+                        environ_base={'REMOTE_ADDR': PROXY}).status_code for _ in range(count)]
+
+
+def check_proxy():
+    import app as app_module
+    limit = app_module.RATE_LIMIT_PER_MINUTE
+    proxied = app_module.create_app({'PROXY_HOPS': 1, 'METRICS_ENABLED': False}).test_client()
+    first = statuses(proxied, '198.51.100.1', limit + 1)
+    check(first == [200] * limit + [429], f'a client behind the proxy is limited after {limit} requests')
+    check(statuses(proxied, '198.51.100.2', 1) == [200], 'another client behind the same proxy is not')
+    check(statuses(proxied, '203.0.113.9, 198.51.100.1', 1) == [429],
+          'a forged leftmost X-Forwarded-For entry does not reset the limit')
+
+    direct = app_module.create_app({'PROXY_HOPS': 0, 'METRICS_ENABLED': False}).test_client()
+    spoofed = [statuses(direct, f'192.0.2.{n}', 1)[0] for n in range(limit + 1)]
+    check(spoofed[-1] == 429, 'without PROXY_HOPS, X-Forwarded-For is ignored')
+
+
+def hammer(make_backend, results, limit, hits):
+    limiter = ratelimit.RateLimiter(limit, backend=make_backend())
+    results.put(sum(limiter.hit('shared') for _ in range(hits)))
+
+
+def check_shared(name, make_backend, limit=20, processes=4, hits=50):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=hammer, args=(make_backend, results, limit, hits)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    allowed = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    check(allowed == limit, f'{processes} processes sharing the {name} backend let {allowed} of {limit} through')
+
+
+def check_redis_clients(client):
+    for key in client.scan_iter(match='clients:*'):
+        client.delete(key)
+    backend = ratelimit.RedisBackend(client, prefix='clients:')
+    limiter = ratelimit.RateLimiter(3, backend=backend)
+    for index in range(200):
+        for _ in range(5):
+            limiter.hit(f'10.0.0.{index}')
+    check(len(backend) == 200, f'the Redis backend counts each client once per window ({len(backend)} of 200)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--redis', help='URL of a scratch Redis database for the Redis backend check')
+    args = parser.parse_args()
+
+    check_proxy()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'limits.db')
+        check_shared('sqlite', lambda: ratelimit.SQLiteBackend(path))
+    if args.redis:
+        import redis
+        client = redis.Redis.from_url(args.redis)
+        for key in client.scan_iter(match='check:*'):
+            client.delete(key)
+        check_shared('redis', lambda: ratelimit.RedisBackend(redis.Redis.from_url(args.redis), prefix='check:'))
+        check_redis_clients(redis.Redis.from_url(args.redis))
+    else:
+        print('skip: Redis backend (pass --redis)')
+
+
+if __name__ == '__main__':
+    main()
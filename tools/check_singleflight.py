@@ -0,0 +1,112 @@
+# tools/check_singleflight.py
+"""Check that 500 concurrent identical requests run the work exactly once.
+
+    python tools/check_singleflight.py
+
+Fires 500 simultaneous calls for one key at singleflight.Group (threads),
+at singleflight.FileGroup split over 4 processes, and 500 identical jobs at
+a JobQueue downloading from a local file server, and asserts that the
+underlying work ran once and every caller got its result.  Exits non-zero
+on the first failure.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import jobs
+import mediacache
+import singleflight
+from check_download_jobs import check, serve
+
+CALLERS = 500
+PROCESSES = 4
+KEY = 'video:dQw4w9WgXcQ'
+
+
+def fire(group, count, start_at, executions_path):
+    """Call ``group.do`` from ``count`` threads released together; return the results."""
+    results = []
+    lock = threading.Lock()
+
+    def work():
+        with open(executions_path, 'a') as f:
+            f.write(f'{os.getpid()}\n')
+        time.sleep(0.5)
+        return {'title': 'shared'}
+
+    def caller():
+        time.sleep(max(0.0, start_at - time.time()))
+        value, _ = group.do(KEY, work)
+        with lock:
+            results.append(value)
+
+    threads = [threading.Thread(target=caller) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def process_main(directory, count, start_at, executions_path, queue):
+    results = fire(singleflight.FileGroup(directory), count, start_at, executions_path)
+    queue.put(len([r for r in results if r == {'title': 'shared'}]))
+
+
+def executions(path):
+    with open(path) as f:
+        return len(f.read().split())
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'threads.log')
+        results = fire(singleflight.Group(), CALLERS, time.time() + 0.5, path)
+        check(executions(path) == 1, f'{CALLERS} threads, one process: one execution')
+        check(results == [{'title': 'shared'}] * CALLERS, 'every thread got the result')
+
+        path = os.path.join(tmp, 'processes.log')
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        start_at = time.time() + 2.0
+        processes = [
+            context.Process(target=process_main,
+                            args=(os.path.join(tmp, 'flight'), CALLERS // PROCESSES, start_at, path, queue))
+            for _ in range(PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        received = sum(queue.get(timeout=60) for _ in processes)
+        for process in processes:
+            process.join()
+        check(executions(path) == 1, f'{CALLERS} threads over {PROCESSES} processes: one execution')
+        check(received == CALLERS, 'every caller in every process got the result')
+
+        media = os.path.join(tmp, 'media')
+        os.makedirs(media)
+        with open(os.path.join(media, 'clip.mp4'), 'wb') as f:
+            f.write(os.urandom(1024 * 1024))
+        server, base = serve(media)
+        downloads = os.path.join(tmp, 'downloads')
+        queue = jobs.JobQueue(downloads, workers=CALLERS, max_queued=CALLERS, per_client=CALLERS,
+                              cache=mediacache.MediaCache(os.path.join(downloads, 'cache'), 1 << 30))
+        submitted = [queue.submit(f'{base}/clip.mp4', client='viral') for _ in range(CALLERS)]
+        deadline = time.time() + 120
+        while not all(job.done for job in submitted) and time.time() < deadline:
+            time.sleep(0.1)
+        check(all(job.state == jobs.FINISHED for job in submitted), f'{CALLERS} identical jobs finished')
+        downloaded = [job for job in submitted if not job.cached]
+        check(len(downloaded) == 1, f'exactly one of them downloaded ({len(downloaded)})')
+        check(len({job.filename for job in submitted}) == 1, 'all of them share one cached file')
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
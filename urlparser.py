@@ -0,0 +1,149 @@
+# urlparser.py
+"""Single-pass YouTube URL parser.
+
+The URL is split once with ``urllib.parse`` and the host, path and query
+are checked against precompiled patterns and lookup tables, instead of
+running a list of regexes over the whole string.
+"""
+import re
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+# Matched against the lower-cased URL; IGNORECASE alternation is several times slower.
+_UNSAFE = re.compile(r'\.\./|file://|javascript:|data:|vbscript:')
+_VIDEO_ID = re.compile(r'[\w-]{11}', re.ASCII)
+_LIST_ID = re.compile(r'[\w-]+', re.ASCII)
+_TIMESTAMP = re.compile(r'(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?', re.ASCII)
+
+_YOUTUBE_HOSTS = frozenset({
+    'youtube.com',
+    'www.youtube.com',
+    'm.youtube.com',
+    'music.youtube.com',
+    'youtube-nocookie.com',
+    'www.youtube-nocookie.com',
+})
+_SHORT_HOSTS = frozenset({'youtu.be', 'www.youtu.be'})
+
+# Path prefixes of the form /<prefix>/<video id> and the kind they map to.
+_ID_PATHS = {
+    'embed': 'embed',
+    'shorts': 'short',
+    'live': 'video',
+    'v': 'video',
+}
+
+
+class ParsedURL(NamedTuple):
+    kind: str  # 'video', 'short', 'embed' or 'playlist'
+    video_id: Optional[str]
+    playlist_id: Optional[str]
+    timestamp: Optional[int]
+    url: str
+
+    @property
+    def canonical_url(self):
+        """The same target rebuilt from its ids; safe inside any kind of shell quotes."""
+        if self.video_id is None:
+            return f'https://www.youtube.com/playlist?list={self.playlist_id}'
+        if self.playlist_id is None:
+            return f'https://www.youtube.com/watch?v={self.video_id}'
+        return f'https://www.youtube.com/watch?v={self.video_id}&list={self.playlist_id}'
+
+    @property
+    def key(self):
+        """``video:<id>`` or ``playlist:<id>``: the same for every spelling of one target."""
+        if self.video_id is not None:
+            return f'video:{self.video_id}'
+        return f'playlist:{self.playlist_id}'
+
+
+def _query(query):
+    params = {}
+    if query:
+        for pair in query.split('&'):
+            key, _, value = pair.partition('=')
+            if key in ('v', 'list', 't', 'start') and key not in params:
+                params[key] = value
+    return params
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    if value.isascii() and value.isdigit():
+        return int(value)
+    match = _TIMESTAMP.fullmatch(value)
+    if match is None or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_youtube_url(url):
+    """Parse ``url`` into a :class:`ParsedURL`, or return None if it is not a YouTube link."""
+    if not url.startswith(('http://', 'https://')) or _UNSAFE.search(url.lower()):
+        return None
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+
+    host = parts.netloc.lower()
+    segments = parts.path.split('/')
+    params = _query(parts.query)
+
+    playlist_id = params.get('list')
+    if playlist_id is not None and not _LIST_ID.fullmatch(playlist_id):
+        return None
+    timestamp = _timestamp(params.get('t') or params.get('start'))
+
+    if host in _SHORT_HOSTS:
+        kind, video_id = 'video', segments[1] if len(segments) > 1 else ''
+    elif host in _YOUTUBE_HOSTS:
+        head = segments[1] if len(segments) > 1 else ''
+        if head == 'watch':
+            kind, video_id = 'video', params.get('v')
+        elif head == 'playlist':
+            kind, video_id = 'playlist', None
+        elif head in _ID_PATHS and len(segments) > 2:
+            kind, video_id = _ID_PATHS[head], segments[2]
+            if head == 'embed' and video_id == 'videoseries':
+                kind, video_id = 'playlist', None
+        else:
+            return None
+    else:
+        return None
+
+    if video_id is None:
+        if playlist_id is None:
+            return None
+        kind = 'playlist'
+    elif not _VIDEO_ID.fullmatch(video_id):
+        return None
+
+    return ParsedURL(kind, video_id, playlist_id, timestamp, url)
+
+
+def rules():
+    """The parsing tables in a JSON-serialisable form, for the browser port in static/commands.js."""
+    return {
+        'unsafe': _UNSAFE.pattern,
+        'videoId': _VIDEO_ID.pattern,
+        'listId': _LIST_ID.pattern,
+        'youtubeHosts': sorted(_YOUTUBE_HOSTS),
+        'shortHosts': sorted(_SHORT_HOSTS),
+        'idPaths': _ID_PATHS,
+    }
+
+
+def parse_many(urls):
+    """Parse an iterable of URLs; invalid entries come back as None."""
+    parse = parse_youtube_url
+    return [parse(url) for url in urls]
+
+
+def validate_many(urls):
+    """Return one bool per URL in ``urls``."""
+    parse = parse_youtube_url
+    return [parse(url) is not None for url in urls]